@@ -0,0 +1,393 @@
+from array import array
+from symbols import Symbols
+from shotel_ast import *
+
+# node kinds, as stored in AstArena.kinds
+KIND_INT = 1
+KIND_STRING = 2
+KIND_LID = 3
+KIND_UID = 4
+KIND_BINARY = 5
+KIND_UNARY = 6
+KIND_APPLICATION = 7
+KIND_CASE = 8
+KIND_BRANCH = 9
+KIND_PATTERN_VAR = 10
+KIND_PATTERN_CONSTRUCTOR = 11
+KIND_CONSTRUCTOR = 12
+KIND_FN = 13
+KIND_TYPE = 14
+
+# offset stored for nodes without one
+NO_OFFSET = -1
+
+class AstArena:
+    '''
+    The nodes of a program in parallel arrays, a node is its index in them.
+    kinds holds the KIND_ of every node and first, second and third its fields:
+
+        INT, STRING                 index of the value in constants
+        LID, UID, PATTERN_VAR       symbol
+        BINARY, UNARY               operator kind value, left or op, right
+        APPLICATION                 -, left, right
+        CASE                        -, Of, branches
+        BRANCH                      -, pattern, expression
+        PATTERN_CONSTRUCTOR         symbol, -, params
+        CONSTRUCTOR                 symbol, -, types
+        FN                          symbol, body, params
+        TYPE                        symbol, -, constructors
+
+    A list field is the index in lists of its length, followed by its items.
+    The methods named after the shotel_ast classes take the same arguments, with nodes as indices,
+    and return the index of the new node, so the Parser builds an arena as it builds objects:
+    Parser(tokens, AstArena()).Program() returns the arena with its definitions set.
+    Children are added before their parents, so every field refers to a lower index.
+    '''
+    def __init__(self):
+        self.kinds = array('B')
+        self.first = array('i')
+        self.second = array('i')
+        self.third = array('i')
+        self.offsets = array('q')
+        self.lists = array('i')
+        self.constants = []
+        self.definitions = array('i')
+
+    def add(self, kind, first = 0, second = 0, third = 0, offset = None):
+        self.kinds.append(kind)
+        self.first.append(first)
+        self.second.append(second)
+        self.third.append(third)
+        self.offsets.append(NO_OFFSET if offset is None else offset)
+
+        return len(self.kinds) - 1
+
+    def add_list(self, items):
+        start = len(self.lists)
+        self.lists.append(len(items))
+        self.lists.extend(items)
+
+        return start
+
+    def list(self, start):
+        '''The items of the list field stored at start.'''
+        return self.lists[start + 1:start + 1 + self.lists[start]]
+
+    def add_constant(self, value):
+        self.constants.append(value)
+
+        return len(self.constants) - 1
+
+    def offset(self, node):
+        offset = self.offsets[node]
+
+        return None if offset == NO_OFFSET else offset
+
+    # builders, as the constructors of shotel_ast
+
+    def IntNode(self, value):
+        return self.add(KIND_INT, self.add_constant(value))
+
+    def StringNode(self, value):
+        return self.add(KIND_STRING, self.add_constant(value))
+
+    def LID(self, value, offset = None):
+        return self.add(KIND_LID, Symbols.symbol(value), offset=offset)
+
+    def UID(self, value, offset = None):
+        return self.add(KIND_UID, Symbols.symbol(value), offset=offset)
+
+    def BinaryOperation(self, kind, left, right, offset = None):
+        return self.add(KIND_BINARY, kind.value, left, right, offset)
+
+    def UnaryOperation(self, kind, op, offset = None):
+        return self.add(KIND_UNARY, kind.value, op, offset=offset)
+
+    def FunctionApplication(self, left, right, offset = None):
+        return self.add(KIND_APPLICATION, 0, left, right, offset)
+
+    def CaseOf(self, Of, branches, offset = None):
+        return self.add(KIND_CASE, 0, Of, self.add_list(branches), offset)
+
+    def Branch(self, pattern, expression):
+        return self.add(KIND_BRANCH, 0, pattern, expression)
+
+    def PatternVar(self, name):
+        return self.add(KIND_PATTERN_VAR, Symbols.symbol(name))
+
+    def PatternConstructor(self, name, params):
+        return self.add(KIND_PATTERN_CONSTRUCTOR, Symbols.symbol(name), 0, self.add_list([Symbols.symbol(param) for param in params]))
+
+    def Constructor(self, name, types):
+        return self.add(KIND_CONSTRUCTOR, Symbols.symbol(name), 0, self.add_list([Symbols.symbol(paramType) for paramType in types]))
+
+    def FnDefinition(self, name, params, body, offset = None):
+        return self.add(KIND_FN, Symbols.symbol(name), body, self.add_list([Symbols.symbol(param) for param in params]), offset)
+
+    def TypeDefinition(self, name, constructors, offset = None):
+        return self.add(KIND_TYPE, Symbols.symbol(name), 0, self.add_list(constructors), offset)
+
+    def Program(self, definitions):
+        self.definitions = array('i', definitions)
+
+        return self
+
+    # access
+
+    def view(self, node):
+        '''A view of the node with the attributes of its shotel_ast class.'''
+        return Views[self.kinds[node]](self, node)
+
+    def __getitem__(self, index):
+        return self.view(self.definitions[index])
+
+    def __len__(self):
+        return len(self.definitions)
+
+    def nodes(self, kind):
+        '''The indices of the nodes of a kind, in the order they were added.'''
+        kinds = self.kinds.tobytes()
+        index = kinds.find(kind)
+
+        while index >= 0:
+            yield index
+            index = kinds.find(kind, index + 1)
+
+    def nbytes(self):
+        '''The bytes taken by the arrays, the constants are not counted.'''
+        arrays = (self.kinds, self.first, self.second, self.third, self.offsets, self.lists, self.definitions)
+
+        return sum(len(values) * values.itemsize for values in arrays)
+
+    def program(self):
+        '''
+        The shotel_ast Program of the arena, for the passes working on objects.
+        Children have lower indices than their parents, so one pass in index order builds every node.
+        '''
+        first, second, third = self.first, self.second, self.third
+        nodes = []
+
+        for node, kind in enumerate(self.kinds):
+            offset = self.offset(node)
+
+            if kind == KIND_INT:
+                built = IntNode(self.constants[first[node]])
+            elif kind == KIND_STRING:
+                built = StringNode(self.constants[first[node]])
+            elif kind == KIND_LID:
+                built = LID(first[node], offset)
+            elif kind == KIND_UID:
+                built = UID(first[node], offset)
+            elif kind == KIND_BINARY:
+                built = BinaryOperation(BinaryOperation.BinaryOperationKind(first[node]), nodes[second[node]], nodes[third[node]], offset)
+            elif kind == KIND_UNARY:
+                built = UnaryOperation(UnaryOperation.UnaryOperationKind(first[node]), nodes[second[node]], offset)
+            elif kind == KIND_APPLICATION:
+                built = FunctionApplication(nodes[second[node]], nodes[third[node]], offset)
+            elif kind == KIND_CASE:
+                built = CaseOf(nodes[second[node]], [nodes[branch] for branch in self.list(third[node])], offset)
+            elif kind == KIND_BRANCH:
+                built = Branch(nodes[second[node]], nodes[third[node]])
+            elif kind == KIND_PATTERN_VAR:
+                built = PatternVar(first[node])
+            elif kind == KIND_PATTERN_CONSTRUCTOR:
+                built = PatternConstructor(first[node], self.list(third[node]))
+            elif kind == KIND_CONSTRUCTOR:
+                built = Constructor(first[node], self.list(third[node]))
+            elif kind == KIND_FN:
+                built = FnDefinition(first[node], self.list(third[node]), nodes[second[node]], offset)
+            else:
+                built = TypeDefinition(first[node], [nodes[constructor] for constructor in self.list(third[node])], offset)
+
+            nodes.append(built)
+
+        return Program([nodes[definition] for definition in self.definitions])
+
+class NodeView:
+    '''A node of an AstArena, read through the attributes of its shotel_ast class.'''
+    __slots__ = ("arena", "index")
+
+    def __init__(self, arena, index):
+        self.arena = arena
+        self.index = index
+
+    @property
+    def offset(self):
+        return self.arena.offset(self.index)
+
+    def child(self, fields):
+        return self.arena.view(fields[self.index])
+
+    def __eq__(self, other):
+        return type(other) is type(self) and other.arena is self.arena and other.index == self.index
+
+    def __hash__(self):
+        return hash((id(self.arena), self.index))
+
+class SymbolView(NodeView):
+    __slots__ = ()
+
+    @property
+    def symbol(self):
+        return self.arena.first[self.index]
+
+    @property
+    def name(self):
+        return Symbols.name(self.symbol)
+
+class ConstantView(NodeView):
+    __slots__ = ()
+
+    @property
+    def value(self):
+        return self.arena.constants[self.arena.first[self.index]]
+
+    def __repr__(self):
+        return f"{'INT' if self.arena.kinds[self.index] == KIND_INT else 'String'}({self.value})"
+
+class IdentifierView(SymbolView):
+    __slots__ = ()
+
+    @property
+    def value(self):
+        return self.name
+
+    def __repr__(self):
+        return f"{'LID' if self.arena.kinds[self.index] == KIND_LID else 'UID'}({self.value})"
+
+class BinaryOperationView(NodeView):
+    __slots__ = ()
+
+    @property
+    def kind(self):
+        return BinaryOperation.BinaryOperationKind(self.arena.first[self.index])
+
+    @property
+    def left(self):
+        return self.child(self.arena.second)
+
+    @property
+    def right(self):
+        return self.child(self.arena.third)
+
+    def __repr__(self):
+        return f"BinaryOp({self.kind})"
+
+class UnaryOperationView(NodeView):
+    __slots__ = ()
+
+    @property
+    def kind(self):
+        return UnaryOperation.UnaryOperationKind(self.arena.first[self.index])
+
+    @property
+    def op(self):
+        return self.child(self.arena.second)
+
+    def __repr__(self):
+        return f"UnaryOp({self.kind}"
+
+class FunctionApplicationView(NodeView):
+    __slots__ = ()
+
+    @property
+    def left(self):
+        return self.child(self.arena.second)
+
+    @property
+    def right(self):
+        return self.child(self.arena.third)
+
+    def __repr__(self):
+        return "Fn"
+
+class CaseOfView(NodeView):
+    __slots__ = ()
+
+    @property
+    def Of(self):
+        return self.child(self.arena.second)
+
+    @property
+    def branches(self):
+        return [self.arena.view(branch) for branch in self.arena.list(self.arena.third[self.index])]
+
+    def __repr__(self):
+        return "CaseOf"
+
+class BranchView(NodeView):
+    __slots__ = ()
+
+    @property
+    def pattern(self):
+        return self.child(self.arena.second)
+
+    @property
+    def expression(self):
+        return self.child(self.arena.third)
+
+    def __repr__(self):
+        return "Branch"
+
+class PatternVarView(SymbolView):
+    __slots__ = ()
+
+    def __repr__(self):
+        return f"PatternVar({self.name})"
+
+class ParamsView(SymbolView):
+    '''A node with a symbol and a list of symbols, its params or types.'''
+    __slots__ = ()
+
+    @property
+    def param_symbols(self):
+        return list(self.arena.list(self.arena.third[self.index]))
+
+    @property
+    def params(self):
+        return [Symbols.name(param) for param in self.param_symbols]
+
+class PatternConstructorView(ParamsView):
+    __slots__ = ()
+
+    def __repr__(self):
+        return f"PatternConstructor({self.name}){self.params}"
+
+class ConstructorView(ParamsView):
+    __slots__ = ()
+
+    @property
+    def type_symbols(self):
+        return self.param_symbols
+
+    @property
+    def types(self):
+        return self.params
+
+    def __repr__(self):
+        return f"Constructor({self.name}){self.types}"
+
+class FnDefinitionView(ParamsView):
+    __slots__ = ()
+
+    @property
+    def body(self):
+        return self.child(self.arena.second)
+
+    def __repr__(self):
+        return f"DefinitionFn({self.name}){self.params}"
+
+class TypeDefinitionView(SymbolView):
+    __slots__ = ()
+
+    @property
+    def constructors(self):
+        return [self.arena.view(constructor) for constructor in self.arena.list(self.arena.third[self.index])]
+
+    def __repr__(self):
+        return f"DefinitionType({self.name}){self.constructors}"
+
+# view class of each kind, by KIND_ value
+Views = (None, ConstantView, ConstantView, IdentifierView, IdentifierView, BinaryOperationView, UnaryOperationView,
+    FunctionApplicationView, CaseOfView, BranchView, PatternVarView, PatternConstructorView, ConstructorView,
+    FnDefinitionView, TypeDefinitionView)
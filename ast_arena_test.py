@@ -0,0 +1,76 @@
+import tracemalloc
+from ast_arena import AstArena, KIND_LID, KIND_FN
+from parser import Parser, TableParser, InvalidTokenError
+from tokenizer import Lexer
+from corpus import CorpusGenerator
+from parserGenerator_test import repr_tree
+import pytest
+
+def arena_program(text):
+    return Parser(Lexer().scan(text), AstArena()).Program()
+
+def test_arena_builds_the_same_trees():
+    texts = ["type Bool = True, False\ntype Pair = Pair Int Int\nfn Not x { case x | True => { False } | Pair a b => { True } }",
+        "fn A a b { F (G 1) \"x\" a == !b a + 1 * 2 or 3 and 4 xor 5 - 6 >> 7 }", ""]
+    texts += [CorpusGenerator(types=seed % 3, fns=4, depth=1 + seed % 3, seed=seed).generate() for seed in range(4)]
+
+    for text in texts:
+        objects = Parser(Lexer().scan(text)).Program()
+        assert repr_tree(arena_program(text).program().definitions) == repr_tree(objects.definitions)
+
+def test_table_parser_builds_the_arena():
+    text = CorpusGenerator(types=2, fns=6, depth=3, seed=5).generate()
+    arena = TableParser(Lexer().scan(text), AstArena()).Program()
+
+    assert isinstance(arena, AstArena)
+    assert repr_tree(arena.program().definitions) == repr_tree(Parser(Lexer().scan(text)).Program().definitions)
+
+def test_deep_arena():
+    depth = Parser.MaxDepth * 4
+    text = "fn Deep a { " + "(a + " * depth + "1" + ")" * depth + " }"
+    arena = arena_program(text)
+
+    assert isinstance(arena, AstArena)
+    assert Parser.TreeToString(arena.program()[0].body) == Parser.TreeToString(Parser(Lexer().scan(text)).Program()[0].body)
+
+def test_views():
+    arena = arena_program("type Pair = Pair Int Int\nfn Swap p { case p | Pair a b => { Pair b (a + 1) } }")
+    pair, swap = arena
+
+    assert len(arena) == 2
+    assert (pair.name, pair.constructors[0].name, pair.constructors[0].types) == ("Pair", "Pair", ["Int", "Int"])
+    assert (swap.name, swap.params, swap.offset) == ("Swap", ["p"], 25)
+
+    case = swap.body
+    assert case.Of.value == "p"
+
+    branch = case.branches[0]
+    assert (branch.pattern.name, branch.pattern.params) == ("Pair", ["a", "b"])
+
+    application = branch.expression
+    assert repr(application.left.left) == "UID(Pair)"
+    assert repr(application.right.kind) == "<OperationKind.PLUS: 1>"
+    assert application.right.right.value == 1
+
+    assert [arena.view(node).value for node in arena.nodes(KIND_LID)] == ["p", "b", "a"]
+    assert list(arena.nodes(KIND_FN)) == [swap.index]
+
+def test_arena_parse_errors():
+    with pytest.raises(InvalidTokenError) as error:
+        arena_program("fn A { 1 + }")
+
+    assert error.value.offset == 11
+
+def test_arena_is_smaller():
+    text = CorpusGenerator(fns=32, depth=3, seed=1).generate()
+    tokens = Lexer().scan(text)
+
+    sizes = []
+
+    for nodes in (None, AstArena()):
+        tracemalloc.start()
+        program = Parser(tokens).Program() if nodes is None else Parser(tokens, nodes).Program()
+        sizes.append(tracemalloc.get_traced_memory()[0])
+        tracemalloc.stop()
+
+    assert sizes[1] * 3 < sizes[0]
@@ -0,0 +1,147 @@
+#!/usr/bin/python3
+from corpus import CorpusGenerator
+from compiler import Compiler
+from tokenizer import TokenConverter, Lexer
+from parser import Parser, TableParser
+from ast_arena import AstArena
+from shotel_ast import walk
+from typechecker import TypeManager
+import argparse
+import json
+import os
+import time
+
+class CountingTypeManager(TypeManager):
+    '''A type manager counting the calls to unify, the pairs of types the typechecker asks it to unify.'''
+    def __init__(self):
+        super().__init__()
+        self.unifications = 0
+
+    def unify(self, left, right):
+        self.unifications += 1
+        return super().unify(left, right)
+
+class Benchmark:
+    '''
+    Times each phase of the compiler over the same source separately:
+    the scanner, TokenConverter, the Parser building objects or an AstArena, the generated TableParser
+    and Program.typecheck.
+    Every phase is run repeat times on fresh inputs and the fastest run is reported,
+    with its throughput in tokens, AST nodes or unifications per second.
+    '''
+    def __init__(self, text, repeat = 5, external_scanner = False):
+        self.text = text
+        self.repeat = repeat
+        self.external_scanner = external_scanner
+
+    def count_nodes(program):
+        '''The number of nodes of a program: definitions, constructors, expressions, branches and patterns.'''
+        return sum(1 for node, entering in walk(program) if entering and node is not program)
+
+    def token_lines(tokens):
+        '''The lines the flex scanner prints in text mode for the tokens.'''
+        return [token.type.name if token.value is None else f"{token.type.name}({token.value})" for token in tokens]
+
+    def best(self, setup, run):
+        '''The shortest time of repeat runs, with the result of the last one. setup is not timed.'''
+        best = None
+
+        for _ in range(self.repeat):
+            argument = setup()
+
+            start = time.perf_counter()
+            result = run(argument)
+            elapsed = time.perf_counter() - start
+
+            best = elapsed if best is None else min(best, elapsed)
+
+        return best, result
+
+    def run(self):
+        '''Returns a list of (phase, seconds, {unit: count}) results.'''
+        results = []
+        text = self.text
+
+        if self.external_scanner:
+            scan = lambda text: Compiler.scan_external(text)
+            scanner = "scanner (flex)"
+        else:
+            scan = Lexer().scan
+            scanner = "scanner (dfa)"
+
+        seconds, tokens = self.best(lambda: text, scan)
+        results.append((scanner, seconds, {"tokens": len(tokens)}))
+
+        lines = Benchmark.token_lines(Lexer().scan(text))
+        seconds, _ = self.best(lambda: lines, TokenConverter)
+        results.append(("TokenConverter", seconds, {"tokens": len(lines)}))
+
+        seconds, program = self.best(lambda: Lexer().scan(text), lambda tokens: Parser(tokens).Program())
+        results.append(("Parser", seconds, {"tokens": len(tokens), "nodes": Benchmark.count_nodes(program)}))
+
+        seconds, _ = self.best(lambda: Lexer().scan(text), lambda tokens: Parser(tokens, AstArena()).Program())
+        results.append(("Parser (arena)", seconds, {"tokens": len(tokens), "nodes": Benchmark.count_nodes(program)}))
+
+        seconds, _ = self.best(lambda: Lexer().scan(text), lambda tokens: TableParser(tokens).Program())
+        results.append(("TableParser", seconds, {"tokens": len(tokens), "nodes": Benchmark.count_nodes(program)}))
+
+        def typecheck(arguments):
+            program, typeManager = arguments
+            program.typecheck(typeManager, Compiler.operator_environment())
+            return typeManager
+
+        # typechecking fills in the types of the definitions, so every run gets a new program
+        setup = lambda: (Compiler.compile_from_text(text), CountingTypeManager())
+        seconds, typeManager = self.best(setup, typecheck)
+        results.append(("typecheck", seconds, {"nodes": Benchmark.count_nodes(program), "unifications": typeManager.unifications}))
+
+        return results
+
+    def report(results):
+        lines = []
+
+        for phase, seconds, counts in results:
+            rates = ", ".join(f"{count / seconds:,.0f} {unit}/s" for unit, count in counts.items())
+            lines.append(f"{phase:<16} {seconds * 1000:10.2f} ms   {rates}")
+
+        return "\n".join(lines)
+
+    def report_json(results, knobs):
+        phases = [{"phase": phase, "seconds": seconds, "counts": counts,
+            "rates": {unit: count / seconds for unit, count in counts.items()}} for phase, seconds, counts in results]
+
+        return json.dumps({"corpus": knobs, "phases": phases}, indent=2)
+
+
+if __name__ == "__main__":
+    argparser = argparse.ArgumentParser(description="Measures the throughput of each compiler phase on a synthetic program.")
+    argparser.add_argument("--types", type=int, default=8, help="number of type definitions")
+    argparser.add_argument("--fns", type=int, default=256, help="number of fn definitions")
+    argparser.add_argument("--arity", type=int, default=2, help="parameters of every constructor")
+    argparser.add_argument("--params", type=int, default=2, help="parameters of every function")
+    argparser.add_argument("--depth", type=int, default=3, help="nesting depth of expressions")
+    argparser.add_argument("--branches", type=int, default=3, help="constructors per type and branches per case")
+    argparser.add_argument("--chain", type=int, default=3, help="operands per operator chain")
+    argparser.add_argument("--seed", type=int, default=0)
+    argparser.add_argument("--repeat", type=int, default=5, help="runs per phase, the fastest is reported")
+    argparser.add_argument("--source", help="benchmark a source file instead of a generated program")
+    argparser.add_argument("--external-scanner", action="store_true",
+        help="time the flex scanner binary instead of the in-process lexer")
+    argparser.add_argument("--json", action="store_true", help="print the results as JSON")
+    args = argparser.parse_args()
+
+    if args.source is not None:
+        with open(args.source, encoding='ascii') as source:
+            text = source.read()
+
+        knobs = {"source": args.source}
+    else:
+        knobs = {name: getattr(args, name) for name in ("types", "fns", "arity", "params", "depth", "branches", "chain", "seed")}
+        text = CorpusGenerator(**knobs).generate()
+
+    if args.external_scanner and not os.access("./scanner", os.X_OK):
+        raise FileNotFoundError("./scanner is not built, run make scanner first")
+
+    results = Benchmark(text, args.repeat, args.external_scanner).run()
+
+    print(Benchmark.report_json(results, knobs) if args.json else Benchmark.report(results))
@@ -0,0 +1,157 @@
+import gc
+import hashlib
+import os
+import pickle
+import tempfile
+
+# the modules whose code decides the program parsed from a source
+CompilerModules = ["scannerGenerator.py", "language_table.py", "tokenizer.py", "parser.py", "language_parse_table.py", "shotel_ast.py", "symbols.py"]
+
+# the modules whose code decides the types inferred for a definition
+TypecheckModules = ["shotel_ast.py", "typechecker.py", "dependencies.py", "prelude.py", "symbols.py"]
+
+class ParseCache:
+    '''
+    Programs parsed from sources, stored in a directory under the hash of the source bytes
+    and of the compiler version, so a source is only parsed again when it or the compiler changes.
+    Entries are pickled programs, their symbols stored as names. Writes go to a temporary file
+    renamed over the entry, so concurrent compilers never see partial entries.
+    Once the entries take more than max_bytes, the least recently used are removed. The size of the entries
+    is kept as a running total, the directory is only listed again when the total goes over the cap.
+    '''
+    # suffix of the entry files, and the modules hashed into the default version
+    extension = ".program"
+    modules = CompilerModules
+
+    def __init__(self, directory, max_bytes = 256 << 20, version = None):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.version = version if version is not None else ParseCache.compiler_version(self.modules)
+        # bytes of the entries when the directory was last listed plus those put since, None before
+        self.total = None
+        os.makedirs(directory, exist_ok=True)
+
+    def compiler_version(modules = CompilerModules):
+        '''A hash of the code of the modules the parse depends on.'''
+        digest = hashlib.sha256()
+        root = os.path.dirname(os.path.abspath(__file__))
+
+        for module in modules:
+            with open(os.path.join(root, module), "rb") as source:
+                digest.update(source.read())
+
+        return digest.hexdigest()
+
+    def key(self, source: bytes):
+        digest = hashlib.sha256(self.version.encode())
+        digest.update(b"\0")
+        digest.update(source)
+
+        return digest.hexdigest()
+
+    def path(self, key):
+        return os.path.join(self.directory, key + self.extension)
+
+    def get(self, source: bytes):
+        '''The program cached for the source, None if there is none.'''
+        path = self.path(self.key(source))
+
+        try:
+            with open(path, "rb") as entry:
+                program = ParseCache.load(entry)
+        except FileNotFoundError:
+            return None
+        except (pickle.UnpicklingError, EOFError, AttributeError, ImportError):
+            # written by an incompatible compiler, parse again and replace it
+            ParseCache.remove(path)
+            return None
+
+        # the modification time orders the entries for eviction
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            pass
+
+        return program
+
+    def load(entry):
+        '''
+        Unpickles a program with the cyclic garbage collector paused: the nodes hold no cycles,
+        and collections triggered by the allocation of every node would take most of the time.
+        '''
+        enabled = gc.isenabled()
+        gc.disable()
+
+        try:
+            return pickle.load(entry)
+        finally:
+            if enabled:
+                gc.enable()
+
+    def put(self, source: bytes, program):
+        '''Caches the program parsed from the source, then evicts entries if the total goes over the size cap.'''
+        descriptor, temporary = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+
+        try:
+            with os.fdopen(descriptor, "wb") as entry:
+                pickle.dump(program, entry, pickle.HIGHEST_PROTOCOL)
+                size = entry.tell()
+
+            os.replace(temporary, self.path(self.key(source)))
+        except BaseException:
+            ParseCache.remove(temporary)
+            raise
+
+        # an entry replacing another, or removed by another compiler, is counted until the next listing
+        if self.total is not None:
+            self.total += size
+
+        # evicting an eighth below the cap leaves room for the next entries, so a full cache is not listed on every put
+        if self.total is None or self.total > self.max_bytes:
+            self.evict(self.max_bytes - self.max_bytes // 8)
+
+    def evict(self, max_bytes = None):
+        '''Removes the least recently used entries until they fit in max_bytes, the cap by default, counting them again.'''
+        max_bytes = self.max_bytes if max_bytes is None else max_bytes
+        entries = []
+        total = 0
+
+        with os.scandir(self.directory) as scan:
+            for entry in scan:
+                if not entry.name.endswith(self.extension):
+                    continue
+
+                try:
+                    stat = entry.stat()
+                except FileNotFoundError:
+                    continue
+
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+                total += stat.st_size
+
+        entries.sort()
+
+        for _, size, path in entries:
+            if total <= max_bytes:
+                break
+
+            ParseCache.remove(path)
+            total -= size
+
+        self.total = total
+
+    def remove(path):
+        '''Removes a file another compiler may have removed already.'''
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+class TypecheckCache(ParseCache):
+    '''
+    The results of typechecking components of definitions, see SccTypechecker, in a directory as ParseCache.
+    The key is the text of the definitions, without offsets, and of the signatures they refer to,
+    its variables numbered in order, so a component is only checked again when it or one of these changes.
+    '''
+    extension = ".types"
+    modules = TypecheckModules
@@ -0,0 +1,114 @@
+import os
+import time
+from cache import ParseCache, TypecheckCache
+from compiler import Compiler
+from passes import PassStatistics
+from parser import Parser
+from typechecker import TypeBindingError
+from dependencies_test import show
+import pytest
+
+def test_cache_roundtrip(tmp_path):
+    cache = ParseCache(str(tmp_path), version="test")
+    source = b"type Cached = Hit Int, Miss\nfn Lookup key { case key | Hit value => { value } | other => { 0 } }"
+
+    assert cache.get(source) is None
+
+    cache.put(source, Compiler.compile_from_text(source.decode()))
+    program = cache.get(source)
+
+    assert [definition.name for definition in program] == ["Cached", "Lookup"]
+    assert program[0].constructors[0].types == ["Int"]
+    assert Parser.TreeToString(program[1].body.branches[0].expression) == "LID(value)"
+    assert [name for name in os.listdir(tmp_path) if not name.endswith(".program")] == []
+
+def test_cache_keys(tmp_path):
+    cache = ParseCache(str(tmp_path), version="test")
+    cache.put(b"fn A { 1 }", Compiler.compile_from_text("fn A { 1 }"))
+
+    assert cache.get(b"fn A { 2 }") is None
+    assert ParseCache(str(tmp_path), version="other").get(b"fn A { 1 }") is None
+    assert ParseCache(str(tmp_path), version="test").get(b"fn A { 1 }") is not None
+
+def test_cache_evicts_least_recently_used(tmp_path):
+    cache = ParseCache(str(tmp_path), version="test")
+    sources = [f"fn A {{ {index} }}".encode() for index in range(3)]
+
+    for index, source in enumerate(sources):
+        cache.put(source, Compiler.compile_from_text(source.decode()))
+        past = time.time() - 100 + index
+        os.utime(cache.path(cache.key(source)), (past, past))
+
+    # reading the oldest makes it the most recently used
+    assert cache.get(sources[0]) is not None
+
+    entry_size = os.path.getsize(cache.path(cache.key(sources[0])))
+    cache.max_bytes = 2 * entry_size
+    cache.evict()
+
+    assert cache.get(sources[1]) is None
+    assert cache.get(sources[0]) is not None and cache.get(sources[2]) is not None
+
+def test_cache_corrupt_entry(tmp_path):
+    cache = ParseCache(str(tmp_path), version="test")
+
+    with open(cache.path(cache.key(b"fn A { 1 }")), "wb") as entry:
+        entry.write(b"not a pickle")
+
+    assert cache.get(b"fn A { 1 }") is None
+    assert os.listdir(tmp_path) == []
+
+def test_compile_cached_skips_parsing(tmp_path):
+    path = tmp_path / "source.sd"
+    path.write_text("fn Add a b { a + b }")
+    cache = ParseCache(str(tmp_path / "cache"))
+
+    first = Compiler.compile_cached([str(path)], cache)
+    passes = PassStatistics()
+    second = Compiler.compile_cached([str(path)], cache, passes=passes)
+
+    assert "parse" not in passes.records and "scan" not in passes.records
+    assert second[0][0].name == first[0][0].name == "Add"
+    assert second[0][0].params == ["a", "b"]
+
+def test_typecheck_cache_skips_unchanged_components(tmp_path):
+    cache = TypecheckCache(str(tmp_path), version="test")
+    text = "fn Leaf { 1 }\nfn User { Leaf + 1 }\nfn Id x { x }\nfn Other { Id \"other\" }\n"
+
+    def check(text):
+        return Compiler.typecheck_components(Compiler.compile_from_text(text), cache = cache)
+
+    first = check(text)
+    assert first.cached == 0
+
+    # moved, the definitions keep their structure
+    again = check("\n\n" + text)
+    assert again.cached == 4
+    assert [show(again.signature(name)) for name in ("Leaf", "User", "Id", "Other")] == ["Int", "Int", "(a0 -> a0)", "String"]
+
+    # Leaf keeps its signature, so User is not checked again, while Other is as that of Id changed
+    edited = check(text.replace("{ 1 }", "{ 2 }").replace("Id x", "Id x y"))
+    assert edited.cached == 1
+    assert show(edited.signature("Other")) == "(a0 -> String)"
+
+    with pytest.raises(TypeBindingError):
+        check(text.replace("{ 1 }", "{ \"one\" }"))
+
+    assert all(name.endswith(".types") for name in os.listdir(tmp_path))
+
+def test_cache_lists_the_directory_when_full(tmp_path, monkeypatch):
+    cache = ParseCache(str(tmp_path), version="test")
+    sources = [f"fn A {{ {index} }}".encode() for index in range(40)]
+    cache.put(sources[0], Compiler.compile_from_text(sources[0].decode()))
+    cache.max_bytes = 16 * os.path.getsize(cache.path(cache.key(sources[0])))
+
+    listings = []
+    scandir = os.scandir
+    monkeypatch.setattr(os, "scandir", lambda path: listings.append(path) or scandir(path))
+
+    for source in sources[1:]:
+        cache.put(source, Compiler.compile_from_text(source.decode()))
+
+    # listed when the cap is crossed, each eviction leaving room for two more entries
+    assert 0 < len(listings) < 20
+    assert sum(os.path.getsize(cache.path(cache.key(source))) for source in sources if cache.get(source)) <= cache.max_bytes
@@ -1,6 +1,14 @@
 #!/usr/bin/python3
-from tokenizer import TokenConverter
+from tokenizer import TokenConverter, BinaryTokenConverter, Lexer, ScannerServer
 from parser import Parser
+from typechecker import TypeManager, ScopedEnvironment
+import prelude
+from diagnostics import SourceError, LineIndex
+from passes import PassStatistics
+from cache import ParseCache, TypecheckCache
+from dependencies import SccTypechecker
+from contextlib import nullcontext, closing
+import argparse
 import sys
 import os
 import subprocess
@@ -9,36 +17,257 @@ class Compiler:
     def __init__(self):
         pass
 
-    def compile_from_text(text):
+    def compile_from_text(text, external_scanner = False, passes = None):
+        '''Parses the text. Phases are recorded in passes, a PassStatistics, if given.'''
         # tokens
-        p = subprocess.run(['./scanner'], stdout=subprocess.PIPE,
-        input=text, encoding='ascii')
-        lines = p.stdout
-
-        #python tokens
-        tokenizer = TokenConverter(lines.splitlines())
-        tokens = tokenizer.tokens
+        if external_scanner:
+            tokens = Compiler.scan_external(text, passes = passes)
+        else:
+            with Compiler.phase(passes, "scan"):
+                tokens = Lexer().scan(text)
 
         #parser
-        parser = Parser(tokens)
+        with Compiler.phase(passes, "parse"):
+            return Parser(tokens).Program()
+
+    def compile_parallel(text, workers = None, external_scanner = False, passes = None):
+        '''Parses the text with its definitions split across a pool of worker processes, see Parser.ParallelProgram.'''
+        if external_scanner:
+            tokens = Compiler.scan_external(text, passes = passes)
+        else:
+            with Compiler.phase(passes, "scan"):
+                tokens = Lexer().scan(text)
+
+        with Compiler.phase(passes, "parse"):
+            return Parser.ParallelProgram(tokens, workers)
+
+    def compile_cached(paths, cache, workers = 1, external_scanner = False, passes = None):
+        '''
+        Compiles source files, taking the programs of unchanged sources from a ParseCache.
+        Only the sources missing from the cache are scanned and parsed, then they are cached.
+        workers other than 1 parses each of them in parallel, see compile_parallel.
+        '''
+        sources = []
+
+        for path in paths:
+            with open(path, 'rb') as source:
+                sources.append(source.read())
+
+        with Compiler.phase(passes, "cache"):
+            programs = [cache.get(source) for source in sources]
+
+        missing = [index for index, program in enumerate(programs) if program is None]
+        texts = [sources[index].decode('ascii') for index in missing]
+
+        try:
+            if workers != 1:
+                compiled = []
+
+                for position, text in enumerate(texts):
+                    try:
+                        compiled.append(Compiler.compile_parallel(text, workers, external_scanner, passes))
+                    except SourceError as error:
+                        error.source = position
+                        raise
+            else:
+                compiled = Compiler.compile_many(texts, external_scanner, passes)
+        except SourceError as error:
+            error.source = missing[error.source]
+            raise
+
+        with Compiler.phase(passes, "cache"):
+            for index, program in zip(missing, compiled):
+                cache.put(sources[index], program)
+                programs[index] = program
+
+        return programs
+
+    def phase(passes, name):
+        return passes.phase(name) if passes is not None else nullcontext()
+
+    def typecheck(program, passes = None):
+        '''Typechecks a program with the operators typed on Int, returning the type manager holding its types.'''
+        with Compiler.phase(passes, "typecheck"):
+            typeManager = TypeManager()
+            program.typecheck(typeManager, Compiler.operator_environment())
+
+        return typeManager
+
+    def typecheck_components(program, workers = 1, passes = None, cache = None):
+        '''
+        Typechecks a program in the dependency order of its definitions, generalizing the types of functions,
+        checking independent ones in workers processes, 0 or None for one per cpu, and taking the results
+        of unchanged ones from cache, a TypecheckCache, if given. Returns the SccTypechecker holding the signatures.
+        '''
+        with Compiler.phase(passes, "typecheck"):
+            checker = SccTypechecker(program, workers = workers, cache = cache)
+            checker.typecheck()
+
+        return checker
+
+    def operator_environment(env = None):
+        '''
+        The root environment of a compile, typing every binary operator as Int -> Int -> Int and every unary one
+        as Int -> Int: a new ScopedEnvironment over the Prelude, or env with the operators bound in it.
+        '''
+        if env is None:
+            return ScopedEnvironment(prelude.Prelude)
+
+        for symbol, signature in prelude.bindings().items():
+            env.bind(symbol, signature)
+
+        return env
 
-        return parser.Program()
+    def compile_many(sources, external_scanner = False, passes = None):
+        '''
+        Compiles a batch of source texts, returning their programs in order.
+        The batch shares one lexer, or one flex scanner process in server mode,
+        so process startup is paid once per batch instead of once per source.
+        '''
+        if not external_scanner:
+            lexer = Lexer()
+            return Compiler.parse_each(sources, lexer.scan, passes)
+
+        with ScannerServer() as server:
+            return Compiler.parse_each(sources, server.scan, passes)
+
+    def parse_each(sources, scan, passes = None):
+        programs = []
+
+        for index, text in enumerate(sources):
+            try:
+                with Compiler.phase(passes, "scan"):
+                    tokens = scan(text)
+
+                with Compiler.phase(passes, "parse"):
+                    programs.append(Parser(tokens).Program())
+            except SourceError as error:
+                error.source = index
+                raise
+
+        return programs
+
+    def compile_file(path, external_scanner = False, passes = None):
+        '''
+        Compiles a source file, parsing its tokens while they are scanned.
+        The full token list is never built, so memory does not grow with the token count.
+        Scanning and parsing interleave, the time spent producing tokens is recorded as the scan phase.
+        '''
+        with open(path, encoding='ascii') as source:
+            tokens = Compiler.stream_external(path, source) if external_scanner else Lexer().stream(source)
+
+            if passes is not None:
+                tokens = passes.timed("scan", tokens)
+
+            # closed on errors too, so an external scanner does not outlive a failed parse
+            with closing(tokens):
+                # the parser reads the first chunk when created, the scan phase starts before the parse
+                parser = Parser(tokens)
+
+                with Compiler.phase(passes, "parse"):
+                    return parser.Program()
+
+    def stream_external(path, source):
+        '''
+        Yields the tokens of a source file as the flex scanner binary produces them.
+        Raises CalledProcessError if the scanner fails, and ScannerOutputError if its output is not token records
+        covering the whole source.
+        '''
+        with subprocess.Popen(['./scanner', '--binary', path], stdout=subprocess.PIPE) as p:
+            yield from BinaryTokenConverter.stream(p.stdout, source)
+
+            if p.wait() != 0:
+                raise subprocess.CalledProcessError(p.returncode, p.args)
+
+    def scan_external(text, binary = True, passes = None):
+        '''
+        Tokenizes the text with the flex scanner binary built from language.lex.
+        By default the scanner writes fixed size token records instead of a line per token.
+        '''
+        if binary:
+            with Compiler.phase(passes, "scan"):
+                p = subprocess.run(['./scanner', '--binary'], stdout=subprocess.PIPE,
+                input=text.encode('ascii'), check=True)
+
+            with Compiler.phase(passes, "tokenize"):
+                return BinaryTokenConverter(p.stdout, text).tokens
+
+        with Compiler.phase(passes, "scan"):
+            p = subprocess.run(['./scanner'], stdout=subprocess.PIPE,
+            input=text, encoding='ascii', check=True)
+            lines = p.stdout
+
+        #python tokens
+        with Compiler.phase(passes, "tokenize"):
+            tokenizer = TokenConverter(lines.splitlines())
+            return tokenizer.tokens
 
 
 if __name__ == "__main__":
-    sourceFile = sys.argv[1]
+    argparser = argparse.ArgumentParser(description="Compiles Shotel source files.")
+    argparser.add_argument("sources", nargs="+")
+    argparser.add_argument("--external-scanner", action="store_true",
+        help="tokenize with the flex scanner binary instead of the in-process lexer")
+    argparser.add_argument("--jobs", type=int, default=1,
+        help="parse the definitions of a source in this many processes, 0 for one per cpu")
+    argparser.add_argument("--generalize", action="store_true",
+        help="typecheck in dependency order with polymorphic functions, independent definitions in --jobs processes")
+    argparser.add_argument("--cache-dir",
+        help="reuse the programs parsed from unchanged sources, and with --generalize the types of unchanged definitions, stored in this directory")
+    argparser.add_argument("--cache-size", type=int, default=256,
+        help="size cap of --cache-dir in MiB, half for the parsed programs and half for the types, the least recently used entries are evicted")
+    argparser.add_argument("--time-passes", action="store_true",
+        help="print the wall and cpu time of each phase to stderr")
+    argparser.add_argument("--mem-passes", action="store_true",
+        help="also print the peak traced memory and the memory blocks left allocated by each phase, tracing slows the compile")
+    argparser.add_argument("--passes-json", action="store_true",
+        help="print the phase statistics as JSON, timing the phases without --time-passes")
+    args = argparser.parse_args()
+
+    passes = None
+
+    if args.time_passes or args.mem_passes or args.passes_json:
+        passes = PassStatistics(memory=args.mem_passes)
+
+    for sourceFile in args.sources:
+        if not os.path.exists(sourceFile):
+            raise FileNotFoundError(sourceFile)
+            exit(-1)
 
-    if not os.path.exists(sourceFile):
-        raise FileNotFoundError(sourceFile)
-        exit(-1)
-    
-    tokenizerText = subprocess.check_output(["./scanner", sourceFile])
-    utf8lines = map(lambda text: text.decode("utf-8"), tokenizerText.splitlines())
+    typecheckCache = None
 
-    tokenizer = TokenConverter(utf8lines)
-    tokens = tokenizer.tokens
+    try:
+        if args.cache_dir is not None:
+            # both caches share the directory, each evicting its own entries, so each gets half of the cap
+            cache = ParseCache(args.cache_dir, args.cache_size << 19)
+            programs = Compiler.compile_cached(args.sources, cache, args.jobs or None, args.external_scanner, passes)
+            typecheckCache = TypecheckCache(args.cache_dir, args.cache_size << 19)
+        elif len(args.sources) == 1 and args.jobs != 1:
+            with open(args.sources[0], encoding='ascii') as source:
+                programs = [Compiler.compile_parallel(source.read(), args.jobs or None, args.external_scanner, passes)]
+        elif len(args.sources) == 1:
+            programs = [Compiler.compile_file(args.sources[0], args.external_scanner, passes)]
+        else:
+            texts = []
+            for sourceFile in args.sources:
+                with open(sourceFile, encoding='ascii') as source:
+                    texts.append(source.read())
 
-    parser = Parser(tokens)
+            programs = Compiler.compile_many(texts, args.external_scanner, passes)
 
-    program = parser.Program()
+        for index, program in enumerate(programs):
+            try:
+                if args.generalize:
+                    Compiler.typecheck_components(program, args.jobs or None, passes, typecheckCache)
+                else:
+                    Compiler.typecheck(program, passes)
+            except SourceError as error:
+                error.source = index
+                raise
+    except SourceError as error:
+        sourceFile = args.sources[error.source if error.source is not None else 0]
+        print(LineIndex(path=sourceFile).describe(error), file=sys.stderr)
+        exit(1)
 
+    if passes is not None:
+        print(passes.report_json() if args.passes_json else passes.report(), file=sys.stderr)
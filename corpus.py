@@ -0,0 +1,173 @@
+#!/usr/bin/python3
+from shotel_ast import BinaryOperation
+import argparse
+import random
+
+class CorpusGenerator:
+    '''
+    Generates synthetic Shotel programs to measure how the compiler scales.
+    The programs parse and typecheck, with every operator typed as Int -> Int -> Int:
+    all values are Int and every function and constructor parameter is used as one.
+    The same knobs and seed always produce the same program.
+    '''
+    # operator tokens by the kind of BinaryOperation they parse into
+    Operators = {
+        BinaryOperation.BinaryOperationKind.PLUS: "+",
+        BinaryOperation.BinaryOperationKind.MINUS: "-",
+        BinaryOperation.BinaryOperationKind.TIMES: "*",
+        BinaryOperation.BinaryOperationKind.DIVIDE: "/",
+        BinaryOperation.BinaryOperationKind.MODULO: "%",
+        BinaryOperation.BinaryOperationKind.RSHIFT: ">>",
+        BinaryOperation.BinaryOperationKind.LSHIFT: "<<",
+        BinaryOperation.BinaryOperationKind.AND: "and",
+        BinaryOperation.BinaryOperationKind.OR: "or",
+        BinaryOperation.BinaryOperationKind.XOR: "xor",
+        BinaryOperation.BinaryOperationKind.EQUALS: "==",
+        BinaryOperation.BinaryOperationKind.NEQUALS: "!=",
+    }
+
+    def __init__(self, types = 8, fns = 64, arity = 2, depth = 3, branches = 3, chain = 3, params = 2, seed = 0):
+        '''
+        types and fns are the number of type and fn definitions,
+        arity the number of parameters of every constructor and params that of every function.
+        depth is the nesting depth of expressions, each level being a chain of chain operands.
+        branches is the number of constructors of every type, so the number of branches of a case on it.
+        '''
+        self.types = types
+        self.fns = fns
+        self.arity = arity
+        self.depth = depth
+        self.branches = max(branches, 1)
+        self.chain = max(chain, 1)
+        self.params = params
+        self.random = random.Random(seed)
+
+    def Name(prefix, index):
+        '''Identifiers cannot contain digits, so indexes are written in base 26 with letters.'''
+        letters = ""
+
+        while True:
+            letters = chr(ord('a') + index % 26) + letters
+            index //= 26
+
+            if index == 0:
+                return prefix + letters
+
+    def TypeName(self, index):
+        return CorpusGenerator.Name("T", index)
+
+    def ConstructorName(self, typeIndex, index):
+        return CorpusGenerator.Name("K", typeIndex * self.branches + index)
+
+    def FnName(self, index):
+        return CorpusGenerator.Name("F", index)
+
+    def generate(self):
+        '''Returns the source text of a program.'''
+        definitions = [self.Type(index) for index in range(self.types)]
+        definitions += [self.Fn(index) for index in range(self.fns)]
+
+        return "\n\n".join(definitions) + "\n"
+
+    def Type(self, index):
+        params = " Int" * self.arity
+        constructors = [self.ConstructorName(index, constructor) + params for constructor in range(self.branches)]
+
+        return f"type {self.TypeName(index)} = " + ", ".join(constructors)
+
+    def Fn(self, index):
+        params = [CorpusGenerator.Name("p", param) for param in range(self.params)]
+        header = " ".join([f"fn {self.FnName(index)}"] + params)
+
+        # use every parameter once, so all of them are typed Int
+        body = self.Sum(params + [self.Expression(self.depth, params)])
+
+        return f"{header}\n{{\n    {body}\n}}"
+
+    def Expression(self, depth, scope):
+        '''An Int expression of the given depth over the variables in scope.'''
+        if depth == 0:
+            return self.Leaf(scope)
+
+        operands = [self.Operand(depth - 1, scope) for _ in range(self.chain)]
+        operators = self.random.choices(list(CorpusGenerator.Operators.values()), k = self.chain - 1)
+
+        expression = operands[0]
+
+        for operator, operand in zip(operators, operands[1:]):
+            expression += f" {operator} {operand}"
+
+        return expression
+
+    def Operand(self, depth, scope):
+        if depth == 0:
+            return self.Leaf(scope)
+
+        kind = self.random.randrange(4 if self.types > 0 else 3)
+
+        if kind == 0:
+            return f"({self.Expression(depth, scope)})"
+        elif kind == 1:
+            return f"!({self.Expression(depth, scope)})"
+        elif kind == 2:
+            return self.Application(depth, scope)
+        else:
+            return self.Case(depth, scope)
+
+    def Application(self, depth, scope):
+        callee = self.FnName(self.random.randrange(self.fns))
+        args = [f"({self.Expression(depth - 1, scope)})" for _ in range(self.params)]
+
+        return "(" + " ".join([callee] + args) + ")"
+
+    def Case(self, depth, scope):
+        typeIndex = self.random.randrange(self.types)
+        constructor = self.ConstructorName(typeIndex, self.random.randrange(self.branches))
+        args = [f"({self.Expression(depth - 1, scope)})" for _ in range(self.arity)]
+
+        branches = []
+
+        for index in range(self.branches):
+            # the last branch matches the rest with a variable once in a while
+            if index == self.branches - 1 and index > 0 and self.random.random() < 0.5:
+                pattern = "other"
+                variables = []
+            else:
+                variables = [CorpusGenerator.Name("v", variable) for variable in range(self.arity)]
+                pattern = " ".join([self.ConstructorName(typeIndex, index)] + variables)
+
+            # bound variables are used once, so they are typed Int
+            body = self.Sum(variables + [self.Expression(depth - 1, scope + variables)])
+            branches.append(f"| {pattern} => {{ {body} }}")
+
+        # parenthesized, so that the branches end before the rest of the enclosing expression
+        return f"(case ({' '.join([constructor] + args)}) " + " ".join(branches) + ")"
+
+    def Sum(self, terms):
+        '''Adds up the terms. A lone term gets an Int added, an application alone could leave its type open.'''
+        if len(terms) == 1:
+            terms.append(self.Leaf([]))
+
+        return " + ".join(terms)
+
+    def Leaf(self, scope):
+        if scope and self.random.random() < 0.5:
+            return self.random.choice(scope)
+
+        return str(self.random.randrange(1000))
+
+
+if __name__ == "__main__":
+    argparser = argparse.ArgumentParser(description="Generates a synthetic Shotel program.")
+    argparser.add_argument("--types", type=int, default=8, help="number of type definitions")
+    argparser.add_argument("--fns", type=int, default=64, help="number of fn definitions")
+    argparser.add_argument("--arity", type=int, default=2, help="parameters of every constructor")
+    argparser.add_argument("--params", type=int, default=2, help="parameters of every function")
+    argparser.add_argument("--depth", type=int, default=3, help="nesting depth of expressions")
+    argparser.add_argument("--branches", type=int, default=3, help="constructors per type and branches per case")
+    argparser.add_argument("--chain", type=int, default=3, help="operands per operator chain")
+    argparser.add_argument("--seed", type=int, default=0)
+    args = argparser.parse_args()
+
+    generator = CorpusGenerator(args.types, args.fns, args.arity, args.depth, args.branches, args.chain, args.params, args.seed)
+    print(generator.generate(), end="")
@@ -0,0 +1,39 @@
+from corpus import CorpusGenerator
+from benchmark import Benchmark, CountingTypeManager
+from compiler import Compiler
+from shotel_ast import FnDefinition, TypeDefinition
+
+def test_corpus_knobs():
+    text = CorpusGenerator(types=3, fns=5, arity=4, branches=2, seed=1).generate()
+    program = Compiler.compile_from_text(text)
+
+    types = [definition for definition in program if isinstance(definition, TypeDefinition)]
+    fns = [definition for definition in program if isinstance(definition, FnDefinition)]
+
+    assert len(types) == 3 and len(fns) == 5
+    assert all(len(definition.constructors) == 2 for definition in types)
+    assert all(len(constructor.types) == 4 for definition in types for constructor in definition.constructors)
+
+def test_corpus_reproducible():
+    assert CorpusGenerator(seed=3).generate() == CorpusGenerator(seed=3).generate()
+    assert CorpusGenerator(seed=3).generate() != CorpusGenerator(seed=4).generate()
+
+def test_corpus_typechecks():
+    for seed in range(12):
+        generator = CorpusGenerator(types=seed % 3, fns=6, arity=seed % 3, depth=seed % 4,
+            branches=1 + seed % 4, chain=1 + seed % 3, params=seed % 3, seed=seed)
+        program = Compiler.compile_from_text(generator.generate())
+        typeManager = CountingTypeManager()
+
+        program.typecheck(typeManager, Compiler.operator_environment())
+
+        for definition in program:
+            if isinstance(definition, FnDefinition):
+                assert typeManager.getResolvedType(definition.return_type).name == "Int"
+
+def test_benchmark_phases():
+    text = CorpusGenerator(fns=4, seed=2).generate()
+    results = Benchmark(text, repeat=1).run()
+
+    assert [phase for phase, _, _ in results] == ["scanner (dfa)", "TokenConverter", "Parser", "Parser (arena)", "TableParser", "typecheck"]
+    assert all(count > 0 for _, _, counts in results for count in counts.values())
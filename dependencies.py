@@ -0,0 +1,425 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import nullcontext
+from shotel_ast import IntNode, StringNode, LID, UID, BinaryOperation, UnaryOperation, PatternConstructor, FnDefinition, SymbolNames, walk
+from typechecker import TypeManager, Environment, ScopedEnvironment, VariableType, BaseType, TypeScheme, TypeBindingError, rebuild
+from diagnostics import SourceError
+from symbols import Symbols
+from prelude import Prelude
+
+# the field of the nodes, other than their symbols and children, deciding their types
+StructureFields = {IntNode: "value", StringNode: "value", BinaryOperation: "kind", UnaryOperation: "kind"}
+
+class DependencyGraph:
+    '''
+    The references between the top level definitions of a program: edges[index] holds the indices
+    of the definitions whose names definition index refers to. A name bound by several definitions
+    refers to the last of them, the one a lookup finds once the first pass bound them all.
+    '''
+    def __init__(self, definitions, structures = False):
+        self.definitions = definitions
+        # index of the definition binding each symbol
+        self.owners = {}
+
+        for index, definition in enumerate(definitions):
+            for symbol in DependencyGraph.bound_symbols(definition):
+                self.owners[symbol] = index
+
+        # with structures, the text of each definition, see structure
+        self.structures = None
+
+        if structures:
+            described = [DependencyGraph.describe(definition) for definition in definitions]
+            self.uses = [uses for uses, structure in described]
+            self.structures = [structure for uses, structure in described]
+        else:
+            self.uses = [DependencyGraph.referenced_symbols(definition) for definition in definitions]
+
+        self.edges = [sorted({self.owners[symbol] for symbol in uses if symbol in self.owners}) for uses in self.uses]
+
+    def bound_symbols(definition):
+        if isinstance(definition, FnDefinition):
+            return {definition.symbol}
+
+        return {constructor.symbol for constructor in definition.constructors}
+
+    def referenced_symbols(definition):
+        return {node.symbol for node, entering in walk(definition) if entering and isinstance(node, (LID, UID, PatternConstructor))}
+
+    def describe(definition):
+        '''
+        The referenced symbols of the definition with its structure, in one walk: the classes and fields
+        of its nodes as text, but their offsets and inferred types, so it changes with its meaning only.
+        '''
+        name = Symbols.name
+        uses = set()
+        parts = []
+        stack = [definition]
+
+        while stack:
+            node = stack.pop()
+
+            # the end of the children of a node
+            if node is None:
+                parts.append(")")
+                continue
+
+            kind = type(node)
+            parts.append(kind.__name__)
+
+            if kind in StructureFields:
+                parts.append(repr(getattr(node, StructureFields[kind])))
+
+            if isinstance(node, SymbolNames):
+                if kind in (LID, UID, PatternConstructor):
+                    uses.add(node.symbol)
+
+                for field in node.SymbolFields:
+                    parts.append(name(getattr(node, field)))
+
+                for field in node.SymbolListFields:
+                    parts.append(repr([name(symbol) for symbol in getattr(node, field)]))
+
+            stack.append(None)
+            stack.extend(reversed(node.children()))
+
+        return uses, " ".join(parts)
+
+    def components(self):
+        '''
+        The strongly connected components, as sorted lists of indices, each after the components it refers to.
+        Tarjan's algorithm, with the depth first search on its own stack as chains of calls can be long.
+        '''
+        count = len(self.definitions)
+        order = [None] * count
+        low = [0] * count
+        onStack = [False] * count
+        stack = []
+        components = []
+        visited = 0
+
+        for root in range(count):
+            if order[root] is not None:
+                continue
+
+            order[root] = low[root] = visited
+            visited += 1
+            stack.append(root)
+            onStack[root] = True
+            # definitions being visited, with the position of the next edge to follow
+            work = [(root, 0)]
+
+            while work:
+                node, position = work[-1]
+                edges = self.edges[node]
+
+                if position < len(edges):
+                    work[-1] = (node, position + 1)
+                    target = edges[position]
+
+                    if order[target] is None:
+                        order[target] = low[target] = visited
+                        visited += 1
+                        stack.append(target)
+                        onStack[target] = True
+                        work.append((target, 0))
+                    elif onStack[target]:
+                        low[node] = min(low[node], order[target])
+
+                    continue
+
+                work.pop()
+
+                if work:
+                    parent = work[-1][0]
+                    low[parent] = min(low[parent], low[node])
+
+                if low[node] == order[node]:
+                    component = []
+
+                    while True:
+                        member = stack.pop()
+                        onStack[member] = False
+                        component.append(member)
+
+                        if member == node:
+                            break
+
+                    component.sort()
+                    components.append(component)
+
+        return components
+
+class SccTypechecker:
+    '''
+    Typechecks a program one strongly connected component of functions at a time, in dependency order,
+    generalizing the types of each component before its users are checked: a function may then be used
+    at other types by each of them, as in let polymorphism. Functions of one component stay monomorphic
+    among themselves. Constructors are bound first, and their param types stay unknowns shared by the
+    whole program, as in Program.typecheck: they are never generalized.
+
+    Components whose dependencies are all checked form a wave, checked independently of each other,
+    in worker processes when workers is above 1. Each check has its own TypeManager and gets the
+    signatures it refers to by name; it returns the schemes of its functions and what it learned about
+    the shared unknowns, which are merged into typeManager. Results do not depend on the workers.
+    A check stops at its first error, and the error of the first failing component of the earliest
+    failing wave is raised. The definitions keep the types of the manager that checked them, the
+    signatures are the results: by symbol, a TypeScheme for functions and a type for constructors.
+    Checks start from the Prelude; a root other than it is an Environment without parent whose bindings
+    are sent to every check, binding the operators by name.
+    With a TypecheckCache, components already checked with the same signatures are not checked again.
+    '''
+    def __init__(self, program, root = Prelude, workers = 1, chunks_per_worker = 4, cache = None):
+        self.definitions = program.definitions
+        self.root = {} if root is Prelude else {Symbols.name(symbol): bound for symbol, bound in root.bindings.items()}
+        self.prelude = root is Prelude
+        self.workers = workers or os.cpu_count() or 1
+        self.chunks_per_worker = chunks_per_worker
+        self.typeManager = TypeManager()
+        self.signatures = {}
+        self.graph = DependencyGraph(self.definitions, structures = cache is not None)
+        self.cache = cache
+
+        # components checked in each wave, for the statistics
+        self.waves = []
+        # components whose results came from the cache
+        self.cached = 0
+
+    def typecheck(self):
+        definitions = self.definitions
+        owners = self.graph.owners
+
+        for index, definition in enumerate(definitions):
+            if not isinstance(definition, FnDefinition):
+                env = Environment()
+                definition.typecheck_first_pass(self.typeManager, env)
+
+                for symbol, constructorType in env.bindings.items():
+                    if owners[symbol] == index:
+                        self.signatures[symbol] = constructorType
+
+        components = [component for component in self.graph.components() if isinstance(definitions[component[0]], FnDefinition)]
+        waves = []
+        # wave of the component of each definition checked
+        levels = {}
+
+        for component in components:
+            # the definitions of the component are not in levels yet
+            level = max((levels[target] + 1 for index in component for target in self.graph.edges[index] if target in levels), default=0)
+
+            for index in component:
+                levels[index] = level
+
+            if level == len(waves):
+                waves.append([])
+
+            waves[level].append(component)
+
+        self.waves = [len(wave) for wave in waves]
+
+        with ProcessPoolExecutor(max_workers=self.workers) if self.workers > 1 else nullcontext() as pool:
+            for wave in waves:
+                wave.sort()
+                self.check_wave(wave, pool)
+
+    def check_wave(self, wave, pool):
+        reserved = len(self.typeManager.bindings)
+        tasks = [([self.definitions[index] for index in component], self.environment(component), reserved, self.prelude) for component in wave]
+        results = [None] * len(tasks)
+        keys = [None] * len(tasks)
+
+        if self.cache is not None:
+            for position, task in enumerate(tasks):
+                keys[position] = SccTypechecker.cache_key(task, [self.graph.structures[index] for index in wave[position]])
+                stored = self.cache.get(keys[position][0])
+
+                if stored is not None:
+                    variables = keys[position][1]
+                    results[position] = SccTypechecker.relocate(stored,
+                        lambda number: variables[number] if number < len(variables) else reserved + number - len(variables))
+                    self.cached += 1
+
+        missing = [position for position, result in enumerate(results) if result is None]
+        checking = [tasks[position] for position in missing]
+
+        if pool is None or len(checking) < 2:
+            checked = list(map(SccTypechecker.check, checking))
+        else:
+            size = -(-len(checking) // (self.workers * self.chunks_per_worker))
+            batches = [checking[start:start + size] for start in range(0, len(checking), size)]
+            checked = [result for batch in pool.map(SccTypechecker.check_batch, batches) for result in batch]
+
+        for position, result in zip(missing, checked):
+            results[position] = result
+
+            # errors are checked again, their offsets would not follow the definitions
+            if self.cache is not None and result[2] is None:
+                numbers = {variable: number for number, variable in enumerate(keys[position][1])}
+                self.cache.put(keys[position][0], SccTypechecker.relocate(result,
+                    lambda variable: numbers[variable] if variable < reserved else len(numbers) + variable - reserved))
+
+        for component, (schemes, views, error) in zip(wave, results):
+            if error is not None:
+                raise error
+
+        for component, (schemes, views, error) in zip(wave, results):
+            self.merge(component, schemes, views, reserved)
+
+    def cache_key(task, structures):
+        '''
+        The key of a component check in a TypecheckCache: the structures of its definitions and the signatures
+        they refer to, with the variables of these numbered in order of appearance.
+        Returns the key and the ids of the variables, by number.
+        '''
+        environment = task[1]
+        numbers = {}
+        parts = list(structures) if task[3] else [*structures, "without the prelude"]
+
+        def text(someType):
+            stack = [someType]
+            written = []
+
+            while stack:
+                node = stack.pop()
+
+                if isinstance(node, str):
+                    written.append(node)
+                elif isinstance(node, VariableType):
+                    written.append(f"t{numbers.setdefault(node.id, len(numbers))}")
+                elif isinstance(node, BaseType):
+                    written.append(node.name)
+                else:
+                    stack += [")", node.right, " -> ", node.left, "("]
+
+            return "".join(written)
+
+        for name in sorted(environment):
+            bound = environment[name]
+
+            if isinstance(bound, TypeScheme):
+                parts.append(f"{name} : {text(bound.type)} forall {[numbers[variable] for variable in bound.variables]}")
+            else:
+                parts.append(f"{name} : {text(bound)}")
+
+        return "\n".join(parts).encode(), sorted(numbers, key=numbers.get)
+
+    def relocate(result, renumber):
+        '''
+        The result of a check with each variable id replaced by renumber(id). Cached results number
+        the variables of their key first, in order, then the new variables of the check.
+        '''
+        schemes, views, error = result
+
+        def leaf(node):
+            return VariableType(renumber(node.id)) if isinstance(node, VariableType) else node
+
+        schemes = [TypeScheme([renumber(variable) for variable in scheme.variables], rebuild(scheme.type, leaf)) for scheme in schemes]
+        views = {renumber(variable): rebuild(view, leaf) for variable, view in views.items()}
+
+        return schemes, views, error
+
+    def environment(self, component):
+        '''The types a component refers to outside of it, by name, with the operators.'''
+        environment = dict(self.root)
+        substitute = self.typeManager.substitute
+        members = set(component)
+
+        for index in component:
+            for symbol in self.graph.uses[index]:
+                bound = self.signatures.get(symbol)
+
+                if bound is None or self.graph.owners[symbol] in members:
+                    continue
+
+                if isinstance(bound, TypeScheme):
+                    bound = TypeScheme(bound.variables, substitute(bound.type))
+                else:
+                    bound = substitute(bound)
+
+                environment[Symbols.name(symbol)] = bound
+
+        return environment
+
+    def check(task):
+        '''
+        Typechecks the definitions of a component, returning the schemes of their types, the types it bound
+        the variables of the environment to, by id, and the error stopping it. Variables with ids from
+        reserved on are new, the others belong to the merging manager. Without the Prelude, the operators
+        are looked up by name in the environment.
+        '''
+        definitions, environment, reserved, prelude = task
+        typeManager = TypeManager(reserved)
+        env = ScopedEnvironment(Prelude) if prelude else ScopedEnvironment()
+        shared = set()
+
+        for name, bound in environment.items():
+            env.bind(name, bound)
+
+            if isinstance(bound, TypeScheme):
+                shared |= typeManager.free_variables(bound.type) - set(bound.variables)
+            else:
+                shared |= typeManager.free_variables(bound)
+
+        try:
+            for definition in definitions:
+                definition.typecheck_first_pass(typeManager, env)
+
+            for definition in definitions:
+                definition.typecheck_second_pass(typeManager, env)
+        except SourceError as error:
+            return None, None, error
+
+        views = {variable: typeManager.substitute(VariableType(variable)) for variable in shared if typeManager.bindings[variable] is not None}
+        free = set()
+
+        for variable in shared:
+            free |= typeManager.free_variables(VariableType(variable))
+
+        schemes = [typeManager.generalize(env.lookup(definition.symbol), free) for definition in definitions]
+
+        return schemes, views, None
+
+    def check_batch(tasks):
+        return [SccTypechecker.check(task) for task in tasks]
+
+    def merge(self, component, schemes, views, reserved):
+        '''Adds the results of a component check, renaming its new variables to variables of typeManager.'''
+        typeManager = self.typeManager
+        renamed = {}
+
+        def leaf(node):
+            if isinstance(node, VariableType) and node.id >= reserved:
+                variable = renamed.get(node.id)
+
+                if variable is None:
+                    variable = renamed[node.id] = typeManager.new_type()
+
+                return variable
+
+            return node
+
+        for variable, view in views.items():
+            try:
+                typeManager.unify(VariableType(variable), rebuild(view, leaf, typeManager.arrow))
+            except TypeBindingError as error:
+                raise error.locate(self.definitions[component[0]].offset)
+
+        for index, scheme in zip(component, schemes):
+            definition = self.definitions[index]
+
+            if self.graph.owners[definition.symbol] == index:
+                body = rebuild(scheme.type, leaf, typeManager.arrow)
+                self.signatures[definition.symbol] = TypeScheme([renamed[variable].id for variable in scheme.variables], body)
+
+    def signature(self, name):
+        '''The type of a top level name, resolved, a TypeScheme for functions; None if it is unbound.'''
+        bound = self.signatures.get(Symbols.intern(name))
+
+        if isinstance(bound, TypeScheme):
+            body = self.typeManager.substitute(bound.type)
+
+            return TypeScheme(sorted(self.typeManager.free_variables(body) & set(bound.variables)), body)
+        elif bound is not None:
+            return self.typeManager.substitute(bound)
+
+        return None
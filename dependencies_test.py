@@ -0,0 +1,118 @@
+from compiler import Compiler
+from dependencies import DependencyGraph, SccTypechecker
+from corpus import CorpusGenerator
+from shotel_ast import FnDefinition, BinaryOperation
+from typechecker import TypeBindingError, VariableType, BaseType, ArrowType, TypeScheme, Environment
+import prelude
+import pytest
+
+def show(someType, names = None):
+    '''The type as text, its variables named in order of appearance, so renamed types compare equal.'''
+    names = {} if names is None else names
+
+    if isinstance(someType, TypeScheme):
+        return show(someType.type, names)
+    elif isinstance(someType, VariableType):
+        return names.setdefault(someType.id, f"a{len(names)}")
+    elif isinstance(someType, BaseType):
+        return someType.name
+
+    return f"({show(someType.left, names)} -> {show(someType.right, names)})"
+
+def test_components_in_dependency_order():
+    program = Compiler.compile_from_text("fn Even n { Odd n }\nfn Odd n { Even n }\nfn Main { Even 1 + Other }\nfn Other { 2 }\ntype Bool = True\nfn Yes { True }\n")
+    components = DependencyGraph(program.definitions).components()
+
+    assert sorted(components) == [[0, 1], [2], [3], [4], [5]]
+    assert components.index([0, 1]) < components.index([2]) and components.index([3]) < components.index([2])
+    assert components.index([4]) < components.index([5])
+
+def test_functions_are_generalized():
+    text = "fn Id x { x }\nfn A { Id 1 }\nfn B { Id \"b\" }\nfn F a b { G a }\nfn G a { F a 1 }\n"
+
+    with pytest.raises(TypeBindingError):
+        Compiler.typecheck(Compiler.compile_from_text(text))
+
+    checker = Compiler.typecheck_components(Compiler.compile_from_text(text))
+
+    assert show(checker.signature("Id")) == "(a0 -> a0)"
+    assert (show(checker.signature("A")), show(checker.signature("B"))) == ("Int", "String")
+    # one component, monomorphic inside it
+    assert show(checker.signature("F")) == "(a0 -> (Int -> a1))"
+    assert show(checker.signature("G")) == "(a0 -> a1)"
+    assert checker.waves == [2, 2]
+
+def test_constructor_params_are_shared():
+    text = "type Box = Box X\nfn Make { Box 1 }\nfn Open b { case b | Box x => { x } }\n"
+    checker = Compiler.typecheck_components(Compiler.compile_from_text(text))
+
+    assert show(checker.signature("Box")) == "(Int -> Box)"
+    assert show(checker.signature("Open")) == "(Box -> Int)"
+
+    # checked in the same wave, the conflict shows when their results are merged
+    with pytest.raises(TypeBindingError) as error:
+        Compiler.typecheck_components(Compiler.compile_from_text(text + "fn Other { Box \"s\" }\n"), workers = 2)
+
+    assert error.value.offset == len(text)
+
+    # checked after Make, with its result
+    text = "type Box = Box X\nfn Make { Box 1 }\nfn Other { Make + Box \"s\" }\n"
+    with pytest.raises(TypeBindingError) as error:
+        Compiler.typecheck_components(Compiler.compile_from_text(text))
+
+    assert error.value.offset > text.index("fn Other")
+
+def test_workers_match_a_single_process():
+    program = Compiler.compile_from_text(CorpusGenerator(types=3, fns=40, depth=3, seed=7).generate())
+    functions = [definition for definition in program.definitions if isinstance(definition, FnDefinition)]
+    single = Compiler.typecheck_components(program)
+    parallel = Compiler.typecheck_components(program, workers = 2)
+
+    assert [show(single.signature(fn.name)) for fn in functions] == [show(parallel.signature(fn.name)) for fn in functions]
+
+    # where the whole program fixes a type, generalizing finds the same one
+    typeManager = Compiler.typecheck(program)
+    ground = 0
+
+    for fn in functions:
+        generalized = show(single.signature(fn.name))
+
+        if "a0" in generalized:
+            continue
+
+        monomorphic = fn.return_type
+
+        for paramType in reversed(fn.param_types):
+            monomorphic = ArrowType(paramType, monomorphic)
+
+        assert show(typeManager.substitute(monomorphic)) == generalized
+        ground += 1
+
+    assert ground > 0
+
+def test_custom_root():
+    # the operators of a root other than the Prelude are looked up by the names it binds
+    root = Environment()
+    plus = BinaryOperation.KindSymbols[BinaryOperation.BinaryOperationKind.PLUS]
+
+    for symbol, signature in prelude.bindings().items():
+        root.bind(symbol, ArrowType(prelude.STRING, ArrowType(prelude.STRING, prelude.STRING)) if symbol == plus else signature)
+
+    program = Compiler.compile_from_text("fn A { \"a\" + \"b\" }\nfn B { 1 - 2 }\n")
+    checker = SccTypechecker(program, root)
+    checker.typecheck()
+
+    assert (show(checker.signature("A")), show(checker.signature("B"))) == ("String", "Int")
+
+    with pytest.raises(TypeBindingError):
+        SccTypechecker(program).typecheck()
+
+def test_workers_check_deep_definitions():
+    depth = 3000
+    names = ["A", "B", "C", "D"]
+    text = "".join(f"fn {name} a {{ " + "(a + " * depth + "1" + ")" * depth + " }\n" for name in names)
+    text += "fn Case b { " + "case b | x => { " * depth + "x" + " }" * depth + " }\n"
+    checker = Compiler.typecheck_components(Compiler.compile_from_text(text), workers = 2)
+
+    assert [show(checker.signature(name)) for name in names] == ["(Int -> Int)"] * 4
+    assert show(checker.signature("Case")) == "(a0 -> a0)"
@@ -0,0 +1,73 @@
+from bisect import bisect_right
+
+class SourceError(Exception):
+    '''
+    An error about a place in the source.
+    offset is the offset of that place in the source text, None when it is unknown.
+    source is the index of the source when a batch of sources is compiled.
+    '''
+    def __init__(self, message = "", offset = None):
+        super().__init__(message)
+        self.offset = offset
+        self.source = None
+
+    def locate(self, offset):
+        '''Sets the offset of the error, unless a more precise one is already set.'''
+        if self.offset is None:
+            self.offset = offset
+
+        return self
+
+class LineIndex:
+    '''
+    Converts source offsets to 1-based line and column numbers.
+    The offsets of the line starts are only found the first time a position is asked for,
+    so compiles that need no positions never pay for them.
+    The source is a text, or the path of a file that is read then.
+    '''
+    def __init__(self, text = None, path = None):
+        self.text = text
+        self.path = path
+        self.starts = None
+
+    def line_starts(self):
+        if self.starts is None:
+            starts = [0]
+
+            for base, text in self.chunks():
+                newline = text.find("\n")
+                while newline != -1:
+                    starts.append(base + newline + 1)
+                    newline = text.find("\n", newline + 1)
+
+            self.starts = starts
+
+        return self.starts
+
+    def chunks(self, chunk_size = 1 << 20):
+        if self.text is not None:
+            yield 0, self.text
+            return
+
+        base = 0
+        with open(self.path, encoding='ascii') as source:
+            for chunk in iter(lambda: source.read(chunk_size), ""):
+                yield base, chunk
+                base += len(chunk)
+
+    def position(self, offset: int):
+        '''The (line, column) of an offset.'''
+        starts = self.line_starts()
+        line = bisect_right(starts, offset)
+
+        return line, offset - starts[line - 1] + 1
+
+    def describe(self, error: 'SourceError'):
+        '''The error message prefixed with the location of the error, as name:line:column.'''
+        name = self.path if self.path is not None else "<source>"
+
+        if error.offset is None:
+            return f"{name}: {error}"
+
+        line, column = self.position(error.offset)
+        return f"{name}:{line}:{column}: {error}"
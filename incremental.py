@@ -0,0 +1,272 @@
+import copy
+from tokenizer import Lexer, TokenType
+from parser import Parser
+from shotel_ast import Program
+from typechecker import TypeManager
+from prelude import Prelude
+from diagnostics import SourceError
+from compiler import Compiler
+from dependencies import DependencyGraph
+from symbols import Symbols
+
+# tokens starting a definition, they appear nowhere else
+DEFINITION_STARTS = (TokenType.FN.value, TokenType.TYPE.value)
+
+class DefinitionSpan:
+    '''
+    The tokens of one top level definition, from its FN or TYPE token to the next one,
+    with the definition parsed from them, or the error parsing them raised.
+    Nodes keep the offsets they were parsed at, shift is how far the span has moved since.
+    '''
+    def __init__(self, start, count, definition = None, error = None):
+        self.start = start
+        self.count = count
+        self.definition = definition
+        self.error = error
+        self.shift = 0
+
+        # symbols bound by the definition and the symbols its body refers to
+        self.defines = set()
+        self.uses = set()
+
+        if definition is not None:
+            self.defines = DependencyGraph.bound_symbols(definition)
+            self.uses = DependencyGraph.referenced_symbols(definition)
+
+class CheckedComponent:
+    '''
+    Definitions referring to each other, typechecked together in their own type manager and scope.
+    Definitions share type variables only through the names they bind, so definitions of
+    other components can neither change these types nor be changed by them.
+    '''
+    def __init__(self, spans, root):
+        self.spans = spans
+        self.typeManager = TypeManager()
+        self.env = root.new_scope()
+        self.error = None
+        self.error_span = None
+
+        for span in spans:
+            span.definition.typecheck_first_pass(self.typeManager, self.env)
+
+        # as Program.typecheck, the first error stops the component
+        for span in spans:
+            try:
+                span.definition.typecheck_second_pass(self.typeManager, self.env)
+            except SourceError as error:
+                self.error = error
+                self.error_span = span
+                break
+
+class IncrementalProgram:
+    '''
+    A program kept up to date with the edits of its source, for editors and watch loops.
+    An edit is relexed, then only the definitions whose tokens it touched are parsed again,
+    the others are kept with their nodes. Definitions are typechecked in components of definitions
+    referring to each other, and a component is only checked again if one of its definitions
+    was parsed again or the references joining it changed, so the others keep their inferred types.
+    Components keep their own scope of the root Environment, so it cannot be a ScopedEnvironment.
+    Unlike compile_from_text, every definition is parsed and typechecked even if another has errors.
+    A source that cannot be scanned has no definitions until an edit makes it scan again.
+    The names of edited identifiers stay in Symbols, restart releases those no longer in the source.
+    '''
+    def __init__(self, text, root = None):
+        self.lexer = Lexer()
+        self.root = root if root is not None else Prelude
+        self.text = text
+        # the names interned before the program, see restart
+        self.symbols = Symbols.mark()
+        self.tokens = None
+        self.scan_error = None
+        self.spans = []
+        self.components = {}
+
+        # definitions parsed and typechecked by the last update
+        self.reparsed = 0
+        self.rechecked = 0
+
+        self.scan(lambda: self.lexer.scan(text), {})
+
+    def edit(self, offset, removed, inserted):
+        '''Replaces removed characters at offset with inserted, returns the diagnostics of the new source.'''
+        end = offset + removed
+        delta = len(inserted) - removed
+
+        text = self.text = self.text[:offset] + inserted + self.text[end:]
+
+        if self.tokens is None:
+            self.scan(lambda: self.lexer.scan(text), {})
+            return self.diagnostics()
+
+        tokens = self.tokens
+
+        # spans the edit did not reach, by their start in the new source; a span reaches up to
+        # the start of the next one, and an edit on either of its ends may change its tokens
+        kept = {}
+        ends = [span.start for span in self.spans[1:]] + [len(self.text) - delta]
+
+        for span, spanEnd in zip(self.spans, ends):
+            if spanEnd < offset:
+                kept[span.start] = span
+            elif span.start > end:
+                span.start += delta
+                span.shift += delta
+                kept[span.start] = span
+
+        self.scan(lambda: self.lexer.relex(tokens, offset, removed, inserted), kept)
+
+        return self.diagnostics()
+
+    def restart(self):
+        '''
+        Parses and typechecks the source again from scratch, after releasing the names interned since the
+        program was created, so the symbol table only keeps those of the current source. Nodes and types
+        taken from the program before, or built by others since it was created, must not be used anymore.
+        '''
+        Symbols.release(self.symbols)
+        self.tokens = None
+        self.spans = []
+        self.components = {}
+        self.scan(lambda: self.lexer.scan(self.text), {})
+
+        return self.diagnostics()
+
+    def scan(self, scanner, kept):
+        try:
+            self.tokens = scanner()
+            self.scan_error = None
+        except SourceError as error:
+            self.tokens = None
+            self.scan_error = error
+            self.spans = []
+            self.components = {}
+            self.reparsed = self.rechecked = 0
+            return
+
+        self.update(kept)
+
+    def update(self, kept):
+        '''Splits the tokens into spans, reusing the spans in kept, parses the others and typechecks.'''
+        tokens = self.tokens
+        types = tokens.types.tobytes()
+        starts = [0]
+
+        for token in DEFINITION_STARTS:
+            index = types.find(token, 1)
+
+            while index >= 0:
+                starts.append(index)
+                index = types.find(token, index + 1)
+
+        starts.sort()
+        starts.append(len(types))
+
+        spans = []
+        self.reparsed = 0
+
+        for first, last in zip(starts, starts[1:]):
+            if first == last:
+                continue
+
+            start = tokens.offsets[first]
+            span = kept.get(start)
+
+            if span is None or span.count != last - first:
+                span = IncrementalProgram.parse(tokens.slice(first, last), start, last - first)
+                self.reparsed += 1
+
+            spans.append(span)
+
+        self.spans = spans
+        self.typecheck()
+
+    def parse(tokens, start, count):
+        try:
+            definitions = Parser(tokens).Program().definitions
+        except SourceError as error:
+            return DefinitionSpan(start, count, error = error)
+
+        return DefinitionSpan(start, count, definitions[0] if definitions else None)
+
+    def typecheck(self):
+        '''Typechecks the components that changed, the others keep their earlier results.'''
+        spans = [span for span in self.spans if span.definition is not None]
+        parents = list(range(len(spans)))
+        owners = {}
+
+        def find(index):
+            while parents[index] != index:
+                parents[index] = parents[parents[index]]
+                index = parents[index]
+
+            return index
+
+        for index, span in enumerate(spans):
+            for symbol in span.defines:
+                owners.setdefault(symbol, []).append(index)
+
+        # definitions binding the same name are joined too, the last one hides the others
+        for index, span in enumerate(spans):
+            for symbol in span.uses | span.defines:
+                for owner in owners.get(symbol, ()):
+                    parents[find(owner)] = find(index)
+
+        groups = {}
+
+        for index, span in enumerate(spans):
+            groups.setdefault(find(index), []).append(span)
+
+        components = {}
+        self.rechecked = 0
+
+        for group in groups.values():
+            key = tuple(group)
+            component = self.components.get(key)
+
+            if component is None:
+                component = CheckedComponent(group, self.root)
+                self.rechecked += len(group)
+
+            components[key] = component
+
+        self.components = components
+
+    def program(self):
+        '''The definitions parsed so far, in source order.'''
+        return Program([span.definition for span in self.spans if span.definition is not None])
+
+    def diagnostics(self):
+        '''The parse and type errors of the source, at their offsets in the current text.'''
+        if self.scan_error is not None:
+            return [self.scan_error]
+
+        located = [(span, span.error) for span in self.spans if span.error is not None]
+        located += [(component.error_span, component.error) for component in self.components.values() if component.error is not None]
+        errors = []
+
+        for span, error in located:
+            error = copy.copy(error)
+
+            if error.offset is not None:
+                error.offset += span.shift
+
+            errors.append(error)
+
+        errors.sort(key=lambda error: -1 if error.offset is None else error.offset)
+
+        return errors
+
+    def lookup(self, name):
+        '''The type inferred for a top level name, resolved as far as its type manager can, None if it is unbound.'''
+        symbol = Symbols.find(name)
+
+        if symbol is None:
+            return None
+
+        for component in self.components.values():
+            boundType = component.env.bindings.get(symbol)
+
+            if boundType is not None:
+                return component.typeManager.getResolvedType(boundType)
+
+        return None
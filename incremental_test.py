@@ -0,0 +1,106 @@
+import random
+import re
+from incremental import IncrementalProgram
+from compiler import Compiler
+from corpus import CorpusGenerator
+from parserGenerator_test import repr_tree
+from typechecker import TypeBindingError
+from diagnostics import SourceError
+from symbols import Symbols
+
+def test_edit_reparses_touched_definitions():
+    text = "fn One { 1 }\nfn Two { One + 1 }\nfn Name { \"name\" }\n"
+    program = IncrementalProgram(text)
+
+    assert (program.reparsed, program.rechecked) == (3, 3)
+    assert repr(program.lookup("Two")) == "BaseType.Int"
+
+    # Name refers to neither of the others, its definition and type are kept
+    name = program.program()[2]
+    offset = text.index("1 }")
+    assert program.edit(offset, 1, "2") == []
+    assert (program.reparsed, program.rechecked) == (1, 2)
+    assert program.program()[2] is name
+    assert program.text == text.replace("1 }", "2 }", 1)
+
+def test_diagnostics_follow_edits():
+    text = "fn One { 1 }\nfn Two { One + 1 }\n"
+    program = IncrementalProgram(text)
+
+    errors = program.edit(text.index("1 }"), 1, "\"one\"")
+    assert [type(error) for error in errors] == [TypeBindingError]
+    assert program.text[errors[0].offset] == "+"
+
+    # the error moves with its definition, which is not parsed again
+    errors = program.edit(0, 0, "\n\n\n")
+    assert program.text[errors[0].offset] == "+"
+
+    assert program.edit(program.text.index("\"one\""), 5, "1") == []
+
+def test_parse_errors_keep_other_definitions():
+    text = "fn One { 1 }\nfn Two { 2 }\n"
+    program = IncrementalProgram(text)
+
+    errors = program.edit(text.index("2 }"), 1, "2 +")
+    assert len(errors) == 1 and errors[0].offset == program.text.index("}", program.text.index("+"))
+    assert [definition.name for definition in program.program()] == ["One"]
+
+def shape(node):
+    '''The tree without the offsets, which kept definitions only have relative to their span, and the inferred types.'''
+    if isinstance(node, list):
+        return [shape(item) for item in node]
+    elif isinstance(node, tuple):
+        name, fields = node
+        return name, {field: shape(value) for field, value in fields.items() if field not in ("offset", "return_type", "param_types")}
+
+    return node
+
+def test_edits_match_a_full_compile():
+    text = CorpusGenerator(types=3, fns=12, depth=2, seed=4).generate()
+    program = IncrementalProgram(text)
+    edits = random.Random(1)
+
+    for number in range(60):
+        # edits keeping the source valid: whitespace, new definitions, changed literals
+        kind = edits.randrange(3)
+
+        if kind == 0:
+            offset = edits.choice([index for index, character in enumerate(program.text) if character.isspace()])
+            program.edit(offset, 0, edits.choice([" ", "\n", "\n\n  "]))
+        elif kind == 1:
+            offset = edits.choice([match.start() for match in re.finditer(r"\b(fn|type) ", program.text)] + [len(program.text)])
+            program.edit(offset, 0, f"fn {CorpusGenerator.Name('Added', number)} a {{ a + 1 }}\n")
+        else:
+            literal = edits.choice(list(re.finditer(r"\b\d+\b|\"[a-z]*\"", program.text)))
+            program.edit(literal.start(), literal.end() - literal.start(), edits.choice(["7", "\"seven\""]))
+
+        assert program.scan_error is None and all(span.error is None for span in program.spans)
+        assert [span.start for span in program.spans] == sorted(span.start for span in program.spans)
+
+        full = Compiler.compile_from_text(program.text)
+        assert shape(repr_tree(program.program().definitions)) == shape(repr_tree(full.definitions))
+
+        try:
+            Compiler.typecheck(full)
+            assert program.diagnostics() == []
+        except SourceError:
+            assert program.diagnostics() != []
+
+def test_restart_releases_edited_names():
+    before = len(Symbols)
+    program = IncrementalProgram("fn One { 1 }\nfn Two x { One + x }\n")
+    start = len(Symbols)
+
+    # every edit renames the parameter, interning a new name
+    for index in range(20):
+        name = "restarted" + "w" * index
+        program.edit(0, len(program.text), f"fn One {{ 1 }}\nfn Two {name} {{ One + {name} }}\n")
+
+    assert len(Symbols) == start + 20
+
+    assert program.restart() == []
+    # at most One, Two and the last name are new to the table
+    assert len(Symbols) <= before + 3 and Symbols.find("restartedwww") is None
+    assert Symbols.name(Symbols.find("restarted" + "w" * 19)) == "restarted" + "w" * 19
+    assert repr(program.lookup("One")) == "BaseType.Int"
+    assert program.edit(program.text.index("1 }"), 1, "2") == []
@@ -0,0 +1,102 @@
+# Generated by parserGenerator.py from reference/language.bnf, do not edit.
+
+NONTERMINAL_BASE = 64
+
+# nonterminal names, nonterminal i is symbol NONTERMINAL_BASE + i, tokens are their TokenType values
+NONTERMINALS = ('program', 'definitions', 'definition', 'fn', 'lowercaseParams', 'uppercaseParams', 'type', 'constructors', 'moreConstructors', 'constructor', 'expression', 'comparison', 'add', 'addition', 'mul', 'multiplication', 'or', 'disjunction', 'and', 'conjunction', 'operand', 'application', 'arguments', 'argument', 'base', 'case', 'branches', 'moreBranches', 'branch', 'pattern')
+
+START = 64
+
+# (nonterminal, symbols, action) of each production
+PRODUCTIONS = (
+    (64, (65,), 'Program'),
+    (65, (66, 65), 'Cons'),
+    (65, (), 'Nil'),
+    (66, (67,), None),
+    (66, (70,), None),
+    (67, (13, 27, 68, 17, 74, 18), 'Fn'),
+    (68, (26, 68), 'Cons'),
+    (68, (), 'Nil'),
+    (69, (27, 69), 'Cons'),
+    (69, (), 'Nil'),
+    (70, (14, 27, 23, 71), 'Type'),
+    (71, (73, 72), 'Cons'),
+    (72, (21, 73, 72), 'SeparatedCons'),
+    (72, (), 'Nil'),
+    (73, (27, 69), 'Constructor'),
+    (74, (76, 75), 'Binary'),
+    (75, (24, 74), 'Operator'),
+    (75, (25, 74), 'Operator'),
+    (75, (), None),
+    (76, (78, 77), 'Binary'),
+    (77, (1, 76), 'Operator'),
+    (77, (2, 76), 'Operator'),
+    (77, (7, 76), 'Operator'),
+    (77, (6, 76), 'Operator'),
+    (77, (), None),
+    (78, (80, 79), 'Binary'),
+    (79, (4, 78), 'Operator'),
+    (79, (3, 78), 'Operator'),
+    (79, (5, 78), 'Operator'),
+    (79, (), None),
+    (80, (82, 81), 'Binary'),
+    (81, (9, 80), 'Operator'),
+    (81, (), None),
+    (82, (84, 83), 'Binary'),
+    (83, (8, 82), 'Operator'),
+    (83, (10, 82), 'Operator'),
+    (83, (), None),
+    (84, (11, 85), 'Unary'),
+    (84, (85,), None),
+    (85, (87, 86), 'Application'),
+    (86, (87, 86), 'Cons'),
+    (86, (), 'Nil'),
+    (87, (88,), 'Located'),
+    (88, (12,), 'Value'),
+    (88, (28,), 'String'),
+    (88, (26,), 'Lid'),
+    (88, (27,), 'Uid'),
+    (88, (19, 74, 20), 'Parenthesized'),
+    (88, (89,), None),
+    (89, (15, 74, 90), 'Case'),
+    (90, (92, 91), 'Cons'),
+    (91, (92, 91), 'Cons'),
+    (91, (), 'Nil'),
+    (92, (16, 93, 22, 17, 74, 18), 'Branch'),
+    (93, (26,), 'PatternVar'),
+    (93, (27, 68), 'PatternConstructor'),
+)
+
+# production to expand for each nonterminal and lookahead token value, -1 if there is none
+TABLE = (
+    (0, -1, -1, -1, -1, -1, -1, -1, -1, -1, -1, -1, -1, 0, 0, -1, -1, -1, -1, -1, -1, -1, -1, -1, -1, -1, -1, -1, -1),
+    (2, -1, -1, -1, -1, -1, -1, -1, -1, -1, -1, -1, -1, 1, 1, -1, -1, -1, -1, -1, -1, -1, -1, -1, -1, -1, -1, -1, -1),
+    (-1, -1, -1, -1, -1, -1, -1, -1, -1, -1, -1, -1, -1, 3, 4, -1, -1, -1, -1, -1, -1, -1, -1, -1, -1, -1, -1, -1, -1),
+    (-1, -1, -1, -1, -1, -1, -1, -1, -1, -1, -1, -1, -1, 5, -1, -1, -1, -1, -1, -1, -1, -1, -1, -1, -1, -1, -1, -1, -1),
+    (-1, -1, -1, -1, -1, -1, -1, -1, -1, -1, -1, -1, -1, -1, -1, -1, -1, 7, -1, -1, -1, -1, 7, -1, -1, -1, 6, -1, -1),
+    (9, -1, -1, -1, -1, -1, -1, -1, -1, -1, -1, -1, -1, 9, 9, -1, -1, -1, -1, -1, -1, 9, -1, -1, -1, -1, -1, 8, -1),
+    (-1, -1, -1, -1, -1, -1, -1, -1, -1, -1, -1, -1, -1, -1, 10, -1, -1, -1, -1, -1, -1, -1, -1, -1, -1, -1, -1, -1, -1),
+    (-1, -1, -1, -1, -1, -1, -1, -1, -1, -1, -1, -1, -1, -1, -1, -1, -1, -1, -1, -1, -1, -1, -1, -1, -1, -1, -1, 11, -1),
+    (13, -1, -1, -1, -1, -1, -1, -1, -1, -1, -1, -1, -1, 13, 13, -1, -1, -1, -1, -1, -1, 12, -1, -1, -1, -1, -1, -1, -1),
+    (-1, -1, -1, -1, -1, -1, -1, -1, -1, -1, -1, -1, -1, -1, -1, -1, -1, -1, -1, -1, -1, -1, -1, -1, -1, -1, -1, 14, -1),
+    (-1, -1, -1, -1, -1, -1, -1, -1, -1, -1, -1, 15, 15, -1, -1, 15, -1, -1, -1, 15, -1, -1, -1, -1, -1, -1, 15, 15, 15),
+    (-1, -1, -1, -1, -1, -1, -1, -1, -1, -1, -1, -1, -1, -1, -1, -1, 18, -1, 18, -1, 18, -1, -1, -1, 16, 17, -1, -1, -1),
+    (-1, -1, -1, -1, -1, -1, -1, -1, -1, -1, -1, 19, 19, -1, -1, 19, -1, -1, -1, 19, -1, -1, -1, -1, -1, -1, 19, 19, 19),
+    (-1, 20, 21, -1, -1, -1, 23, 22, -1, -1, -1, -1, -1, -1, -1, -1, 24, -1, 24, -1, 24, -1, -1, -1, 24, 24, -1, -1, -1),
+    (-1, -1, -1, -1, -1, -1, -1, -1, -1, -1, -1, 25, 25, -1, -1, 25, -1, -1, -1, 25, -1, -1, -1, -1, -1, -1, 25, 25, 25),
+    (-1, 29, 29, 27, 26, 28, 29, 29, -1, -1, -1, -1, -1, -1, -1, -1, 29, -1, 29, -1, 29, -1, -1, -1, 29, 29, -1, -1, -1),
+    (-1, -1, -1, -1, -1, -1, -1, -1, -1, -1, -1, 30, 30, -1, -1, 30, -1, -1, -1, 30, -1, -1, -1, -1, -1, -1, 30, 30, 30),
+    (-1, 32, 32, 32, 32, 32, 32, 32, -1, 31, -1, -1, -1, -1, -1, -1, 32, -1, 32, -1, 32, -1, -1, -1, 32, 32, -1, -1, -1),
+    (-1, -1, -1, -1, -1, -1, -1, -1, -1, -1, -1, 33, 33, -1, -1, 33, -1, -1, -1, 33, -1, -1, -1, -1, -1, -1, 33, 33, 33),
+    (-1, 36, 36, 36, 36, 36, 36, 36, 34, 36, 35, -1, -1, -1, -1, -1, 36, -1, 36, -1, 36, -1, -1, -1, 36, 36, -1, -1, -1),
+    (-1, -1, -1, -1, -1, -1, -1, -1, -1, -1, -1, 37, 38, -1, -1, 38, -1, -1, -1, 38, -1, -1, -1, -1, -1, -1, 38, 38, 38),
+    (-1, -1, -1, -1, -1, -1, -1, -1, -1, -1, -1, -1, 39, -1, -1, 39, -1, -1, -1, 39, -1, -1, -1, -1, -1, -1, 39, 39, 39),
+    (-1, 41, 41, 41, 41, 41, 41, 41, 41, 41, 41, -1, 40, -1, -1, 40, 41, -1, 41, 40, 41, -1, -1, -1, 41, 41, 40, 40, 40),
+    (-1, -1, -1, -1, -1, -1, -1, -1, -1, -1, -1, -1, 42, -1, -1, 42, -1, -1, -1, 42, -1, -1, -1, -1, -1, -1, 42, 42, 42),
+    (-1, -1, -1, -1, -1, -1, -1, -1, -1, -1, -1, -1, 43, -1, -1, 48, -1, -1, -1, 47, -1, -1, -1, -1, -1, -1, 45, 46, 44),
+    (-1, -1, -1, -1, -1, -1, -1, -1, -1, -1, -1, -1, -1, -1, -1, 49, -1, -1, -1, -1, -1, -1, -1, -1, -1, -1, -1, -1, -1),
+    (-1, -1, -1, -1, -1, -1, -1, -1, -1, -1, -1, -1, -1, -1, -1, -1, 50, -1, -1, -1, -1, -1, -1, -1, -1, -1, -1, -1, -1),
+    (-1, 52, 52, 52, 52, 52, 52, 52, 52, 52, 52, -1, 52, -1, -1, 52, 51, -1, 52, 52, 52, -1, -1, -1, 52, 52, 52, 52, 52),
+    (-1, -1, -1, -1, -1, -1, -1, -1, -1, -1, -1, -1, -1, -1, -1, -1, 53, -1, -1, -1, -1, -1, -1, -1, -1, -1, -1, -1, -1),
+    (-1, -1, -1, -1, -1, -1, -1, -1, -1, -1, -1, -1, -1, -1, -1, -1, -1, -1, -1, -1, -1, -1, -1, -1, -1, -1, 54, 55, -1),
+)
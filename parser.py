@@ -1,79 +1,269 @@
 #!/usr/bin/python3
-from collections import deque
 from enum import Enum
-from tokenizer import Token, TokenType
+from tokenizer import Token, TokenType, TokenTypes, TokenBuffer
+from diagnostics import SourceError
 import parser_helper
+import language_parse_table
 from queue import Queue
+from concurrent.futures import ProcessPoolExecutor
+from itertools import chain
+import os
 from shotel_ast import *
+import shotel_ast
 
-class InvalidEOFError(Exception):
+class InvalidEOFError(SourceError):
     pass
 
-class InvalidTokenError(Exception):
+class InvalidTokenError(SourceError):
     pass
 
-class TokensNotExhaustedError(Exception):
+class TokensNotExhaustedError(SourceError):
     pass
 
+# TokenType values, the parser compares the types stored in the TokenBuffer arrays
+TOKEN_EOF = 0
+TOKEN_PLUS = TokenType.PLUS.value
+TOKEN_MINUS = TokenType.MINUS.value
+TOKEN_DIVIDE = TokenType.DIVIDE.value
+TOKEN_TIMES = TokenType.TIMES.value
+TOKEN_MODULO = TokenType.MODULO.value
+TOKEN_LSHIFT = TokenType.LSHIFT.value
+TOKEN_RSHIFT = TokenType.RSHIFT.value
+TOKEN_AND = TokenType.AND.value
+TOKEN_OR = TokenType.OR.value
+TOKEN_XOR = TokenType.XOR.value
+TOKEN_NOT = TokenType.NOT.value
+TOKEN_INT = TokenType.INT.value
+TOKEN_FN = TokenType.FN.value
+TOKEN_TYPE = TokenType.TYPE.value
+TOKEN_CASE = TokenType.CASE.value
+TOKEN_PATTERN = TokenType.PATTERN.value
+TOKEN_OCURLY = TokenType.OCURLY.value
+TOKEN_CCURLY = TokenType.CCURLY.value
+TOKEN_OPAR = TokenType.OPAR.value
+TOKEN_CPAR = TokenType.CPAR.value
+TOKEN_COMMA = TokenType.COMMA.value
+TOKEN_ARROW = TokenType.ARROW.value
+TOKEN_ASSIGN = TokenType.ASSIGN.value
+TOKEN_EQUAL = TokenType.EQUAL.value
+TOKEN_NEQUAL = TokenType.NEQUAL.value
+TOKEN_LID = TokenType.LID.value
+TOKEN_UID = TokenType.UID.value
+TOKEN_LITERAL = TokenType.LITERAL.value
+
+# binary operators with their precedence, higher binds tighter
+BinaryOperators = {
+    TokenType.EQUAL: (BinaryOperation.BinaryOperationKind.EQUALS, 1),
+    TokenType.NEQUAL: (BinaryOperation.BinaryOperationKind.NEQUALS, 1),
+    TokenType.PLUS: (BinaryOperation.BinaryOperationKind.PLUS, 2),
+    TokenType.MINUS: (BinaryOperation.BinaryOperationKind.MINUS, 2),
+    TokenType.RSHIFT: (BinaryOperation.BinaryOperationKind.RSHIFT, 2),
+    TokenType.LSHIFT: (BinaryOperation.BinaryOperationKind.LSHIFT, 2),
+    TokenType.TIMES: (BinaryOperation.BinaryOperationKind.TIMES, 3),
+    TokenType.DIVIDE: (BinaryOperation.BinaryOperationKind.DIVIDE, 3),
+    TokenType.MODULO: (BinaryOperation.BinaryOperationKind.MODULO, 3),
+    TokenType.OR: (BinaryOperation.BinaryOperationKind.OR, 4),
+    TokenType.AND: (BinaryOperation.BinaryOperationKind.AND, 5),
+    TokenType.XOR: (BinaryOperation.BinaryOperationKind.XOR, 5),
+}
+
+# prefix operators, applied to an application
+UnaryOperators = {
+    TokenType.NOT: UnaryOperation.UnaryOperationKind.NOT,
+}
+
+# the tables by TokenType value, as the parser compares them
+BinaryOperatorsByValue = {tokenType.value: operator for tokenType, operator in BinaryOperators.items()}
+UnaryOperatorsByValue = {tokenType.value: kind for tokenType, kind in UnaryOperators.items()}
+
+# tokens that can start an application argument
+APPLICATION_START = frozenset([TOKEN_INT, TOKEN_LID, TOKEN_UID, TOKEN_LITERAL, TOKEN_OPAR, TOKEN_CASE])
+
+# the nonterminal a Parser hands to a TableParser past Parser.MaxDepth, an argument of an application
+NESTED_BASE = language_parse_table.NONTERMINAL_BASE + language_parse_table.NONTERMINALS.index("base")
+
 class Parser:
     '''
     The parser class, a recursive descent parser implementation.
     See language.bnf, class merely implements the bnf grammar.
+    Tokens are read from TokenBuffer chunks with an integer cursor, self.next is the type value
+    of the token under the cursor, or TOKEN_EOF once every chunk is consumed.
+    The tokens can be a TokenBuffer, an iterable of TokenBuffer chunks produced while scanning,
+    or Token objects, which are packed into buffers.
+    Nodes are built by the functions of the same name in nodes, the shotel_ast classes unless
+    an ast_arena.AstArena is given to store them in.
+    Each parenthesis or case nesting takes a few Python frames, an argument nested deeper than MaxDepth
+    is parsed by a TableParser continuing from the cursor, so inputs of any depth parse in one pass.
     '''
-    def __init__(self, tokens):
-        self.tokens: ['Enum'] = tokens
-        self.stack = deque(tokens)
-    
+    # the nesting of parentheses and cases parsed by recursing, see Nested
+    MaxDepth = 50
+
+    def __init__(self, tokens, nodes = shotel_ast):
+        self.nodes = nodes
+        self.depth = 0
+        self.tableParser = None
+        self.chunks = TokenBuffer.chunks(tokens)
+        self.buffer = TokenBuffer()
+        self.types = self.buffer.types
+        self.position = 0
+        self.end = 0
+        self.next = TOKEN_EOF
+        self.NextChunk()
+
+    def NextChunk(self):
+        '''Moves the cursor to the first token of the next non empty chunk, if there is one.'''
+        for buffer in self.chunks:
+            if len(buffer) > 0:
+                self.buffer = buffer
+                self.types = buffer.types
+                self.position = 0
+                self.end = len(buffer)
+                self.next = self.types[0]
+                return
+
+        self.position = self.end
+        self.next = TOKEN_EOF
+
+    def Advance(self):
+        '''Moves the cursor past the current token.'''
+        self.position += 1
+
+        if self.position < self.end:
+            self.next = self.types[self.position]
+        else:
+            self.NextChunk()
+
     def GetToken(self):
-        token = self.stack[0]
-        self.stack.popleft()
+        token = self.buffer[self.position]
+        self.Advance()
 
         return token
+
+    def GetValue(self):
+        '''Consumes the current token and returns its value, without creating a Token.'''
+        value = self.buffer.value(self.position)
+        self.Advance()
+
+        return value
+
+    def GetSymbol(self):
+        '''Consumes the current identifier token and returns its symbol id.'''
+        symbol = self.buffer.symbol(self.position)
+        self.Advance()
+
+        return symbol
+
+    def AtEOF(self):
+        return self.next == TOKEN_EOF
+
+    def Offset(self):
+        '''The source offset of the token under the cursor, or of the end of the last token at EOF.'''
+        if self.position < self.end:
+            return self.buffer.offsets[self.position]
+        elif self.end > 0:
+            return self.buffer.offsets[self.end - 1] + self.buffer.lengths[self.end - 1]
+
+        return 0
+
+    def Remaining(self):
+        '''The tokens left after the cursor, for error messages.'''
+        remaining = [self.buffer[index] for index in range(self.position, self.end)]
+
+        for buffer in self.chunks:
+            remaining += list(buffer)
+
+        return remaining
     
     def Program(self):
-        self.Program = Program(self.Definitions())
+        self.Program = self.nodes.Program(self.Definitions())
 
-        if len(self.stack) > 0:
-            raise TokensNotExhaustedError(f"Parsing completed but EOF not reached. Remaining tokens:{list(self.stack)}")
+        if not self.AtEOF():
+            raise TokensNotExhaustedError(f"Parsing completed but EOF not reached. Remaining tokens:{self.Remaining()}", self.Offset())
         
         return self.Program
     
+    def ParallelProgram(tokens: TokenBuffer, workers = None, chunks_per_worker = 4):
+        '''
+        Parses a program in a pool of worker processes. The tokens are split into chunks of whole
+        definitions, each parsed with Parser.Program, and the definitions are merged in source order.
+        Nodes travel back pickled by symbol name, see SymbolNames.
+        '''
+        workers = workers or os.cpu_count() or 1
+        chunks = Parser.SplitDefinitions(tokens, workers * chunks_per_worker)
+
+        if workers == 1 or len(chunks) == 1:
+            return Program(list(chain.from_iterable(map(Parser.ParseChunk, chunks))))
+
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            return Program(list(chain.from_iterable(pool.map(Parser.ParseChunk, chunks))))
+
+    def ParseChunk(tokens):
+        return Parser(tokens).Program().definitions
+
+    def SplitDefinitions(tokens: TokenBuffer, parts):
+        '''
+        Splits a token buffer into at most parts buffers of about the same length.
+        Definitions start with FN or TYPE and these tokens appear nowhere else, so every part
+        but the first starts at one of them.
+        '''
+        types = tokens.types.tobytes()
+        count = len(types)
+        starts = [0]
+
+        for part in range(1, parts):
+            target = max(count * part // parts, starts[-1] + 1)
+            found = [start for start in (types.find(TOKEN_FN, target), types.find(TOKEN_TYPE, target)) if start >= 0]
+
+            if not found:
+                break
+
+            starts.append(min(found))
+
+        starts.append(count)
+
+        return [tokens.slice(start, end) for start, end in zip(starts, starts[1:]) if start < end] or [tokens]
+
     def Definitions(self):
-        definitions = []
+        return list(self.StreamDefinitions())
+
+    def StreamDefinitions(self):
+        '''Yields each definition as soon as it is parsed.'''
         while (True):
             definition = self.Definition()
 
             if definition is None:
-                return definitions
+                return
             
-            definitions.append(definition)
+            yield definition
         
     def Definition(self):
-        if len(self.stack) == 0:
+        if self.AtEOF():
             return None
         
-        top: Token = self.GetToken()
-
-        if top.type == TokenType.FN:
-            return self.Fn()
-        elif top.type == TokenType.TYPE:
-            return self.Type()
+        top = self.next
+        offset = self.Offset()
+        self.Advance()
+
+        if top == TOKEN_FN:
+            return self.Fn(offset)
+        elif top == TOKEN_TYPE:
+            return self.Type(offset)
     
     # TYPE
     
-    def Type(self):
+    def Type(self, offset = None):
         self.EOFCheck("Expected name of type but got EOF.")
 
-        name: Token = self.GetToken()
+        if self.next != TOKEN_UID:
+            raise InvalidTokenError(f"Expected UID for Type name but got {TokenTypes[self.next]} instead", self.Offset())
 
-        if name.type != TokenType.UID:
-            raise InvalidTokenError(f"Expected UID for Type name but got {name.type} instead")
+        name = self.GetSymbol()
 
-        self.AssertExistence(TokenType.ASSIGN)
+        self.AssertExistence(TOKEN_ASSIGN)
 
         constructors: ['Constructor'] = self.Constructors(upperCaseParams=True)
 
-        return TypeDefinition(name.value, constructors)
+        return self.nodes.TypeDefinition(name, constructors, offset)
     
     def Constructors(self, upperCaseParams = False):
         self.EOFCheck("Expected list of constructors and got none instead.")
@@ -86,14 +276,12 @@ class Parser:
             constructors.append(constructor)
 
             # no more tokens, end of constructors
-            if len(self.stack) == 0:
+            if self.AtEOF():
                 return constructors
 
             # at least one, is it a comma
-            nextToken: Token = self.stack[0]
-            
-            if nextToken.type == TokenType.COMMA:
-                self.GetToken()
+            if self.next == TOKEN_COMMA:
+                self.Advance()
                 continue
 
             break
@@ -101,157 +289,90 @@ class Parser:
         return constructors
     
     def Constructor(self, upperCaseParams = False):
-        self.EOFCheck("Expected constructor but got EOF instead.")
+        name = self.ConstructorName()
+
+        return self.nodes.Constructor(name, self.Params(upperCaseParams))
 
-        name = self.GetToken()
+    def ConstructorName(self):
+        self.EOFCheck("Expected constructor but got EOF instead.")
 
-        if name.type != TokenType.UID:
+        if self.next != TOKEN_UID:
+            offset = self.Offset()
+            name = self.GetToken()
             raise InvalidTokenError(f"Invalid constructor definition {name.value}." + 
-        "Constructor names should start with a capital letter." if name.type == TokenType.LID else f"Expected constructor name but got {name.type} instead.")
-        
-        return Constructor(name.value, self.Params(upperCaseParams))
+        "Constructor names should start with a capital letter." if name.type == TokenType.LID else f"Expected constructor name but got {name.type} instead.", offset)
+
+        return self.GetSymbol()
     
     # FN
 
-    def Fn(self):
+    def Fn(self, offset = None):
         self.EOFCheck("Expected function definition but got EOF instead.")
 
-        name = self.GetToken()
+        if self.next != TOKEN_UID:
+            raise InvalidTokenError(f"Expected uppercase function name but got {TokenTypes[self.next]} instead.", self.Offset())
 
-        if name.type != TokenType.UID:
-            raise InvalidTokenError(f"Expected uppercase function name but got {name.type} instead.")
+        name = self.GetSymbol()
 
         params = self.Params()
 
-        self.AssertExistence(TokenType.OCURLY)
+        self.AssertExistence(TOKEN_OCURLY)
 
         body = self.Expression()
 
-        self.AssertExistence(TokenType.CCURLY)
+        self.AssertExistence(TOKEN_CCURLY)
 
-        return FnDefinition(name.value, params, body)
+        return self.nodes.FnDefinition(name, params, body, offset)
 
     
     def Expression(self):
-        return self.Comparison()
-    
-    def Comparison(self):
-        self.EOFCheck("Expected expression but got EOF instead.")
-
-        left = self.Add()
-
-        nextToken = self.Peek()
-
-        node = None
-
-        if nextToken.type == TokenType.EQUAL:
-            self.GetToken()
-            node = BinaryOperation(BinaryOperation.BinaryOperationKind.EQUALS, left, self.Comparison())
-        elif nextToken.type == TokenType.NEQUAL:
-            self.GetToken()
-            node = BinaryOperation(BinaryOperation.BinaryOperationKind.NEQUALS, left, self.Comparison())
-        else:
-            node = left
-
-        return node
-    
-    def Add(self):
-        self.EOFCheck("Expected expression but got EOF instead.")
-
-        left = self.Mul()
-
-        nextToken = self.Peek()
-
-        node = None
-
-        if nextToken.type == TokenType.PLUS:
-            self.GetToken()
-            node = BinaryOperation(BinaryOperation.BinaryOperationKind.PLUS, left, self.Add())
-        elif nextToken.type == TokenType.MINUS:
-            self.GetToken()
-            node = BinaryOperation(BinaryOperation.BinaryOperationKind.MINUS, left, self.Add())
-        elif nextToken.type == TokenType.RSHIFT:
-            self.GetToken()
-            node = BinaryOperation(BinaryOperation.BinaryOperationKind.RSHIFT, left, self.Add())
-        elif nextToken.type == TokenType.LSHIFT:
-            self.GetToken()
-            node = BinaryOperation(BinaryOperation.BinaryOperationKind.LSHIFT, left, self.Add())
-        else:
-            node = left
-
-        return node
-    
-    def Mul(self):
+        '''
+        Parses a chain of operands and binary operators with an operator precedence stack, so chains
+        of any length take constant Python stack depth. Every operator is right associative and
+        binds as in language.bnf: comparisons loosest, then addition, multiplication, or, and.
+        '''
         self.EOFCheck("Expected expression but got EOF instead.")
 
-        left = self.Or()
+        operators = BinaryOperatorsByValue
+        operands = [self.Operand()]
+        # (kind, precedence, offset) of the operators waiting for their right operand
+        pending = []
 
-        nextToken = self.Peek()
+        while self.next in operators:
+            kind, precedence = operators[self.next]
 
-        node = None
+            # right associative: only operators binding tighter take their right operand now
+            while pending and pending[-1][1] > precedence:
+                Parser.Reduce(operands, pending, self.nodes)
 
-        if nextToken.type == TokenType.TIMES:
-            self.GetToken()
-            node = BinaryOperation(BinaryOperation.BinaryOperationKind.TIMES, left, self.Mul())
-        elif nextToken.type == TokenType.DIVIDE:
-            self.GetToken()
-            node = BinaryOperation(BinaryOperation.BinaryOperationKind.DIVIDE, left, self.Mul())
-        elif nextToken.type == TokenType.MODULO:
-            self.GetToken()
-            node = BinaryOperation(BinaryOperation.BinaryOperationKind.MODULO, left, self.Mul())
-        else:
-            node = left
+            pending.append((kind, precedence, self.Offset()))
+            self.Advance()
+            operands.append(self.Operand())
 
-        return node
-    
-    
-    def Or(self):
-        self.EOFCheck("Expected expression but got EOF instead.")
-
-        left = self.And()
+        while pending:
+            Parser.Reduce(operands, pending, self.nodes)
 
-        nextToken = self.Peek()
+        return operands[0]
 
-        node = None
+    def Reduce(operands, pending, nodes = shotel_ast):
+        '''Replaces the last two operands with the last pending operator applied to them.'''
+        kind, _, offset = pending.pop()
+        right = operands.pop()
+        operands[-1] = nodes.BinaryOperation(kind, operands[-1], right, offset)
 
-        if nextToken.type == TokenType.OR:
-            self.GetToken()
-            node = BinaryOperation(BinaryOperation.BinaryOperationKind.OR, left, self.Or())
-        else:
-            node = left
-
-        return node
-    
-    def And(self):
+    def Operand(self):
+        '''An application, or a prefix operator applied to one.'''
         self.EOFCheck("Expected expression but got EOF instead.")
 
-        left = self.MaybeNotApplication()
-
-        nextToken = self.Peek()
+        kind = UnaryOperatorsByValue.get(self.next)
 
-        node = None
-
-        if nextToken.type == TokenType.AND:
-            self.GetToken()
-            node = BinaryOperation(BinaryOperation.BinaryOperationKind.AND, left, self.And())
-        elif nextToken.type == TokenType.XOR:
-            self.GetToken()
-            node = BinaryOperation(BinaryOperation.BinaryOperationKind.XOR, left, self.And())
-        else:
-            node = left
-        
-        return node
-    
-    def MaybeNotApplication(self):
-        self.EOFCheck("Expected expression but got EOF instead.")
+        if kind is not None:
+            offset = self.Offset()
+            self.Advance()
+            return self.nodes.UnaryOperation(kind, self.Application(), offset)
 
-        if self.Peek().type == TokenType.NOT:
-            self.GetToken()
-            return UnaryOperation(UnaryOperation.UnaryOperationKind.NOT, self.Application())
-        
         return self.Application()
-    
-    
+
     def Application(self):
         self.EOFCheck("Expected expression but got EOF instead.")
 
@@ -266,56 +387,90 @@ class Parser:
 
         # check if there's a second application, maybe we don't need to allocate a node
         if self.ApplicationExists():
-            current_application_node = FunctionApplication(application, self.ApplicationBase())
+            offset = self.Offset()
+            current_application_node = self.nodes.FunctionApplication(application, self.ApplicationBase(), offset)
         else:
             return application
 
         # for the rest, build the tree in reverse, return the root
         while self.ApplicationExists():
-            current_application_node = FunctionApplication(current_application_node, self.ApplicationBase())
+            offset = self.Offset()
+            current_application_node = self.nodes.FunctionApplication(current_application_node, self.ApplicationBase(), offset)
         
         return current_application_node
 
     def ApplicationExists(self):
-        if len(self.stack) == 0:
-            return False
-        
-        nextTokenType = self.stack[0].type
-
-        return nextTokenType in [TokenType.INT, TokenType.LID, TokenType.UID, TokenType.LITERAL,
-        TokenType.OPAR, TokenType.CASE]
+        return self.next in APPLICATION_START
 
     def ApplicationBase(self):
         self.EOFCheck("Expected expression but got EOF instead.")
 
-        nextToken = self.GetToken()
-
-        if nextToken.type == TokenType.INT:
-            return IntNode(nextToken.value)
-        elif nextToken.type == TokenType.LITERAL:
-            return StringNode(nextToken.value)
-        elif nextToken.type == TokenType.LID:
-            return LID(nextToken.value)
-        elif nextToken.type == TokenType.UID:
-            return UID(nextToken.value)
-        elif nextToken.type == TokenType.CASE:
-            return self.Case()
-        elif nextToken.type == TokenType.OPAR:
-            expression = self.Comparison()
-
-            self.AssertExistence(TokenType.CPAR)
+        nextToken = self.next
+
+        if nextToken == TOKEN_INT:
+            return self.nodes.IntNode(self.GetValue())
+        elif nextToken == TOKEN_LITERAL:
+            return self.nodes.StringNode(self.GetValue())
+        elif nextToken == TOKEN_LID:
+            offset = self.Offset()
+            return self.nodes.LID(self.GetSymbol(), offset)
+        elif nextToken == TOKEN_UID:
+            offset = self.Offset()
+            return self.nodes.UID(self.GetSymbol(), offset)
+        elif nextToken == TOKEN_CASE:
+            if self.depth == Parser.MaxDepth:
+                return self.Nested()
+
+            offset = self.Offset()
+            self.Advance()
+            self.depth += 1
+            case = self.Case(offset)
+            self.depth -= 1
+
+            return case
+        elif nextToken == TOKEN_OPAR:
+            if self.depth == Parser.MaxDepth:
+                return self.Nested()
+
+            self.Advance()
+            self.depth += 1
+            expression = self.Expression()
+            self.depth -= 1
+
+            self.AssertExistence(TOKEN_CPAR)
 
             return expression
         else:
-            raise InvalidTokenError(f"Expectied a function or a value but got {self.Peek()} instead.")
+            offset = self.Offset()
+            raise InvalidTokenError(f"Expectied a function or a value but got {self.GetToken()} instead.", offset)
+
+    def Nested(self):
+        '''
+        Parses the argument at the cursor with a TableParser, which keeps the symbols it matches on a list
+        instead of the Python stack, and moves the cursor past it.
+        '''
+        if self.tableParser is None:
+            self.tableParser = TableParser((), self.nodes)
+
+        tableParser = self.tableParser
+        tableParser.Move(self)
+        node = tableParser.Parse(NESTED_BASE, whole = False)
+        self.Move(tableParser)
+
+        return node
+
+    def Move(self, other):
+        '''Takes the cursor of another parser reading the same tokens.'''
+        self.chunks, self.buffer, self.types = other.chunks, other.buffer, other.types
+        self.position, self.end, self.next = other.position, other.end, other.next
 
-    def Case(self):
+    def Case(self, offset = None):
         self.EOFCheck("Expected Case statement but got EOF instead.")
 
-        expression = self.Comparison()
+        expression = self.Expression()
 
         branches = self.Branches()
-        return CaseOf(expression, branches)
+        return self.nodes.CaseOf(expression, branches, offset)
     
     def Branches(self):
         self.EOFCheck("Expected branches but got EOF instead.")
@@ -331,97 +486,294 @@ class Parser:
         return branches
     
     def BranchExists(self):
-        return len(self.stack) > 0 and self.stack[0].type == TokenType.PATTERN
+        return self.next == TOKEN_PATTERN
     
     def Branch(self):
         self.EOFCheck("Expected branch but got EOF instead.")
 
         # remove pattern dash
-        self.AssertExistence(TokenType.PATTERN)
+        self.AssertExistence(TOKEN_PATTERN)
 
         pattern = self.Pattern()
 
-        self.AssertExistence(TokenType.ARROW)
+        self.AssertExistence(TOKEN_ARROW)
 
-        self.AssertExistence(TokenType.OCURLY)
+        self.AssertExistence(TOKEN_OCURLY)
 
-        expression = self.Comparison()
+        expression = self.Expression()
 
-        self.AssertExistence(TokenType.CCURLY)
+        self.AssertExistence(TOKEN_CCURLY)
 
-        return Branch(pattern, expression)
+        return self.nodes.Branch(pattern, expression)
 
     def Pattern(self):
         self.EOFCheck("Expected pattern variable or constructor but got EOF instead.")
 
-        if self.Peek().type == TokenType.LID:
-            varname = self.GetToken().value
-            return PatternVar(varname)
+        if self.next == TOKEN_LID:
+            varname = self.GetSymbol()
+            return self.nodes.PatternVar(varname)
         else:
-            constructor = self.Constructor(upperCaseParams=False)
-            return PatternConstructor(constructor.name, constructor.types)
+            name = self.ConstructorName()
+            return self.nodes.PatternConstructor(name, self.Params())
     
     # Get lowercase params
     
     def Params(self, upperCaseParams = False):
-        params: [str] = []
+        params: [int] = []
         
-        case = TokenType.UID if upperCaseParams else TokenType.LID
-        next_exists = len(self.stack) != 0 and self.Peek().type == case
-        while next_exists:
+        case = TOKEN_UID if upperCaseParams else TOKEN_LID
+        while self.next == case:
             param = self.Param(upperCaseParams)
             params.append(param)
-
-            next_exists = len(self.stack) != 0 and self.Peek().type == case
         
         return params
 
     def Param(self, upperCase = False):
         self.EOFCheck("Expected constructor lowercase parameter but got EOF instead.")
 
-        param = self.GetToken()
-
-        typeOfToken = TokenType.UID if upperCase else TokenType.LID 
+        typeOfToken = TOKEN_UID if upperCase else TOKEN_LID 
 
-        if param.type != typeOfToken:
+        if self.next != typeOfToken:
             case = "lowercase" if not upperCase else "uppercase"
-            raise InvalidTokenError(f"Expected {case} constructor param but got {param.type} instead.")
+            raise InvalidTokenError(f"Expected {case} constructor param but got {TokenTypes[self.next]} instead.", self.Offset())
 
-        return param.value
+        return self.GetSymbol()
     
     def ConsumeToken(self):
-        self.GetToken()
+        self.Advance()
 
     # helpers
     
     def EOFCheck(self, message):
-        if len(self.stack) == 0:
-            raise InvalidEOFError(message)
+        if self.next == TOKEN_EOF:
+            raise InvalidEOFError(message, self.Offset())
     
-    def AssertExistence(self, tokenType: 'Enum'):
-        self.EOFCheck(f"Expected token of type {tokenType} but got EOF instead")
+    def AssertExistence(self, tokenType: int):
+        self.EOFCheck(f"Expected token of type {TokenTypes[tokenType]} but got EOF instead")
 
-        nextToken = self.GetToken()
-        if nextToken.type != tokenType:
-            raise InvalidTokenError(f"Expected token of type {tokenType} but got {nextToken.type} instead.")
+        if self.next != tokenType:
+            raise InvalidTokenError(f"Expected token of type {TokenTypes[tokenType]} but got {TokenTypes[self.next]} instead.", self.Offset())
+
+        self.Advance()
     
     def Peek(self, at_least_n_tokens = 1):
-        if len(self.stack) < at_least_n_tokens:
-            raise InvalidEOFError(f"Expected at least {at_least_n_tokens} tokens but stack contained {len(self.stack)}.")
+        '''The type value of the n-th token from the cursor, across chunks if needed.'''
+        while self.position + at_least_n_tokens > self.end:
+            following = next(self.chunks, None)
+
+            if following is None:
+                raise InvalidEOFError(f"Expected at least {at_least_n_tokens} tokens but only {self.end - self.position} remain.", self.Offset())
 
-        return self.stack[0]
+            self.buffer = self.buffer.join(self.position, following)
+            self.types = self.buffer.types
+            self.position = 0
+            self.end = len(self.buffer)
+
+        return self.types[self.position + at_least_n_tokens - 1]
     
     def TreeToString(body):
+        '''The operators of an expression in prefix order, with the operands they apply to.'''
         if body is None:
             return ""
-        
-        result = str(body)
-        if isinstance(body, BinaryOperation):
-            return result + " " + Parser.TreeToString(body.left) + " " + Parser.TreeToString(body.right)
-        elif isinstance(body, UnaryOperation):
-            return result + " " +Parser.TreeToString(body.op)
+
+        return " ".join(str(node) for node, entering in walk(body, Parser.PrintedChildren) if entering)
+
+    def PrintedChildren(node):
+        if isinstance(node, (BinaryOperation, UnaryOperation)):
+            return node.children()
+
+        return ()
+
+
+class TableParser(Parser):
+    '''
+    A table driven LL(1) parser, running the table parserGenerator.py builds from reference/language.bnf.
+    Symbols to match are kept on an explicit stack: a nonterminal is replaced by the production its table row
+    gives for the current token, a token is matched and its (type, value, offset) pushed on the value stack.
+    When every symbol of a production is matched, its Build method replaces their values with a node.
+    Lists are built in reverse by BuildCons, the nodes using them reverse them back.
+    It builds the same trees as Parser, with the same nodes argument.
+    '''
+    # productions whose action takes the offset of the token they start at
+    LocatedActions = {"Located"}
+
+    def __init__(self, tokens, nodes = shotel_ast, table = language_parse_table):
+        super().__init__(tokens, nodes)
+        self.base = table.NONTERMINAL_BASE
+        self.nonterminals = table.NONTERMINALS
+        self.start = table.START
+        self.table = table.TABLE
+        self.symbols = [tuple(reversed(symbols)) for _, symbols, _ in table.PRODUCTIONS]
+        self.lengths = [len(symbols) for _, symbols, _ in table.PRODUCTIONS]
+        self.actions = [getattr(self, "Build" + action) if action is not None else None for _, _, action in table.PRODUCTIONS]
+        self.located = [action in TableParser.LocatedActions for _, _, action in table.PRODUCTIONS]
+
+    def Program(self):
+        return self.Parse(self.start)
+
+    def Parse(self, start, whole = True):
+        '''
+        Parses the tokens as the start nonterminal, they must all be consumed unless whole is False:
+        the cursor is then left on the token following it.
+        '''
+        base, table, symbols, lengths, actions, located = self.base, self.table, self.symbols, self.lengths, self.actions, self.located
+
+        # productions are marked on the stack as ~production, once their symbols are matched
+        stack = [TOKEN_EOF, start] if whole else [start]
+        values = []
+        offsets = []
+
+        while stack:
+            symbol = stack.pop()
+
+            if symbol >= base:
+                production = table[symbol - base][self.next]
+
+                if production < 0:
+                    self.Unexpected(symbol)
+
+                action = actions[production]
+
+                # a single symbol without an action passes its value on, an empty one gives None
+                if action is not None:
+                    stack.append(~production)
+                elif not symbols[production]:
+                    values.append(None)
+
+                stack.extend(symbols[production])
+
+                if located[production]:
+                    offsets.append(self.Offset())
+            elif symbol > TOKEN_EOF:
+                if self.next != symbol:
+                    self.Unexpected(symbol)
+
+                values.append(self.Terminal())
+            elif symbol == TOKEN_EOF:
+                if self.next != TOKEN_EOF:
+                    raise TokensNotExhaustedError(f"Parsing completed but EOF not reached. Remaining tokens:{self.Remaining()}", self.Offset())
+            else:
+                production = ~symbol
+                count = lengths[production]
+
+                if count:
+                    arguments = values[-count:]
+                    del values[-count:]
+                else:
+                    arguments = []
+
+                if located[production]:
+                    arguments.insert(0, offsets.pop())
+
+                values.append(actions[production](*arguments))
+
+        return values[0]
+
+    def Terminal(self):
+        '''Consumes the current token, returning its type, its value or symbol and its offset.'''
+        tokenType = self.next
+        offset = self.buffer.offsets[self.position]
+
+        if tokenType == TOKEN_LID or tokenType == TOKEN_UID:
+            return tokenType, self.GetSymbol(), offset
+        elif tokenType == TOKEN_INT or tokenType == TOKEN_LITERAL:
+            return tokenType, self.GetValue(), offset
+
+        self.Advance()
+
+        return tokenType, None, offset
+
+    def Unexpected(self, symbol):
+        '''Raises the error for a current token that neither matches the token symbol nor starts the nonterminal.'''
+        if symbol >= self.base:
+            expected = [TokenTypes[token].name if token != TOKEN_EOF else "EOF"
+                for token, production in enumerate(self.table[symbol - self.base]) if production >= 0]
+            expected = f"{self.nonterminals[symbol - self.base]} ({', '.join(expected)})"
         else:
-            return result
+            expected = f"token of type {TokenTypes[symbol]}"
+
+        if self.next == TOKEN_EOF:
+            raise InvalidEOFError(f"Expected {expected} but got EOF instead.", self.Offset())
+
+        raise InvalidTokenError(f"Expected {expected} but got {TokenTypes[self.next]} instead.", self.Offset())
+
+    def Symbols(tokens):
+        '''The symbols of a reversed list of identifier tokens, in source order.'''
+        return [token[1] for token in reversed(tokens)]
+
+    # actions, named by the @Action of the productions
+
+    def BuildProgram(self, definitions):
+        return self.nodes.Program(definitions[::-1])
+
+    def BuildNil(self):
+        return []
+
+    def BuildCons(self, head, tail):
+        tail.append(head)
+        return tail
+
+    def BuildSeparatedCons(self, separator, head, tail):
+        tail.append(head)
+        return tail
+
+    def BuildFn(self, fn, name, params, ocurly, body, ccurly):
+        return self.nodes.FnDefinition(name[1], TableParser.Symbols(params), body, fn[2])
+
+    def BuildType(self, typeToken, name, assign, constructors):
+        return self.nodes.TypeDefinition(name[1], constructors[::-1], typeToken[2])
+
+    def BuildConstructor(self, name, params):
+        return self.nodes.Constructor(name[1], TableParser.Symbols(params))
+
+    def BuildBinary(self, left, operation):
+        if operation is None:
+            return left
+
+        kind, right, offset = operation
+        return self.nodes.BinaryOperation(kind, left, right, offset)
+
+    def BuildOperator(self, operator, right):
+        return BinaryOperatorsByValue[operator[0]][0], right, operator[2]
+
+    def BuildUnary(self, operator, application):
+        return self.nodes.UnaryOperation(UnaryOperatorsByValue[operator[0]], application, operator[2])
+
+    def BuildApplication(self, first, arguments):
+        node = first[0]
+
+        # applications nest to the left, the arguments are listed in reverse
+        for argument, offset in reversed(arguments):
+            node = self.nodes.FunctionApplication(node, argument, offset)
+
+        return node
+
+    def BuildLocated(self, offset, node):
+        return node, offset
+
+    def BuildValue(self, token):
+        return self.nodes.IntNode(token[1])
+
+    def BuildString(self, token):
+        return self.nodes.StringNode(token[1])
+
+    def BuildLid(self, token):
+        return self.nodes.LID(token[1], token[2])
+
+    def BuildUid(self, token):
+        return self.nodes.UID(token[1], token[2])
+
+    def BuildParenthesized(self, opar, expression, cpar):
+        return expression
+
+    def BuildCase(self, case, expression, branches):
+        return self.nodes.CaseOf(expression, branches[::-1], case[2])
 
+    def BuildBranch(self, pattern, patternNode, arrow, ocurly, expression, ccurly):
+        return self.nodes.Branch(patternNode, expression)
 
+    def BuildPatternVar(self, name):
+        return self.nodes.PatternVar(name[1])
 
+    def BuildPatternConstructor(self, name, params):
+        return self.nodes.PatternConstructor(name[1], TableParser.Symbols(params))
@@ -0,0 +1,255 @@
+#!/usr/bin/python3
+from scannerGenerator import Tokens
+
+# symbol of the end of the tokens, as the parser sees it
+EOF_SYMBOL = 0
+
+# terminals are TokenType values, nonterminals are numbered from here
+NONTERMINAL_BASE = 64
+
+EMPTY = "EMPTY"
+
+class GrammarError(Exception):
+    pass
+
+class Grammar:
+    '''
+    A context free grammar read from the notation of reference/language.bnf.
+    Each production is a (nonterminal, symbols, action) triple, the symbols are names,
+    the action is the name of the method building its value or None.
+    '''
+    def __init__(self, productions):
+        self.productions = productions
+        self.nonterminals = []
+
+        for nonterminal, _, _ in productions:
+            if nonterminal not in self.nonterminals:
+                self.nonterminals.append(nonterminal)
+
+        for nonterminal, symbols, action in productions:
+            if action is None and len(symbols) > 1:
+                raise GrammarError(f"A production of {nonterminal} has several symbols but no action to combine their values.")
+
+            for symbol in symbols:
+                if symbol not in self.nonterminals and symbol not in Tokens:
+                    raise GrammarError(f"Symbol {symbol} of {nonterminal} is neither a token nor defined.")
+
+        self.start = self.nonterminals[0]
+
+    def parse(text):
+        '''Reads a grammar, see reference/language.bnf for the notation.'''
+        productions = []
+        nonterminal = None
+
+        for number, line in enumerate(text.splitlines(), 1):
+            line = line.split("//")[0].strip()
+
+            if not line:
+                continue
+
+            if ":=" in line:
+                nonterminal, line = [part.strip() for part in line.split(":=", 1)]
+
+                if not nonterminal.isidentifier():
+                    raise GrammarError(f"Line {number}: invalid nonterminal name {nonterminal!r}.")
+
+            if not line:
+                continue
+
+            if nonterminal is None or not line.startswith("|"):
+                raise GrammarError(f"Line {number}: expected an alternative starting with '|'.")
+
+            for alternative in line[1:].split("|"):
+                symbols = alternative.split()
+                action = None
+
+                if symbols and symbols[-1].startswith("@"):
+                    action = symbols.pop()[1:]
+
+                if symbols == [EMPTY]:
+                    symbols = []
+                elif EMPTY in symbols or not symbols:
+                    raise GrammarError(f"Line {number}: {EMPTY} must be an alternative of its own.")
+
+                productions.append((nonterminal, tuple(symbols), action))
+
+        if not productions:
+            raise GrammarError("The grammar has no productions.")
+
+        return Grammar(productions)
+
+    def is_terminal(self, symbol):
+        return symbol not in self.nonterminals
+
+    def first_sets(self):
+        '''
+        The FIRST set of every nonterminal, the tokens its derivations can start with,
+        and the set of nullable nonterminals, the ones deriving the empty string.
+        '''
+        first = {nonterminal: set() for nonterminal in self.nonterminals}
+        nullable = set()
+        changed = True
+
+        while changed:
+            changed = False
+
+            for nonterminal, symbols, _ in self.productions:
+                tokens, empty = self.sequence_first(symbols, first, nullable)
+
+                if not tokens <= first[nonterminal]:
+                    first[nonterminal] |= tokens
+                    changed = True
+
+                if empty and nonterminal not in nullable:
+                    nullable.add(nonterminal)
+                    changed = True
+
+        return first, nullable
+
+    def sequence_first(self, symbols, first, nullable):
+        '''The FIRST set of a sequence of symbols, and whether the sequence can derive the empty string.'''
+        tokens = set()
+
+        for symbol in symbols:
+            if self.is_terminal(symbol):
+                tokens.add(symbol)
+                return tokens, False
+
+            tokens |= first[symbol]
+
+            if symbol not in nullable:
+                return tokens, False
+
+        return tokens, True
+
+    def follow_sets(self, first, nullable):
+        '''The FOLLOW set of every nonterminal, the tokens that can come right after it, EOF after the start symbol.'''
+        follow = {nonterminal: set() for nonterminal in self.nonterminals}
+        follow[self.start].add(EOF_SYMBOL)
+        changed = True
+
+        while changed:
+            changed = False
+
+            for nonterminal, symbols, _ in self.productions:
+                for index, symbol in enumerate(symbols):
+                    if self.is_terminal(symbol):
+                        continue
+
+                    tokens, empty = self.sequence_first(symbols[index + 1:], first, nullable)
+
+                    if empty:
+                        tokens = tokens | follow[nonterminal]
+
+                    if not tokens <= follow[symbol]:
+                        follow[symbol] |= tokens
+                        changed = True
+
+        return follow
+
+    def table(self):
+        '''
+        The LL(1) table: for each nonterminal, the production to expand for each lookahead.
+        A production is chosen for the tokens starting it, and for the tokens following its
+        nonterminal if it can derive the empty string.
+        When a production deriving the empty string conflicts with one that does not, the latter wins,
+        so lists take every item they can, as the hand written parser does. Other conflicts are errors.
+        '''
+        first, nullable = self.first_sets()
+        follow = self.follow_sets(first, nullable)
+        table = {nonterminal: {} for nonterminal in self.nonterminals}
+        empty_productions = set()
+
+        for index, (nonterminal, symbols, _) in enumerate(self.productions):
+            tokens, empty = self.sequence_first(symbols, first, nullable)
+            row = table[nonterminal]
+
+            if empty:
+                empty_productions.add(index)
+                tokens = tokens | follow[nonterminal]
+
+            for token in tokens:
+                if token in row and row[token] != index:
+                    other = row[token]
+
+                    if (other in empty_productions) == (index in empty_productions):
+                        raise GrammarError(f"The grammar is not LL(1): {nonterminal} has two productions for {token}.")
+
+                    if index in empty_productions:
+                        continue
+
+                row[token] = index
+
+        return table
+
+class ParserGenerator:
+    '''Writes the LL(1) table of reference/language.bnf as a python module for parser.TableParser.'''
+    def __init__(self, grammar_path = "reference/language.bnf", table_path = "language_parse_table.py"):
+        self.grammar_path = grammar_path
+        self.table_path = table_path
+
+    def symbol_value(grammar, symbol):
+        '''Tokens are numbered as their TokenType values, EOF is 0, nonterminals follow NONTERMINAL_BASE.'''
+        if symbol == EOF_SYMBOL:
+            return EOF_SYMBOL
+        elif grammar.is_terminal(symbol):
+            return Tokens.index(symbol) + 1
+
+        return NONTERMINAL_BASE + grammar.nonterminals.index(symbol)
+
+    def tables(grammar):
+        '''The productions and the table with every symbol as a number.'''
+        value = lambda symbol: ParserGenerator.symbol_value(grammar, symbol)
+
+        productions = tuple((value(nonterminal), tuple(value(symbol) for symbol in symbols), action)
+            for nonterminal, symbols, action in grammar.productions)
+
+        table = grammar.table()
+        rows = []
+
+        for nonterminal in grammar.nonterminals:
+            row = [-1] * (len(Tokens) + 1)
+
+            for token, production in table[nonterminal].items():
+                row[value(token)] = production
+
+            rows.append(tuple(row))
+
+        return productions, tuple(rows)
+
+    def generate(self):
+        with open(self.grammar_path) as grammarfile:
+            grammar = Grammar.parse(grammarfile.read())
+
+        productions, rows = ParserGenerator.tables(grammar)
+
+        lines = [
+            f"# Generated by parserGenerator.py from {self.grammar_path}, do not edit.",
+            "",
+            f"NONTERMINAL_BASE = {NONTERMINAL_BASE}",
+            "",
+            "# nonterminal names, nonterminal i is symbol NONTERMINAL_BASE + i, tokens are their TokenType values",
+            f"NONTERMINALS = {tuple(grammar.nonterminals)}",
+            "",
+            f"START = {ParserGenerator.symbol_value(grammar, grammar.start)}",
+            "",
+            "# (nonterminal, symbols, action) of each production",
+            "PRODUCTIONS = (",
+        ]
+        lines += [f"    {production}," for production in productions]
+        lines += [
+            ")",
+            "",
+            "# production to expand for each nonterminal and lookahead token value, -1 if there is none",
+            "TABLE = (",
+        ]
+        lines += [f"    {row}," for row in rows]
+        lines += [")", ""]
+
+        with open(self.table_path, "w+") as tablefile:
+            tablefile.write("\n".join(lines))
+
+
+if __name__ == "__main__":
+    parserGen = ParserGenerator()
+    parserGen.generate()
@@ -0,0 +1,103 @@
+import io
+import pytest
+import language_parse_table
+from parserGenerator import Grammar, GrammarError, ParserGenerator, EOF_SYMBOL
+from parser import Parser, TableParser, InvalidTokenError, InvalidEOFError, TokensNotExhaustedError
+from tokenizer import Lexer
+from corpus import CorpusGenerator
+from shotel_ast import walk
+
+def test_first_and_follow_sets():
+    grammar = Grammar.parse('''
+    // sums of products
+    sum :=
+        | product moreSums @Sum
+    moreSums :=
+        | PLUS sum @Tail
+        | EMPTY
+    product :=
+        | INT moreProducts @Product
+    moreProducts := | TIMES product @Tail | EMPTY
+    ''')
+    first, nullable = grammar.first_sets()
+    follow = grammar.follow_sets(first, nullable)
+
+    assert first["sum"] == first["product"] == {"INT"}
+    assert first["moreSums"] == {"PLUS"}
+    assert nullable == {"moreSums", "moreProducts"}
+    assert follow["sum"] == follow["moreSums"] == {EOF_SYMBOL}
+    assert follow["product"] == follow["moreProducts"] == {"PLUS", EOF_SYMBOL}
+
+def test_conflicts():
+    with pytest.raises(GrammarError):
+        Grammar.parse("start :=\n | INT PLUS @A\n | INT TIMES @B").table()
+
+    # an empty alternative gives way to the others
+    grammar = Grammar.parse("items :=\n | INT items @Cons\n | EMPTY @Nil\nlist :=\n | items items @Pair")
+    assert grammar.table()["items"]["INT"] == 0
+
+def test_invalid_grammars():
+    with pytest.raises(GrammarError):
+        Grammar.parse("start :=\n | UNDEFINED")
+
+    with pytest.raises(GrammarError):
+        Grammar.parse("start :=\n | INT INT")
+
+def test_generated_table_is_up_to_date():
+    with open("reference/language.bnf") as grammarfile:
+        productions, rows = ParserGenerator.tables(Grammar.parse(grammarfile.read()))
+
+    assert language_parse_table.PRODUCTIONS == productions
+    assert language_parse_table.TABLE == rows
+
+def same_trees(text):
+    assert repr_tree(Parser(Lexer().scan(text)).Program().definitions) == repr_tree(TableParser(Lexer().scan(text)).Program().definitions)
+
+def repr_tree(node):
+    if isinstance(node, list):
+        return [repr_tree(item) for item in node]
+    elif hasattr(node, "__dict__") and not isinstance(node, type) and type(node).__module__ == "shotel_ast":
+        return type(node).__name__, {name: repr_tree(value) for name, value in vars(node).items()}
+
+    return node
+
+def test_table_parser_trees():
+    same_trees("type Bool = True, False\ntype Pair = Pair Int Int\nfn Not x { case x | True => { False } | other => { True } }")
+    same_trees("fn A a b { F (G 1) \"x\" a == !b a + 1 * 2 or 3 and 4 xor 5 - 6 >> 7 }")
+    same_trees("")
+
+    for seed in range(8):
+        same_trees(CorpusGenerator(types=seed % 3, fns=4, depth=1 + seed % 3, seed=seed).generate())
+
+def flat_tree(definitions):
+    '''The nodes of the definitions in prefix order with their offsets, for trees too deep for repr_tree.'''
+    return [(repr(node), getattr(node, "offset", None)) for definition in definitions for node, entering in walk(definition) if entering]
+
+def test_nesting_past_the_parser_depth():
+    # the arguments nested deeper than MaxDepth are parsed by a TableParser, the rest by Parser
+    depth = Parser.MaxDepth * 3
+    nested = "F " + "(a + case b | x => { " * depth + "G 1" + " } * 2)" * depth + " 3"
+    text = "fn A a b { " + nested + " }\nfn B { 1 }\ntype T = T"
+    expected = flat_tree(TableParser(Lexer().scan(text)).Program().definitions)
+
+    assert flat_tree(Parser(Lexer().scan(text)).Program().definitions) == expected
+
+    # the TableParser reads the chunks of the stream as they come
+    assert flat_tree(Parser(Lexer().stream(io.StringIO(text), chunk_size = 64)).Program().definitions) == expected
+
+    with pytest.raises(InvalidTokenError) as error:
+        Parser(Lexer().scan("fn A { " + "(" * depth + "1 +" + ")" * depth + " }")).Program()
+
+    assert error.value.offset == 7 + depth + 3
+
+def test_table_parser_errors():
+    with pytest.raises(InvalidTokenError) as error:
+        TableParser(Lexer().scan("fn A { 1 + }")).Program()
+
+    assert error.value.offset == 11
+
+    with pytest.raises(InvalidEOFError):
+        TableParser(Lexer().scan("fn A")).Program()
+
+    with pytest.raises(TokensNotExhaustedError):
+        TableParser(Lexer().scan("fn A { 1 } fn B { 2 }")).Parse(language_parse_table.NONTERMINAL_BASE + language_parse_table.NONTERMINALS.index("fn"))
@@ -1,6 +1,7 @@
 import unittest
-from tokenizer import Token
-from parser import Parser
+from tokenizer import Token, TokenType, TokenBuffer, Lexer
+from parser import Parser, InvalidTokenError
+from shotel_ast import BinaryOperation
 
 class ParserTest(unittest.TestCase):
     def test_type_simple(self):
@@ -148,6 +149,80 @@ class ParserTest(unittest.TestCase):
         program = ParserTest.get_program(source)
 
     
+    def test_long_operator_chain(self):
+        terms = 5000
+        parser = Parser(Lexer().scan("fn Test a { " + " + ".join(["a"] * terms) + " * 2 }"))
+
+        node = parser.Program()[0].body
+        depth = 0
+
+        # right associative, so the chain nests to the right
+        while isinstance(node, BinaryOperation):
+            self.assertEqual(BinaryOperation.BinaryOperationKind.PLUS if depth < terms - 1 else BinaryOperation.BinaryOperationKind.TIMES, node.kind)
+            node = node.right
+            depth += 1
+
+        self.assertEqual(terms, depth)
+
+    def test_split_definitions(self):
+        tokens = Lexer().scan("fn A { 1 }\ntype B = C\nfn D x { x }\ntype E = F, G")
+        chunks = Parser.SplitDefinitions(tokens, 3)
+
+        self.assertEqual(3, len(chunks))
+        self.assertEqual(len(tokens), sum(len(chunk) for chunk in chunks))
+
+        for chunk in chunks:
+            self.assertIn(chunk.type(0), (TokenType.FN, TokenType.TYPE))
+
+        self.assertEqual("fn D x { x }", chunks[1].text.strip())
+
+    def test_parallel_program(self):
+        text = "type Parallel = Pqrs Int, Pqrt\n" + "\n".join(f"fn Pfn{chr(97 + index)} plocal {{ case plocal | Pqrs pvalue => {{ pvalue + {index} }} }}" for index in range(12))
+        # parsed in parallel first, so the workers intern names this process has not seen
+        parallel = Parser.ParallelProgram(Lexer().scan(text), workers=2, chunks_per_worker=3)
+        serial = Parser(Lexer().scan(text)).Program()
+
+        self.assertEqual(len(serial), len(parallel))
+
+        for expected, definition in zip(serial, parallel):
+            self.assertEqual(expected.symbol, definition.symbol)
+            self.assertEqual(expected.offset, definition.offset)
+
+        self.assertEqual(serial[0].constructors[0].types, parallel[0].constructors[0].types)
+        self.assertEqual(Parser.TreeToString(serial[5].body), Parser.TreeToString(parallel[5].body))
+        self.assertEqual(serial[5].body.branches[0].pattern.param_symbols, parallel[5].body.branches[0].pattern.param_symbols)
+
+    def test_parallel_program_error(self):
+        text = "fn A { 1 }\n" * 8 + "fn B { 1 + }"
+
+        with self.assertRaises(InvalidTokenError) as error:
+            Parser.ParallelProgram(Lexer().scan(text), workers=2)
+
+        self.assertEqual(len(text) - 1, error.exception.offset)
+
+    def test_streamed_tokens(self):
+        source = ["FN", "UID(Id)", "LID(x)", "OCURLY", "LID(x)", "CCURLY"]
+
+        tokens = (token for token in ParserTest.to_tokens(source * 3))
+        program = Parser(tokens).Program()
+
+        self.assertEqual("[DefinitionFn(Id)['x'], DefinitionFn(Id)['x'], DefinitionFn(Id)['x']]", str(program))
+
+    def test_peek_across_chunks(self):
+        chunks = TokenBuffer.batches(iter(ParserTest.to_tokens(["FN", "UID(Id)", "LID(x)", "OCURLY", "LID(x)", "CCURLY"])), 2)
+        parser = Parser(chunks)
+
+        self.assertEqual(TokenType.OCURLY.value, parser.Peek(4))
+        self.assertEqual("[DefinitionFn(Id)['x']]", str(parser.Program()))
+
+    def test_error_offset(self):
+        parser = Parser(Lexer().scan("fn Test a {\n  a +\n}"))
+
+        with self.assertRaises(InvalidTokenError) as error:
+            parser.Program()
+
+        self.assertEqual(18, error.exception.offset)
+
     def to_tokens(tokens):
         return [Token(token) for token in tokens]
     
@@ -0,0 +1,144 @@
+import json
+import sys
+import time
+import tracemalloc
+
+class PassStatistics:
+    '''
+    Records the wall and cpu time of each compiler phase and, if memory is set,
+    its peak traced memory and the number of memory blocks it left allocated, an estimate of
+    the objects it left alive read from sys.getallocatedblocks without walking the heap.
+    A phase entered again adds to its earlier record, a phase entered inside another
+    is only counted in the inner one, so the records add up to the whole compile.
+    '''
+    def __init__(self, memory = False):
+        self.memory = memory
+        self.records = {}
+        self.active = []
+
+    def phase(self, name):
+        '''A context manager attributing the code it runs to the named phase.'''
+        return PassStatistics.Phase(self, name)
+
+    def timed(self, name, iterable):
+        '''Yields the items of the iterable, attributing the time spent producing them to the named phase.'''
+        iterator = iter(iterable)
+
+        while True:
+            with self.phase(name):
+                item = next(iterator, PassStatistics.Done)
+
+            if item is PassStatistics.Done:
+                return
+
+            yield item
+
+    # marks the end of an iterator in timed
+    Done = object()
+
+    def record(self, name):
+        if name not in self.records:
+            self.records[name] = {"wall": 0.0, "cpu": 0.0, "peak": 0, "objects": 0}
+
+        return self.records[name]
+
+    class Phase:
+        def __init__(self, statistics, name):
+            self.statistics = statistics
+            self.name = name
+
+        def __enter__(self):
+            statistics = self.statistics
+            # created on entry, so the records are in the order the phases were first entered
+            statistics.record(self.name)
+
+            self.child_wall = self.child_cpu = self.child_objects = 0
+            self.started_tracing = False
+
+            if statistics.memory:
+                if not tracemalloc.is_tracing():
+                    tracemalloc.start()
+                    self.started_tracing = True
+
+                # the enclosing phase keeps the peak reached so far, this one measures its own
+                if statistics.active:
+                    parent = statistics.record(statistics.active[-1].name)
+                    parent["peak"] = max(parent["peak"], tracemalloc.get_traced_memory()[1])
+
+                tracemalloc.reset_peak()
+                self.objects = sys.getallocatedblocks()
+
+            statistics.active.append(self)
+            self.wall = time.perf_counter()
+            self.cpu = time.process_time()
+
+            return self
+
+        def __exit__(self, *exception):
+            wall = time.perf_counter() - self.wall
+            cpu = time.process_time() - self.cpu
+
+            statistics = self.statistics
+            statistics.active.pop()
+            record = statistics.record(self.name)
+            parent = statistics.active[-1] if statistics.active else None
+
+            record["wall"] += wall - self.child_wall
+            record["cpu"] += cpu - self.child_cpu
+
+            if parent is not None:
+                parent.child_wall += wall
+                parent.child_cpu += cpu
+
+            if statistics.memory:
+                objects = sys.getallocatedblocks() - self.objects
+                record["objects"] += objects - self.child_objects
+                record["peak"] = max(record["peak"], tracemalloc.get_traced_memory()[1])
+
+                if parent is not None:
+                    parent.child_objects += objects
+
+                if self.started_tracing:
+                    tracemalloc.stop()
+                else:
+                    tracemalloc.reset_peak()
+
+            return False
+
+    def report(self):
+        '''The records as a table, one line per phase in the order they were first entered.'''
+        header = f"{'phase':<12} {'wall ms':>10} {'cpu ms':>10}"
+
+        if self.memory:
+            header += f" {'peak KiB':>10} {'objects':>10}"
+
+        lines = [header]
+        total = {"wall": 0.0, "cpu": 0.0}
+
+        for name, record in self.records.items():
+            line = f"{name:<12} {record['wall'] * 1000:10.2f} {record['cpu'] * 1000:10.2f}"
+
+            if self.memory:
+                line += f" {record['peak'] / 1024:10.1f} {record['objects']:10d}"
+
+            lines.append(line)
+            total["wall"] += record["wall"]
+            total["cpu"] += record["cpu"]
+
+        lines.append(f"{'total':<12} {total['wall'] * 1000:10.2f} {total['cpu'] * 1000:10.2f}")
+
+        return "\n".join(lines)
+
+    def report_json(self):
+        phases = []
+
+        for name, record in self.records.items():
+            phase = {"phase": name, "wall": record["wall"], "cpu": record["cpu"]}
+
+            if self.memory:
+                phase["peak"] = record["peak"]
+                phase["objects"] = record["objects"]
+
+            phases.append(phase)
+
+        return json.dumps(phases, indent=2)
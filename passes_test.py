@@ -0,0 +1,79 @@
+from passes import PassStatistics
+from compiler import Compiler
+import gc
+import json
+import os
+import subprocess
+import sys
+import time
+
+def test_compile_phases():
+    passes = PassStatistics()
+    program = Compiler.compile_from_text("fn Add a b { a + b }\nfn Test { Add 1 2 }", passes=passes)
+    typeManager = Compiler.typecheck(program, passes)
+
+    assert list(passes.records) == ["scan", "parse", "typecheck"]
+    assert typeManager.getResolvedType(program[1].return_type).name == "Int"
+    assert all(record["wall"] >= 0 and record["cpu"] >= 0 for record in passes.records.values())
+
+def test_streamed_phases_in_order(tmp_path):
+    path = tmp_path / "a.sh"
+    path.write_text("fn Add a b { a + b }\nfn Test { Add 1 2 }\n")
+
+    for memory in (False, True):
+        passes = PassStatistics(memory=memory)
+        Compiler.typecheck(Compiler.compile_file(str(path), passes=passes), passes)
+
+        assert list(passes.records) == ["scan", "parse", "typecheck"]
+
+def test_nested_phases_are_exclusive():
+    passes = PassStatistics()
+
+    with passes.phase("outer"):
+        with passes.phase("inner"):
+            time.sleep(0.02)
+
+    assert passes.records["inner"]["wall"] >= 0.02
+    assert passes.records["outer"]["wall"] < 0.02
+
+def test_timed_iterable():
+    passes = PassStatistics()
+
+    def slow():
+        for item in range(3):
+            time.sleep(0.01)
+            yield item
+
+    with passes.phase("consume"):
+        assert list(passes.timed("produce", slow())) == [0, 1, 2]
+
+    assert passes.records["produce"]["wall"] >= 0.03
+    assert passes.records["consume"]["wall"] < 0.03
+
+def test_memory_phases():
+    passes = PassStatistics(memory=True)
+
+    # a collection in the middle of the phase would free unrelated garbage
+    gc.disable()
+
+    try:
+        with passes.phase("allocate"):
+            kept = [[index] for index in range(1000)]
+    finally:
+        gc.enable()
+
+    record = passes.records["allocate"]
+    assert record["peak"] > 0 and record["objects"] > 900
+
+    phases = json.loads(passes.report_json())
+    assert phases[0]["phase"] == "allocate" and phases[0]["objects"] == record["objects"]
+    assert "allocate" in passes.report()
+
+def test_passes_json_alone(tmp_path):
+    path = tmp_path / "a.sh"
+    path.write_text("fn A { 1 }\n")
+    root = os.path.dirname(os.path.abspath(__file__))
+    result = subprocess.run([sys.executable, "compiler.py", "--passes-json", str(path)], cwd=root, capture_output=True, text=True)
+
+    assert result.returncode == 0
+    assert [record["phase"] for record in json.loads(result.stderr)] == ["scan", "parse", "typecheck"]
@@ -0,0 +1,43 @@
+from shotel_ast import BinaryOperation, UnaryOperation
+from typechecker import BaseType, ArrowType, FrozenEnvironment
+
+# the builtin types
+INT = BaseType("Int")
+STRING = BaseType("String")
+
+# every operator of an arity has the same type
+UNARY_TYPE = ArrowType(INT, INT)
+BINARY_TYPE = ArrowType(INT, UNARY_TYPE)
+
+class OperatorSignatures:
+    '''
+    The types of the operators, by the value of their kind: binary[kind._value_] is the type of a
+    BinaryOperationKind, unary[kind._value_] that of a UnaryOperationKind. _value_ is the plain attribute
+    behind Enum.value, read without its descriptor as the typechecker reads it at every operation.
+    '''
+    __slots__ = ("binary", "unary")
+
+    def __init__(self, binary, unary):
+        self.binary = OperatorSignatures.table(binary)
+        self.unary = OperatorSignatures.table(unary)
+
+    def table(signatures):
+        table = [None] * (max(kind._value_ for kind in signatures) + 1)
+
+        for kind, signature in signatures.items():
+            table[kind._value_] = signature
+
+        return tuple(table)
+
+Operators = OperatorSignatures({kind: BINARY_TYPE for kind in BinaryOperation.BinaryOperationKind},
+    {kind: UNARY_TYPE for kind in UnaryOperation.UnaryOperationKind})
+
+def bindings():
+    '''The operators by the symbols of their names, as the typechecker looks them up in environments without signatures.'''
+    bound = {BinaryOperation.KindSymbols[kind]: Operators.binary[kind._value_] for kind in BinaryOperation.BinaryOperationKind}
+    bound.update({UnaryOperation.KindSymbols[kind]: Operators.unary[kind._value_] for kind in UnaryOperation.UnaryOperationKind})
+
+    return bound
+
+# the root of every compile, built once when the module is imported
+Prelude = FrozenEnvironment(bindings(), Operators)
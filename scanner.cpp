@@ -482,11 +482,50 @@ int yy_flex_debug = 0;
 char *yytext;
 #line 1 "language.lex"
 #line 4 "language.lex"
-#include <iostream>
 #include <stdio.h>
+#include <stdint.h>
+#include <string.h>
+#include <vector>
+
+/* Text mode writes a NAME or NAME(value) line per token.
+   Binary mode writes a TokenRecord per token, see TokenRecord in scannerGenerator.py.
+   Server mode collects the TokenRecords of each source in a frame, see FrameHeader in scannerGenerator.py. */
+static bool binary = false;
+static bool server = false;
+static uint32_t offset = 0;
+
+struct TokenRecord {
+    uint8_t type;
+    uint8_t padding[3];
+    uint32_t offset;
+    uint32_t length;
+};
+
+static std::vector<TokenRecord> frame;
+
+#define YY_USER_ACTION offset += yyleng;
+
+static void emit(uint8_t type, const char* name, bool hasValue) {
+    if (binary) {
+        TokenRecord record = { type, {0, 0, 0}, offset - (uint32_t) yyleng, (uint32_t) yyleng };
+
+        if (server) {
+            frame.push_back(record);
+        } else {
+            fwrite(&record, sizeof(record), 1, stdout);
+        }
+    } else if (hasValue) {
+        fprintf(stdout, "%s(%s)\n", name, yytext);
+    } else {
+        fprintf(stdout, "%s\n", name);
+    }
+}
 
-#line 489 "scanner.cpp"
-#line 490 "scanner.cpp"
+/* unmatched characters are reported as a record of type 0 in binary mode */
+#define ECHO do { if (binary) emit(0, "", false); else fwrite(yytext, (size_t) yyleng, 1, yyout); } while (0)
+
+#line 528 "scanner.cpp"
+#line 529 "scanner.cpp"
 
 #define INITIAL 0
 
@@ -703,9 +742,9 @@ YY_DECL
 		}
 
 	{
-#line 9 "language.lex"
+#line 48 "language.lex"
 
-#line 709 "scanner.cpp"
+#line 748 "scanner.cpp"
 
 	while ( /*CONSTCOND*/1 )		/* loops until end-of-file is reached */
 		{
@@ -765,156 +804,156 @@ do_action:	/* This label is used only to access EOF actions. */
 case 1:
 /* rule 1 can match eol */
 YY_RULE_SETUP
-#line 10 "language.lex"
+#line 49 "language.lex"
 {}
 	YY_BREAK
 case 2:
 YY_RULE_SETUP
-#line 11 "language.lex"
-{ std::cout << "PLUS" << std::endl; }
+#line 50 "language.lex"
+{ emit(1, "PLUS", false); }
 	YY_BREAK
 case 3:
 YY_RULE_SETUP
-#line 12 "language.lex"
-{ std::cout << "MINUS" << std::endl; }
+#line 51 "language.lex"
+{ emit(2, "MINUS", false); }
 	YY_BREAK
 case 4:
 YY_RULE_SETUP
-#line 13 "language.lex"
-{ std::cout << "DIVIDE" << std::endl; }
+#line 52 "language.lex"
+{ emit(3, "DIVIDE", false); }
 	YY_BREAK
 case 5:
 YY_RULE_SETUP
-#line 14 "language.lex"
-{ std::cout << "TIMES" << std::endl; }
+#line 53 "language.lex"
+{ emit(4, "TIMES", false); }
 	YY_BREAK
 case 6:
 YY_RULE_SETUP
-#line 15 "language.lex"
-{ std::cout << "MODULO" << std::endl; }
+#line 54 "language.lex"
+{ emit(5, "MODULO", false); }
 	YY_BREAK
 case 7:
 YY_RULE_SETUP
-#line 16 "language.lex"
-{ std::cout << "LSHIFT" << std::endl; }
+#line 55 "language.lex"
+{ emit(6, "LSHIFT", false); }
 	YY_BREAK
 case 8:
 YY_RULE_SETUP
-#line 17 "language.lex"
-{ std::cout << "RSHIFT" << std::endl; }
+#line 56 "language.lex"
+{ emit(7, "RSHIFT", false); }
 	YY_BREAK
 case 9:
 YY_RULE_SETUP
-#line 18 "language.lex"
-{ std::cout << "AND" << std::endl; }
+#line 57 "language.lex"
+{ emit(8, "AND", false); }
 	YY_BREAK
 case 10:
 YY_RULE_SETUP
-#line 19 "language.lex"
-{ std::cout << "OR" << std::endl; }
+#line 58 "language.lex"
+{ emit(9, "OR", false); }
 	YY_BREAK
 case 11:
 YY_RULE_SETUP
-#line 20 "language.lex"
-{ std::cout << "XOR" << std::endl; }
+#line 59 "language.lex"
+{ emit(10, "XOR", false); }
 	YY_BREAK
 case 12:
 YY_RULE_SETUP
-#line 21 "language.lex"
-{ std::cout << "NOT" << std::endl; }
+#line 60 "language.lex"
+{ emit(11, "NOT", false); }
 	YY_BREAK
 case 13:
 YY_RULE_SETUP
-#line 22 "language.lex"
-{ std::cout << "INT" << "(" << yytext << ")" << std::endl; }
+#line 61 "language.lex"
+{ emit(12, "INT", true); }
 	YY_BREAK
 case 14:
 YY_RULE_SETUP
-#line 23 "language.lex"
-{ std::cout << "FN" << std::endl; }
+#line 62 "language.lex"
+{ emit(13, "FN", false); }
 	YY_BREAK
 case 15:
 YY_RULE_SETUP
-#line 24 "language.lex"
-{ std::cout << "TYPE" << std::endl; }
+#line 63 "language.lex"
+{ emit(14, "TYPE", false); }
 	YY_BREAK
 case 16:
 YY_RULE_SETUP
-#line 25 "language.lex"
-{ std::cout << "CASE" << std::endl; }
+#line 64 "language.lex"
+{ emit(15, "CASE", false); }
 	YY_BREAK
 case 17:
 YY_RULE_SETUP
-#line 26 "language.lex"
-{ std::cout << "PATTERN" << std::endl; }
+#line 65 "language.lex"
+{ emit(16, "PATTERN", false); }
 	YY_BREAK
 case 18:
 YY_RULE_SETUP
-#line 27 "language.lex"
-{ std::cout << "OCURLY" << std::endl; }
+#line 66 "language.lex"
+{ emit(17, "OCURLY", false); }
 	YY_BREAK
 case 19:
 YY_RULE_SETUP
-#line 28 "language.lex"
-{ std::cout << "CCURLY" << std::endl; }
+#line 67 "language.lex"
+{ emit(18, "CCURLY", false); }
 	YY_BREAK
 case 20:
 YY_RULE_SETUP
-#line 29 "language.lex"
-{ std::cout << "OPAR" << std::endl; }
+#line 68 "language.lex"
+{ emit(19, "OPAR", false); }
 	YY_BREAK
 case 21:
 YY_RULE_SETUP
-#line 30 "language.lex"
-{ std::cout << "CPAR" << std::endl; }
+#line 69 "language.lex"
+{ emit(20, "CPAR", false); }
 	YY_BREAK
 case 22:
 YY_RULE_SETUP
-#line 31 "language.lex"
-{ std::cout << "COMMA" << std::endl; }
+#line 70 "language.lex"
+{ emit(21, "COMMA", false); }
 	YY_BREAK
 case 23:
 YY_RULE_SETUP
-#line 32 "language.lex"
-{ std::cout << "ARROW" << std::endl; }
+#line 71 "language.lex"
+{ emit(22, "ARROW", false); }
 	YY_BREAK
 case 24:
 YY_RULE_SETUP
-#line 33 "language.lex"
-{ std::cout << "ASSIGN" << std::endl; }
+#line 72 "language.lex"
+{ emit(23, "ASSIGN", false); }
 	YY_BREAK
 case 25:
 YY_RULE_SETUP
-#line 34 "language.lex"
-{ std::cout << "EQUAL" << std::endl; }
+#line 73 "language.lex"
+{ emit(24, "EQUAL", false); }
 	YY_BREAK
 case 26:
 YY_RULE_SETUP
-#line 35 "language.lex"
-{ std::cout << "NEQUAL" << std::endl; }
+#line 74 "language.lex"
+{ emit(25, "NEQUAL", false); }
 	YY_BREAK
 case 27:
 YY_RULE_SETUP
-#line 36 "language.lex"
-{ std::cout << "LID" << "(" << yytext << ")" << std::endl; }
+#line 75 "language.lex"
+{ emit(26, "LID", true); }
 	YY_BREAK
 case 28:
 YY_RULE_SETUP
-#line 37 "language.lex"
-{ std::cout << "UID" << "(" << yytext << ")" << std::endl; }
+#line 76 "language.lex"
+{ emit(27, "UID", true); }
 	YY_BREAK
 case 29:
 /* rule 29 can match eol */
 YY_RULE_SETUP
-#line 38 "language.lex"
-{ std::cout << "LITERAL" << "(" << yytext << ")" << std::endl; }
+#line 77 "language.lex"
+{ emit(28, "LITERAL", true); }
 	YY_BREAK
 case 30:
 YY_RULE_SETUP
-#line 40 "language.lex"
+#line 79 "language.lex"
 ECHO;
 	YY_BREAK
-#line 918 "scanner.cpp"
+#line 957 "scanner.cpp"
 case YY_STATE_EOF(INITIAL):
 	yyterminate();
 
@@ -1919,15 +1958,64 @@ void yyfree (void * ptr )
 
 #define YYTABLES_NAME "yytables"
 
-#line 40 "language.lex"
+#line 79 "language.lex"
+
+static int serve() {
+    std::vector<char> source;
+    uint32_t length;
+
+    while (fread(&length, sizeof(length), 1, stdin) == 1) {
+        source.resize(length);
 
+        if (length > 0 && fread(source.data(), 1, length, stdin) != length) {
+            return 1;
+        }
+
+        offset = 0;
+        frame.clear();
+
+        YY_BUFFER_STATE buffer = yy_scan_bytes(source.data(), length);
+        yylex();
+        yy_delete_buffer(buffer);
+
+        uint32_t size = frame.size() * sizeof(TokenRecord);
+        fwrite(&size, sizeof(size), 1, stdout);
+        fwrite(frame.data(), sizeof(TokenRecord), frame.size(), stdout);
+        fflush(stdout);
+    }
+
+    return 0;
+}
 
 int main(int argc, char** argv) {
+    const char* path = NULL;
+
+    for (int i = 1; i < argc; i++) {
+        if (strcmp(argv[i], "--binary") == 0) {
+            binary = true;
+        } else if (strcmp(argv[i], "--server") == 0) {
+            binary = server = true;
+        } else {
+            path = argv[i];
+        }
+    }
+
+    if (server) {
+        return serve();
+    }
+
+    yyin = path != NULL ? fopen(path, "r") : stdin;
+
+    if (yyin == NULL) {
+        perror(path);
+        return 1;
+    }
 
-    yyin = fopen (argv[1] , "r");;
-    
     yylex();
 
-    fclose(yyin);
-}
+    if (path != NULL) {
+        fclose(yyin);
+    }
 
+    fflush(stdout);
+}
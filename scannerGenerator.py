@@ -1,4 +1,6 @@
 #!/usr/bin/python3
+import struct
+
 Tokens = [
     "PLUS",
     "MINUS",
@@ -62,42 +64,470 @@ Patterns = [
         r"\"(([^\"]|\\\")*[^\\])?\" "
         ]
 
+# Character classes of the generated DFA are computed over ASCII,
+# every other character is folded into one extra symbol.
+ASCII_SIZE = 128
+OTHER_SYMBOL = ASCII_SIZE
+ALPHABET = frozenset(range(ASCII_SIZE + 1))
+
+# Accepting states of the whitespace pattern produce no token.
+SKIP_RULE = 0
+
+# Layout of a token in the binary output of the scanner (--binary):
+# token type (the TokenType value, 0 for an unmatched character), 3 bytes of padding,
+# offset and length of the matched text in the source.
+TokenRecord = struct.Struct("=B3xII")
+
+# In server mode (--server) the scanner reads sources from stdin and writes their tokens to stdout as frames,
+# each frame is its length in bytes followed by that many bytes: a source, or the TokenRecords of a source.
+FrameHeader = struct.Struct("=I")
+
+class PatternSyntaxError(Exception):
+    pass
+
+class NFA:
+    '''
+    A Thompson NFA shared by all the patterns of the scanner.
+    Each state has a list of (symbols, target) edges and a list of epsilon edges.
+    '''
+    def __init__(self):
+        self.edges = []
+        self.epsilon = []
+        self.accept = {}
+
+    def new_state(self):
+        self.edges.append([])
+        self.epsilon.append([])
+        return len(self.edges) - 1
+
+    def symbols(self, symbols):
+        start, end = self.new_state(), self.new_state()
+        self.edges[start].append((frozenset(symbols), end))
+        return start, end
+
+    def empty(self):
+        start, end = self.new_state(), self.new_state()
+        self.epsilon[start].append(end)
+        return start, end
+
+    def concat(self, first, second):
+        self.epsilon[first[1]].append(second[0])
+        return first[0], second[1]
+
+    def union(self, fragments):
+        start, end = self.new_state(), self.new_state()
+        for fragment in fragments:
+            self.epsilon[start].append(fragment[0])
+            self.epsilon[fragment[1]].append(end)
+        return start, end
+
+    def star(self, fragment):
+        start, end = self.new_state(), self.new_state()
+        self.epsilon[start] += [fragment[0], end]
+        self.epsilon[fragment[1]] += [fragment[0], end]
+        return start, end
+
+    def plus(self, fragment):
+        start, end = self.new_state(), self.new_state()
+        self.epsilon[start].append(fragment[0])
+        self.epsilon[fragment[1]] += [fragment[0], end]
+        return start, end
+
+    def optional(self, fragment):
+        return self.union([fragment, self.empty()])
+
+    def closure(self, states):
+        '''The set of states reachable from states through epsilon edges.'''
+        result = set(states)
+        pending = list(states)
+        while pending:
+            for target in self.epsilon[pending.pop()]:
+                if target not in result:
+                    result.add(target)
+                    pending.append(target)
+        return frozenset(result)
+
+class PatternCompiler:
+    '''
+    Compiles a flex pattern into an NFA fragment.
+    Supports the subset of the flex syntax used by Patterns:
+    escapes, character classes, quoted strings, '.', grouping, '|', '*', '+' and '?'.
+    As in flex, the pattern ends at the first unescaped whitespace.
+    '''
+    ESCAPES = {"n": "\n", "t": "\t", "r": "\r", "f": "\f", "v": "\v", "0": "\0"}
+
+    def __init__(self, nfa, pattern):
+        self.nfa = nfa
+        self.pattern = pattern
+        self.position = 0
+
+    def compile(self):
+        fragment = self.Alternation()
+
+        if not self.AtEnd():
+            raise PatternSyntaxError(f"Unexpected '{self.Peek()}' at position {self.position} of pattern {self.pattern!r}.")
+
+        return fragment
+
+    def AtEnd(self):
+        return self.position >= len(self.pattern) or self.pattern[self.position] in " \t\n"
+
+    def Peek(self):
+        return self.pattern[self.position]
+
+    def Next(self):
+        char = self.pattern[self.position]
+        self.position += 1
+        return char
+
+    def Alternation(self):
+        fragments = [self.Sequence()]
+
+        while not self.AtEnd() and self.Peek() == "|":
+            self.Next()
+            fragments.append(self.Sequence())
+
+        return fragments[0] if len(fragments) == 1 else self.nfa.union(fragments)
+
+    def Sequence(self):
+        fragment = None
+
+        while not self.AtEnd() and self.Peek() not in "|)":
+            atom = self.Repetition()
+            fragment = atom if fragment is None else self.nfa.concat(fragment, atom)
+
+        return self.nfa.empty() if fragment is None else fragment
+
+    def Repetition(self):
+        fragment = self.Atom()
+
+        while not self.AtEnd() and self.Peek() in "*+?":
+            operator = self.Next()
+            if operator == "*":
+                fragment = self.nfa.star(fragment)
+            elif operator == "+":
+                fragment = self.nfa.plus(fragment)
+            else:
+                fragment = self.nfa.optional(fragment)
+
+        return fragment
+
+    def Atom(self):
+        char = self.Next()
+
+        if char == "(":
+            fragment = self.Alternation()
+            if self.AtEnd() or self.Next() != ")":
+                raise PatternSyntaxError(f"Unbalanced parenthesis in pattern {self.pattern!r}.")
+            return fragment
+        elif char == "[":
+            return self.nfa.symbols(self.CharacterClass())
+        elif char == '"':
+            return self.Quoted()
+        elif char == ".":
+            return self.nfa.symbols(ALPHABET - {ord("\n")})
+        elif char == "\\":
+            return self.nfa.symbols({ord(self.Escape())})
+        elif char in "*+?{}":
+            raise PatternSyntaxError(f"Unsupported operator '{char}' in pattern {self.pattern!r}.")
+
+        return self.nfa.symbols({ord(char)})
+
+    def Escape(self):
+        if self.position >= len(self.pattern):
+            raise PatternSyntaxError(f"Dangling escape in pattern {self.pattern!r}.")
+
+        char = self.Next()
+        return PatternCompiler.ESCAPES.get(char, char)
+
+    def Quoted(self):
+        fragment = self.nfa.empty()
+
+        while True:
+            if self.position >= len(self.pattern):
+                raise PatternSyntaxError(f"Unterminated string in pattern {self.pattern!r}.")
+
+            char = self.Next()
+            if char == '"':
+                return fragment
+            if char == "\\":
+                char = self.Escape()
+
+            fragment = self.nfa.concat(fragment, self.nfa.symbols({ord(char)}))
+
+    def CharacterClass(self):
+        negated = self.position < len(self.pattern) and self.Peek() == "^"
+        if negated:
+            self.Next()
+
+        symbols = set()
+        first = True
+
+        while True:
+            if self.position >= len(self.pattern):
+                raise PatternSyntaxError(f"Unterminated character class in pattern {self.pattern!r}.")
+
+            char = self.Next()
+            if char == "]" and not first:
+                break
+            if char == "\\":
+                char = self.Escape()
+
+            first = False
+
+            # a range, unless the dash closes the class
+            if self.pattern[self.position:self.position + 1] == "-" and self.pattern[self.position + 1:self.position + 2] not in ("]", ""):
+                self.Next()
+                end = self.Next()
+                if end == "\\":
+                    end = self.Escape()
+                symbols.update(range(ord(char), ord(end) + 1))
+            else:
+                symbols.add(ord(char))
+
+        return ALPHABET - symbols if negated else symbols
+
+class DFA:
+    '''
+    A minimized DFA for a list of rules, with flex semantics:
+    the longest match wins, and on equal length the rule listed first wins.
+
+    States are numbered from 0, the start state. A missing transition is -1.
+    accept[state] is the index of the rule accepted in that state or -1.
+    '''
+    def __init__(self, patterns):
+        nfa = NFA()
+        starts = []
+
+        for rule, pattern in enumerate(patterns):
+            start, end = PatternCompiler(nfa, pattern).compile()
+            nfa.accept[end] = rule
+            starts.append(start)
+
+        transitions, accept = DFA.subset_construction(nfa, starts)
+        transitions, accept = DFA.minimize(transitions, accept)
+
+        self.transitions = transitions
+        self.accept = accept
+
+    def subset_construction(nfa, starts):
+        start = nfa.closure(starts)
+        states = {start: 0}
+        pending = [start]
+        transitions = []
+        accept = []
+
+        while pending:
+            current = pending.pop(0)
+            rules = [nfa.accept[state] for state in current if state in nfa.accept]
+            accept.append(min(rules) if rules else -1)
+
+            row = {}
+            for symbol in ALPHABET:
+                targets = [target for state in current for symbols, target in nfa.edges[state] if symbol in symbols]
+
+                if not targets:
+                    continue
+
+                target = nfa.closure(targets)
+                if target not in states:
+                    states[target] = len(states)
+                    pending.append(target)
+
+                row[symbol] = states[target]
+
+            transitions.append(row)
+
+        return transitions, accept
+
+    def minimize(transitions, accept):
+        '''
+        Moore's partition refinement. States start grouped by the rule they accept
+        and are split until every group agrees on the group of each successor.
+        '''
+        group = list(accept)
+        group_count = len(set(group))
+
+        while True:
+            signatures = {}
+            new_group = []
+
+            for state, row in enumerate(transitions):
+                signature = (group[state],) + tuple(group[row[symbol]] if symbol in row else None for symbol in sorted(ALPHABET))
+                new_group.append(signatures.setdefault(signature, len(signatures)))
+
+            group = new_group
+            if len(signatures) == group_count:
+                break
+
+            group_count = len(signatures)
+
+        # renumber the groups so that the start state stays 0
+        order = {}
+        for state in range(len(transitions)):
+            order.setdefault(group[state], len(order))
+
+        minimized = [None] * len(order)
+        minimized_accept = [None] * len(order)
+
+        for state, row in enumerate(transitions):
+            new_state = order[group[state]]
+            minimized[new_state] = {symbol: order[group[target]] for symbol, target in row.items()}
+            minimized_accept[new_state] = accept[state]
+
+        return minimized, minimized_accept
+
+    def character_classes(self):
+        '''
+        Groups the symbols that every state treats the same way.
+        Returns the class of each symbol and the number of classes.
+        '''
+        classes = {}
+        symbol_class = []
+
+        for symbol in sorted(ALPHABET):
+            column = tuple(row.get(symbol, -1) for row in self.transitions)
+            symbol_class.append(classes.setdefault(column, len(classes)))
+
+        return symbol_class, len(classes)
+
+    def table(self):
+        '''The transitions of each state indexed by character class.'''
+        symbol_class, class_count = self.character_classes()
+        rows = []
+
+        for row in self.transitions:
+            table_row = [-1] * class_count
+            for symbol, target in row.items():
+                table_row[symbol_class[symbol]] = target
+            rows.append(tuple(table_row))
+
+        return symbol_class, class_count, rows
+
 class ScannerGenerator:
     def __init__(self):
         pass
 
     def TokenPrint(self,token):
-        if token == "INT" or token == "LITERAL" or token == "LID" or token == "UID":
-            return '\"{0}\" << "(" << yytext << ")"'.format(token)
-        else:
-            return '"' + token + '"'
+        hasValue = "true" if token == "INT" or token == "LITERAL" or token == "LID" or token == "UID" else "false"
+        return 'emit({0}, "{1}", {2});'.format(Tokens.index(token) + 1, token, hasValue)
     
     def generate(self):
         header = '''
 %option noyywrap
 %{
-#include <iostream>
 #include <stdio.h>
+#include <stdint.h>
+#include <string.h>
+#include <vector>
+
+/* Text mode writes a NAME or NAME(value) line per token.
+   Binary mode writes a TokenRecord per token, see TokenRecord in scannerGenerator.py.
+   Server mode collects the TokenRecords of each source in a frame, see FrameHeader in scannerGenerator.py. */
+static bool binary = false;
+static bool server = false;
+static uint32_t offset = 0;
+
+struct TokenRecord {
+    uint8_t type;
+    uint8_t padding[3];
+    uint32_t offset;
+    uint32_t length;
+};
+
+static std::vector<TokenRecord> frame;
+
+#define YY_USER_ACTION offset += yyleng;
+
+static void emit(uint8_t type, const char* name, bool hasValue) {
+    if (binary) {
+        TokenRecord record = { type, {0, 0, 0}, offset - (uint32_t) yyleng, (uint32_t) yyleng };
+
+        if (server) {
+            frame.push_back(record);
+        } else {
+            fwrite(&record, sizeof(record), 1, stdout);
+        }
+    } else if (hasValue) {
+        fprintf(stdout, "%s(%s)\\n", name, yytext);
+    } else {
+        fprintf(stdout, "%s\\n", name);
+    }
+}
+
+/* unmatched characters are reported as a record of type 0 in binary mode */
+#define ECHO do { if (binary) emit(0, "", false); else fwrite(yytext, (size_t) yyleng, 1, yyout); } while (0)
 
 %}
 
 %%
 '''
         whitespace = [Patterns[0] + " {}"];
-        matchings = ['{0} {2} std::cout << {1} << std::endl; {3}'.format(pattern, self.TokenPrint(token), "{", "}") for token,pattern in zip(Tokens, Patterns[1:])]
+        matchings = ['{0} {2} {1} {3}'.format(pattern, self.TokenPrint(token), "{", "}") for token,pattern in zip(Tokens, Patterns[1:])]
 
         flex_patters = "\n".join(whitespace + matchings);
         footer = '''
 
 %%
 
+static int serve() {
+    std::vector<char> source;
+    uint32_t length;
+
+    while (fread(&length, sizeof(length), 1, stdin) == 1) {
+        source.resize(length);
+
+        if (length > 0 && fread(source.data(), 1, length, stdin) != length) {
+            return 1;
+        }
+
+        offset = 0;
+        frame.clear();
+
+        YY_BUFFER_STATE buffer = yy_scan_bytes(source.data(), length);
+        yylex();
+        yy_delete_buffer(buffer);
+
+        uint32_t size = frame.size() * sizeof(TokenRecord);
+        fwrite(&size, sizeof(size), 1, stdout);
+        fwrite(frame.data(), sizeof(TokenRecord), frame.size(), stdout);
+        fflush(stdout);
+    }
+
+    return 0;
+}
+
 int main(int argc, char** argv) {
+    const char* path = NULL;
+
+    for (int i = 1; i < argc; i++) {
+        if (strcmp(argv[i], "--binary") == 0) {
+            binary = true;
+        } else if (strcmp(argv[i], "--server") == 0) {
+            binary = server = true;
+        } else {
+            path = argv[i];
+        }
+    }
+
+    if (server) {
+        return serve();
+    }
+
+    yyin = path != NULL ? fopen(path, "r") : stdin;
+
+    if (yyin == NULL) {
+        perror(path);
+        return 1;
+    }
 
-    yyin = fopen (argv[1] , "r");;
-    
     yylex();
 
-    fclose(yyin);
+    if (path != NULL) {
+        fclose(yyin);
+    }
+
+    fflush(stdout);
 }
 '''
         with open("language.lex", "w+") as lexfile:
@@ -105,6 +535,41 @@ int main(int argc, char** argv) {
             lexfile.write(flex_patters);
             lexfile.write(footer);
 
+        self.generate_table()
+
+    def generate_table(self):
+        '''
+        Compiles Patterns into a minimized DFA and writes it as a python module,
+        so that tokenizer.Lexer can scan in-process without the flex scanner.
+        Rule 0 is the whitespace pattern, rule i is Tokens[i - 1], which is also the value of its TokenType.
+        '''
+        dfa = DFA(Patterns)
+        symbol_class, class_count, rows = dfa.table()
+
+        lines = [
+            "# Generated by scannerGenerator.py, do not edit.",
+            "",
+            f"SKIP_RULE = {SKIP_RULE}",
+            f"CLASS_COUNT = {class_count}",
+            "",
+            "# character class of each ascii character",
+            f"CHAR_CLASSES = {tuple(symbol_class[:ASCII_SIZE])}",
+            "",
+            "# character class of every non ascii character",
+            f"OTHER_CLASS = {symbol_class[OTHER_SYMBOL]}",
+            "",
+            "# rule accepted by each state, -1 if the state is not accepting",
+            f"ACCEPT = {tuple(dfa.accept)}",
+            "",
+            "# next state for each state and character class, -1 if there is none",
+            "TRANSITIONS = (",
+        ]
+        lines += [f"    {row}," for row in rows]
+        lines += [")", ""]
+
+        with open("language_table.py", "w+") as tablefile:
+            tablefile.write("\n".join(lines))
+
 
 
     
@@ -1,16 +1,54 @@
 from enum import Enum
-from typechecker import BaseType, ArrowType, TypeBindingError, UndefinedTypeError, VariableUndefinedError
+from symbols import Symbols
+from diagnostics import SourceError
+from typechecker import BaseType, ArrowType, TypeScheme, TypeBindingError, UndefinedTypeError, VariableUndefinedError
+from inspect import isgenerator
 
 class AST:
-    pass
+    # offset of the node in the source, None if unknown
+    offset = None
+
+    def children(self):
+        '''The nodes under this one, in source order.'''
+        return ()
+
+    def typecheck(self, typeManager, env):
+        '''The type of the expression in env, see TypeChecker.'''
+        return TypeChecker(typeManager).visit(self, env)
+
+class SymbolNames:
+    '''
+    Pickles the symbol ids of a node as their names and interns them again when unpickled,
+    as ids are only valid in the process that interned them.
+    SymbolFields are the attributes holding a symbol id, SymbolListFields those holding a list of them.
+    '''
+    SymbolFields = ("symbol",)
+    SymbolListFields = ()
+
+    def __getstate__(self):
+        state = dict(self.__dict__)
+
+        for field in self.SymbolFields:
+            state[field] = Symbols.name(state[field])
+
+        for field in self.SymbolListFields:
+            state[field] = [Symbols.name(symbol) for symbol in state[field]]
+
+        return state
+
+    def __setstate__(self, state):
+        for field in self.SymbolFields:
+            state[field] = Symbols.intern(state[field])
+
+        for field in self.SymbolListFields:
+            state[field] = [Symbols.intern(name) for name in state[field]]
+
+        self.__dict__.update(state)
 
 class IntNode(AST):
     def __init__(self, value: int):
         self.value: int = value
-        self.isLeaf = True
     
-    def typecheck(self, typeManager, env):
-        return IntNode.Type
     def __repr__(self):
         return f'INT({self.value})'
     
@@ -19,50 +57,38 @@ class IntNode(AST):
 class StringNode(AST):
     def __init__(self, value: str):
         self.value: str = value
-        self.isLeaf = True
     
-    def typecheck(self, typeManager, env):
-        return StringNode.Type
-
     def __repr__(self):
         return f'String({self.value})'
     
     Type = BaseType("String")
 
-class LID(AST):
-    def __init__(self, value: str):
-        self.value: str = value
-        self.isLeaf = True
-    
-    def typecheck(self, typeManager, env):
-        res = env.lookup(self.value)
-
-        if res is None:
-            raise VariableUndefinedError(f"Variable '{self.value}' is undefined. Its type cannot be determined.")
-
-        return res
-
+class LID(AST, SymbolNames):
+    def __init__(self, value, offset = None):
+        self.symbol: int = Symbols.symbol(value)
+        self.offset = offset
 
+    @property
+    def value(self):
+        return Symbols.name(self.symbol)
+    
     def __repr__(self):
         return f'LID({self.value})'
 
-class UID(AST):
-    def __init__(self, value: str):
-        self.value: str = value
-        self.isLeaf = True
-    
-    def typecheck(self, typeManager, env):
-        res = env.lookup(self.value)
-
-        if res is None:
-            raise VariableUndefinedError(f"Variable '{self.value}' is undefined,so it's type cannot be determined.")
-        
-        return res
+class UID(AST, SymbolNames):
+    def __init__(self, value, offset = None):
+        self.symbol: int = Symbols.symbol(value)
+        self.offset = offset
 
+    @property
+    def value(self):
+        return Symbols.name(self.symbol)
+    
     def __repr__(self):
         return f'UID({self.value})'
 
 class BinaryOperation(AST):
+    # module and qualname let the kinds be pickled, the name is the prefix of the operator symbols
     BinaryOperationKind = Enum("OperationKind", 
     [
         "PLUS",
@@ -77,97 +103,71 @@ class BinaryOperation(AST):
         "XOR",
         "EQUALS",
         "NEQUALS"
-    ])
+    ], module=__name__, qualname="BinaryOperation.BinaryOperationKind")
+
+    # symbol ids the operator types are bound to
+    KindSymbols = {kind: Symbols.intern(str(kind)) for kind in BinaryOperationKind}
 
-    def __init__(self, kind: Enum, left: 'AST', right: 'AST'):
+    def __init__(self, kind: Enum, left: 'AST', right: 'AST', offset = None):
         self.left: 'AST' = left
         self.right: 'AST' = right
         self.kind: 'Enum' = kind
-    
-    def typecheck(self, typeManager: 'TypeManager', env):
-        # operator type is of the form a => b => c
-
-        # resolve left argument type
-        leftType = self.left.typecheck(typeManager, env)
-
-        # resolve right argument type
-        rightType = self.right.typecheck(typeManager, env)
-
-        # type of operator should be known
-        functionType = env.lookup(str(self.kind))
-
-        # unknown is error
-        if functionType is None:
-            raise TypeBindingError(f"Could not find a binding for the binary operation {self.kind}.")
-
-        returnType = typeManager.new_type()
+        self.offset = offset
 
-        # b => c
-        b_to_c = ArrowType(rightType, returnType)
-
-        # a => (b => c)
-        a_to_b_to_c = ArrowType(leftType, b_to_c)
-        
-        typeManager.unify(a_to_b_to_c, functionType)
-
-        return returnType
+    def children(self):
+        return (self.left, self.right)
 
     def __repr__(self):
         return f"BinaryOp({self.kind})"
 
 class UnaryOperation(AST):
 
-    UnaryOperationKind = Enum("UnaryOp",["NOT"])
+    UnaryOperationKind = Enum("UnaryOp",["NOT"], module=__name__, qualname="UnaryOperation.UnaryOperationKind")
+
+    # symbol ids the operator types are bound to
+    KindSymbols = {kind: Symbols.intern(str(kind)) for kind in UnaryOperationKind}
 
-    def __init__(self, kind: 'Enum', op: 'AST'):
+    def __init__(self, kind: 'Enum', op: 'AST', offset = None):
         self.kind: 'Enum' = kind
         self.op: 'AST' = op
+        self.offset = offset
+
+    def children(self):
+        return (self.op,)
 
     def __repr__(self):
         return f"UnaryOp({self.kind}"
     
-    def typecheck(self, typeManager: 'TypeManager', env: 'Environment'):
-        valueType: 'Type' = self.op.typecheck(typeManager, env)
-        functionType: 'Type' = env.lookup(str(self.kind))
-
-        returnType: 'ArrowType' = typeManager.new_type()
-        arrow = ArrowType(valueType, returnType)
-
-        typeManager.unify(arrow, functionType)
-
-        return returnType
-
-
 class FunctionApplication(AST):
-    def __init__(self, left: 'AST', right: 'AST'):
+    def __init__(self, left: 'AST', right: 'AST', offset = None):
         self.left: 'AST' = left
         self.right: 'AST' = right
+        self.offset = offset
+
+    def children(self):
+        return (self.left, self.right)
 
     def __repr__(self):
         return f"Fn"
     
-    def typecheck(self, typeManager: 'TypeManager', env: 'Environment'):
-        # application has type (a => b) => a => b
-
-        # (a => b => c) a
-
-        left = self.left.typecheck(typeManager, env)
-        right = self.right.typecheck(typeManager, env)
-
-        returnType = typeManager.new_type()
-        arrow = ArrowType(right, returnType)
+class Pattern:
+    def children(self):
+        return ()
 
-        typeManager.unify(arrow, left)
+class PatternConstructor(Pattern, SymbolNames):
+    SymbolListFields = ("param_symbols",)
 
-        return returnType
+    def __init__(self, name, params):
+        self.symbol: int = Symbols.symbol(name)
+        self.param_symbols: [int] = [Symbols.symbol(param) for param in params]
 
-class Pattern:
-    pass
+    @property
+    def name(self):
+        return Symbols.name(self.symbol)
 
-class PatternConstructor(Pattern):
-    def __init__(self, name: str, params: [str]):
-        self.name: str = name
-        self.params: [str] = params
+    @property
+    def params(self):
+        return [Symbols.name(param) for param in self.param_symbols]
 
     def __repr__(self):
         return f"PatternConstructor({self.name}){self.params}"
@@ -177,17 +177,20 @@ class PatternConstructor(Pattern):
         Matches someType with the type of all the branches.
         Constructor type is in the form: a->b->c->C, where C should be the type of Of.
         '''
-        constructor_type = env.lookup(self.name)
+        constructor_type = env.lookup(self.symbol)
         if constructor_type is None:
             raise UndefinedTypeError(f"Constructor type {self.name} is undefined.")
         
+        if isinstance(constructor_type, TypeScheme):
+            constructor_type = typeManager.instantiate(constructor_type)
+
         # Reduce the arrow, binding each param along the way
         # if the constructor type is a->b->c->C
         # first param will be a, second b, third c
-        for param in self.params:
+        for param in self.param_symbols:
             arrow = constructor_type
-            if constructor_type is None:
-                raise UndefinedTypeError(f"Type {self.name} is undefined.")
+            if not isinstance(constructor_type, ArrowType):
+                raise TypeBindingError(f"Constructor {self.name} takes fewer parameters than its pattern binds.")
 
             env.bind(param, arrow.left)
             constructor_type = arrow.right
@@ -201,78 +204,94 @@ class PatternConstructor(Pattern):
 
 
 
-class PatternVar(Pattern):
-    def __init__(self, name: str):
-        self.name: str = name
+class PatternVar(Pattern, SymbolNames):
+    def __init__(self, name):
+        self.symbol: int = Symbols.symbol(name)
+
+    @property
+    def name(self):
+        return Symbols.name(self.symbol)
 
     def __repr__(self):
         return f"PatternVar({self.name})"
     
     def match(self, someType, typeManager, env):
-        env.bind(self.name, someType)
+        env.bind(self.symbol, someType)
 
 class Branch:
     def __init__(self, pattern: 'Pattern', expresion: 'AST'):
         self.pattern: 'Pattern' = pattern
         self.expression: 'AST' = expresion
 
+    def children(self):
+        return (self.pattern, self.expression)
+
     def __repr__(self):
         return "Branch"
 
 class CaseOf(AST):
-    def __init__(self, Of: 'AST', branches: ['AST']):
+    def __init__(self, Of: 'AST', branches: ['AST'], offset = None):
         self.Of = Of
         self.branches: ['Branch'] = branches
-    
-    def typecheck(self, typeManager: 'TypeManager', env: 'Environment'):
-        '''
-        Typechecks a case statement.
-        '''
-
-        # First determine type of the Of
-        of_type = self.Of.typecheck(typeManager, env)
+        self.offset = offset
 
-        # create a new type, the type of the branches
-        branch_type = typeManager.new_type()
-
-        for branch in self.branches:
-            # each branch is in a new scope, they don't share variables
-            new_env = env.new_scope()
+    def children(self):
+        return (self.Of, *self.branches)
+    
+    def __repr__(self):
+        return "CaseOf"
 
-            # pattern should be same type as Of
-            branch.pattern.match(of_type, typeManager, new_env)
+class Constructor(SymbolNames):
+    SymbolListFields = ("type_symbols",)
 
-            # all branches should return the same type, equal with the new type we created
-            curr_branch_type = branch.expression.typecheck(typeManager, new_env)
-            typeManager.unify(branch_type, curr_branch_type)
-        
-        return branch_type
+    def __init__(self, name, types):
+        self.symbol: int = Symbols.symbol(name)
+        self.type_symbols: [int] = [Symbols.symbol(paramType) for paramType in types]
 
+    @property
+    def name(self):
+        return Symbols.name(self.symbol)
 
-    def __repr__(self):
-        return "CaseOf"
+    @property
+    def types(self):
+        return [Symbols.name(paramType) for paramType in self.type_symbols]
 
-class Constructor:
-    def __init__(self, name: str, types: [str]):
-        self.name: str = name
-        self.types: [str] = types
+    def children(self):
+        return ()
 
     def __repr__(self):
         return f"Constructor({self.name}){self.types}"
 
 class Definition:
+    # offset of the definition in the source, None if unknown
+    offset = None
+
+    def children(self):
+        return ()
+
     def typecheck(self, typeManager: 'TypeManager', env:'Environment'):
         self.typecheck_first_pass(typeManager, env)
         self.typecheck_second_pass(typeManager, env)
 
-class FnDefinition(Definition):
-    def __init__(self, name: str, params: [str], body: 'AST'):
-        self.name: str = name
-        self.params: [str] = params
+class FnDefinition(Definition, SymbolNames):
+    SymbolListFields = ("param_symbols",)
+
+    def __init__(self, name, params, body: 'AST', offset = None):
+        self.symbol: int = Symbols.symbol(name)
+        self.param_symbols: [int] = [Symbols.symbol(param) for param in params]
         self.body: 'AST' = body
+        self.offset = offset
         self.return_type = None
         self.param_types = []
 
+    @property
+    def name(self):
+        return Symbols.name(self.symbol)
+
+    @property
+    def params(self):
+        return [Symbols.name(param) for param in self.param_symbols]
+
     def typecheck_first_pass(self, typeManager, env):
         '''
         First typechecking pass.
@@ -281,36 +300,60 @@ class FnDefinition(Definition):
         for the return type of the function.
         '''
         self.return_type = typeManager.new_type()
+        self.param_types = []
         full_type = self.return_type
 
-        for param in self.params:
+        for param in self.param_symbols:
             new_type = typeManager.new_type()
             self.param_types.append(new_type)
 
         length = len(self.param_types)
         for i in range(length):
             param_type = self.param_types[length - i - 1]
-            full_type = ArrowType(param_type, full_type)
+            full_type = typeManager.arrow(param_type, full_type)
         
-        env.bind(self.name, full_type)
+        env.bind(self.symbol, full_type)
     
     def typecheck_second_pass(self, typeManager, env):
-        new_env = env.new_scope()
+        with env.scope() as new_env:
+            for i in range(len(self.param_types)):
+                new_env.bind(self.param_symbols[i], self.param_types[i])
 
-        last_param = len(self.params) - 1
-        for i in range(len(self.param_types)):
-            new_env.bind(self.params[i], self.param_types[i])
-        
-        body_type = self.body.typecheck(typeManager, new_env)
-        typeManager.unify(body_type, self.return_type)
+            try:
+                body_type = self.body.typecheck(typeManager, new_env)
+                typeManager.unify(body_type, self.return_type)
+            except SourceError as error:
+                raise error.locate(self.offset)
+
+    def children(self):
+        return (self.body,)
+
+    def __getstate__(self):
+        '''
+        The state with the nodes of the body listed ahead of it, children before their parents: every node
+        the pickler writes refers to nodes it already wrote, so bodies of any depth pickle without recursing.
+        '''
+        return {"nodes": [node for node, entering in walk(self.body) if not entering], **super().__getstate__()}
+
+    def __setstate__(self, state):
+        del state["nodes"]
+        super().__setstate__(state)
 
     def __repr__(self):
         return f"DefinitionFn({self.name}){self.params}"
 
-class TypeDefinition(Definition):
-    def __init__(self, name: str, constructors: ['Constructor']):
-        self.name: str = name
+class TypeDefinition(Definition, SymbolNames):
+    def __init__(self, name, constructors: ['Constructor'], offset = None):
+        self.symbol: int = Symbols.symbol(name)
         self.constructors: ['Constructor'] = constructors
+        self.offset = offset
+
+    @property
+    def name(self):
+        return Symbols.name(self.symbol)
+
+    def children(self):
+        return tuple(self.constructors)
 
     def __repr__(self):
         return f"DefinitionType({self.name}){self.constructors}"
@@ -321,11 +364,11 @@ class TypeDefinition(Definition):
         for constructor in self.constructors:
             full_type = return_type
             
-            for param in constructor.types:
+            for param in constructor.type_symbols:
                 param_type = typeManager.new_type()
-                full_type = ArrowType(param_type, full_type)
+                full_type = typeManager.arrow(param_type, full_type)
             
-            env.bind(constructor.name, full_type)
+            env.bind(constructor.symbol, full_type)
     
     def typecheck_second_pass(self, typeManager: 'TypeManager', env: 'Environment'):
         pass
@@ -341,12 +384,241 @@ class Program:
         for definition in self.definitions:
             definition.typecheck_second_pass(typeManager, env)
     
+    def children(self):
+        return tuple(self.definitions)
+
     def __getitem__(self, index):
         return self.definitions[index]
 
+    def __len__(self):
+        return len(self.definitions)
+
+    def __repr__(self):
+        return repr(self.definitions)
+
 
 
         
             
         
-        
\ No newline at end of file
+        
+
+def walk(root, children = None):
+    '''
+    Yields (node, True) when entering each node of the tree and (node, False) when leaving it,
+    children before their parent leaves, in source order. The nodes to descend into are
+    children(node), node.children() by default. The pending nodes are kept in a list, so
+    trees of any depth are walked without recursion.
+    '''
+    stack = [(root, True)]
+
+    while stack:
+        node, entering = stack.pop()
+        yield node, entering
+
+        if entering:
+            stack.append((node, False))
+            stack.extend((child, True) for child in reversed(children(node) if children is not None else node.children()))
+
+class Visitor:
+    '''
+    Computes a value for every node of a tree, as a recursive function would but without recursing.
+    visit calls visit_<class name>(node, context) for each node, generic_visit if there is none.
+    A visit method visits a child by yielding it, in the same context, or a (child, context) pair,
+    and is sent back the value of the child; the value it returns is the value of its node.
+    The suspended methods wait on a list, so trees of any depth can be visited, and an exception
+    raised visiting a child is thrown into its parent where it yielded the child, as if it was called.
+    A method that does not visit children can return its value without being a generator.
+    '''
+    def visit(self, root, context = None):
+        methods = {}
+        stack = []
+        value = None
+        error = None
+        result = self.call(methods, root, context)
+
+        if not isgenerator(result):
+            return result
+
+        stack.append((result, context))
+
+        while stack:
+            method, context = stack[-1]
+
+            try:
+                if error is not None:
+                    request, error = method.throw(error), None
+                else:
+                    request = method.send(value)
+            except StopIteration as stop:
+                stack.pop()
+                value = stop.value
+                continue
+            except Exception as exception:
+                stack.pop()
+
+                if not stack:
+                    raise
+
+                error = exception
+                continue
+
+            child, childContext = request if isinstance(request, tuple) else (request, context)
+
+            # a method that is not a generator raises its error here, it is thrown into the parent as well
+            try:
+                result = self.call(methods, child, childContext)
+            except Exception as exception:
+                error = exception
+                continue
+
+            if isgenerator(result):
+                stack.append((result, childContext))
+                value = None
+            else:
+                value = result
+
+        return value
+
+    def call(self, methods, node, context):
+        nodeType = type(node)
+        method = methods.get(nodeType)
+
+        if method is None:
+            method = methods[nodeType] = getattr(self, "visit_" + nodeType.__name__, self.generic_visit)
+
+        return method(node, context)
+
+    def generic_visit(self, node, context):
+        '''Visits the children of the node, its value is None.'''
+        for child in node.children():
+            yield child
+
+class TypeChecker(Visitor):
+    '''
+    Infers the type of an expression, the context of a node is the Environment of its names.
+    Types are unified in typeManager, type errors are located at the innermost node with an offset.
+    '''
+    def __init__(self, typeManager: 'TypeManager'):
+        self.typeManager = typeManager
+
+    def visit_IntNode(self, node, env):
+        return IntNode.Type
+
+    def visit_StringNode(self, node, env):
+        return StringNode.Type
+
+    def visit_LID(self, node, env):
+        res = env.lookup(node.symbol)
+
+        if res is None:
+            raise VariableUndefinedError(f"Variable '{node.value}' is undefined. Its type cannot be determined.", node.offset)
+
+        # definitions checked before their users are bound to schemes, each use gets its own copy
+        if isinstance(res, TypeScheme):
+            return self.typeManager.instantiate(res)
+
+        return res
+
+    def visit_UID(self, node, env):
+        res = env.lookup(node.symbol)
+
+        if res is None:
+            raise VariableUndefinedError(f"Variable '{node.value}' is undefined,so it's type cannot be determined.", node.offset)
+
+        # definitions checked before their users are bound to schemes, each use gets its own copy
+        if isinstance(res, TypeScheme):
+            return self.typeManager.instantiate(res)
+
+        return res
+
+    def visit_BinaryOperation(self, node, env):
+        # operator type is of the form a => b => c
+        typeManager = self.typeManager
+
+        # resolve left argument type
+        leftType = yield node.left
+
+        # resolve right argument type
+        rightType = yield node.right
+
+        # type of operator should be known, from the signatures of the root by the value of its kind
+        # or else bound by name
+        operators = env.operators
+
+        if operators is not None:
+            functionType = operators.binary[node.kind._value_]
+        else:
+            functionType = env.lookup(BinaryOperation.KindSymbols[node.kind])
+
+        # unknown is error
+        if functionType is None:
+            raise TypeBindingError(f"Could not find a binding for the binary operation {node.kind}.", node.offset)
+
+        # a => (b => c) applied to a then b
+        try:
+            returnType = typeManager.apply(typeManager.apply(functionType, leftType), rightType)
+        except TypeBindingError as error:
+            raise error.locate(node.offset)
+
+        return returnType
+
+    def visit_UnaryOperation(self, node, env):
+        typeManager = self.typeManager
+        valueType: 'Type' = yield node.op
+        operators = env.operators
+
+        if operators is not None:
+            functionType: 'Type' = operators.unary[node.kind._value_]
+        else:
+            functionType: 'Type' = env.lookup(UnaryOperation.KindSymbols[node.kind])
+
+        try:
+            returnType = typeManager.apply(functionType, valueType)
+        except TypeBindingError as error:
+            raise error.locate(node.offset)
+
+        return returnType
+
+    def visit_FunctionApplication(self, node, env):
+        # application has type (a => b) => a => b
+
+        # (a => b => c) a
+        typeManager = self.typeManager
+
+        left = yield node.left
+        right = yield node.right
+
+        try:
+            returnType = typeManager.apply(left, right)
+        except TypeBindingError as error:
+            raise error.locate(node.offset)
+
+        return returnType
+
+    def visit_CaseOf(self, node, env):
+        '''
+        Typechecks a case statement.
+        '''
+        typeManager = self.typeManager
+
+        # First determine type of the Of
+        of_type = yield node.Of
+
+        # create a new type, the type of the branches
+        branch_type = typeManager.new_type()
+
+        for branch in node.branches:
+            # each branch is in a new scope, they don't share variables
+            with env.scope() as new_env:
+                try:
+                    # pattern should be same type as Of
+                    branch.pattern.match(of_type, typeManager, new_env)
+
+                    # all branches should return the same type, equal with the new type we created
+                    curr_branch_type = yield branch.expression, new_env
+                    typeManager.unify(branch_type, curr_branch_type)
+                except SourceError as error:
+                    raise error.locate(node.offset)
+
+        return branch_type
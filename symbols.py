@@ -0,0 +1,53 @@
+class SymbolTable:
+    '''
+    Interns identifier names into dense integer ids.
+    Names are hashed once, when they are interned, the rest of the compiler keys on the ids.
+    Names are kept until they are released: a long running process, such as an editor driving an
+    IncrementalProgram, grows the table by one entry for every distinct name it ever scans.
+    mark and release forget the names interned since a point, once nothing built since is used.
+    '''
+    def __init__(self):
+        self.ids = {}
+        self.names: [str] = []
+
+    def intern(self, name: str):
+        '''Returns the id of the name, giving it the next free id if it is new.'''
+        symbol = self.ids.get(name)
+
+        if symbol is None:
+            symbol = len(self.names)
+            self.ids[name] = symbol
+            self.names.append(name)
+
+        return symbol
+
+    def symbol(self, nameOrSymbol):
+        '''Returns the id of a name, ids are returned as they are.'''
+        return self.intern(nameOrSymbol) if isinstance(nameOrSymbol, str) else nameOrSymbol
+
+    def find(self, name: str):
+        '''The id of the name, None if it was never interned.'''
+        return self.ids.get(name)
+
+    def name(self, symbol: int):
+        return self.names[symbol]
+
+    def mark(self):
+        '''A point to release the names interned after, see release.'''
+        return len(self.names)
+
+    def release(self, mark):
+        '''
+        Forgets the names interned since mark was taken, their ids are given to the next new names.
+        The nodes, tokens and environments holding these ids must not be used anymore.
+        '''
+        for name in self.names[mark:]:
+            del self.ids[name]
+
+        del self.names[mark:]
+
+    def __len__(self):
+        return len(self.names)
+
+# The symbol table shared by the whole compiler
+Symbols = SymbolTable()
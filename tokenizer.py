@@ -1,14 +1,33 @@
-from scannerGenerator import Tokens
+from scannerGenerator import Tokens, TokenRecord, FrameHeader
+from symbols import Symbols
+from diagnostics import SourceError
+import language_table
 import subprocess
+from array import array
+from bisect import bisect_left
 from enum import Enum
+from itertools import chain, islice
 
 # Conversion from token to enum
 TokenType = Enum("TokenType", Tokens)
 
+# Token types by value, the scanner and the lexer tables refer to token types by value
+TokenTypes = [None] + list(TokenType)
+
+# array type code of the offsets and lengths of a TokenBuffer, the same width as in a TokenRecord
+OffsetTypeCode = 'I' if array('I').itemsize == 4 else 'L'
+
+class InvalidCharacterError(SourceError):
+    pass
+
+class ScannerOutputError(SourceError):
+    '''Scanner output that is not token records covering the source, located where the valid records stop.'''
+    pass
+
 class Token:
-    '''A token object'''
+    '''A token object, offset is the offset of its text in the source if it is known.'''
     def __init__(self,text):
-        self.type = self.value = None
+        self.type = self.value = self.offset = None
         self.parse(text)
     
     def parse(self,text: str):
@@ -21,16 +40,454 @@ class Token:
             self.type = TokenType[text[0:paren]]
             value = text[paren + 1:-1]
             self.value = int(value) if self.type == TokenType.INT else value
+
+    def of(tokenType: 'TokenType', text: str, offset = None):
+        '''Creates a token from its type and the text it matched.'''
+        token = Token.__new__(Token)
+        token.type = tokenType
+        token.offset = offset
+
+        if tokenType == TokenType.INT:
+            token.value = int(text)
+        elif tokenType in Token.ValueTypes:
+            token.value = text
+        else:
+            token.value = None
+
+        return token
     
     def __repr__(self):
         value = "(" + str(self.value) + ")" if self.value is not None else ''
         return f"{self.type}{value}"
 
+    ValueTypes = {TokenType.INT, TokenType.LID, TokenType.UID, TokenType.LITERAL}
+
 class TokenConverter:
     '''A class to convert a list of lines into compiler tokens.'''
     def __init__(self, tokenLines):
         self.tokens = list(map(lambda tokenText: Token(tokenText), tokenLines))
-    
-    
 
+class TokenBuffer:
+    '''
+    Tokens stored as parallel arrays: the TokenType value of each token
+    and the offset and length of its text in the source.
+    text holds the source starting at offset base, token values are only sliced from it when asked for.
+    '''
+    def __init__(self, text = "", base = 0):
+        self.text: str = text
+        self.base: int = base
+        self.types = array('B')
+        self.offsets = array(OffsetTypeCode)
+        self.lengths = array(OffsetTypeCode)
+
+    def append(self, value: int, offset: int, length: int):
+        self.types.append(value)
+        self.offsets.append(offset)
+        self.lengths.append(length)
+
+    def type(self, index):
+        return TokenTypes[self.types[index]]
+
+    def text_of(self, index):
+        start = self.offsets[index] - self.base
+        return self.text[start:start + self.lengths[index]]
+
+    def value(self, index):
+        '''The value of a token, as Token would hold it.'''
+        value = self.types[index]
+
+        if value == TokenType.INT.value:
+            return int(self.text_of(index))
+        elif value in TokenBuffer.ValueCodes:
+            return self.text_of(index)
+
+        return None
+
+    def symbol(self, index):
+        '''The symbol id of an identifier token, interned in the compiler symbol table.'''
+        return Symbols.intern(self.text_of(index))
+
+    def check(self):
+        '''Raises InvalidCharacterError for the first token of type 0, an unmatched character.'''
+        if 0 in self.types:
+            index = self.types.index(0)
+            raise InvalidCharacterError(f"Invalid character {self.text_of(index)!r}.", self.offsets[index])
+
+    def __len__(self):
+        return len(self.types)
+
+    def __getitem__(self, index):
+        return Token.of(self.type(index), self.text_of(index), self.offsets[index])
+
+    def __iter__(self):
+        return (self[index] for index in range(len(self.types)))
+
+    def __repr__(self):
+        return repr(list(self))
+
+    def join(self, start, other):
+        '''
+        A buffer with the tokens of this one from index start on, followed by the tokens of other.
+        other must continue the source text of this buffer, as the chunks of a stream do.
+        '''
+        base = self.offsets[start] if start < len(self.types) else other.base
+        buffer = TokenBuffer(self.text[base - self.base:other.base - self.base] + other.text, base)
+
+        buffer.types = self.types[start:] + other.types
+        buffer.offsets = self.offsets[start:] + other.offsets
+        buffer.lengths = self.lengths[start:] + other.lengths
+
+        return buffer
+
+    def slice(self, start, end):
+        '''A buffer with the tokens from index start to index end and the text they span, at the same offsets.'''
+        buffer = TokenBuffer("", self.base)
+
+        if start < end:
+            first = self.offsets[start]
+            last = self.offsets[end - 1] + self.lengths[end - 1]
+            buffer.text = self.text[first - self.base:last - self.base]
+            buffer.base = first
+
+        buffer.types = self.types[start:end]
+        buffer.offsets = self.offsets[start:end]
+        buffer.lengths = self.lengths[start:end]
+
+        return buffer
+
+    def from_tokens(tokens, base = 0):
+        '''Packs token objects into a buffer, its text is made of their values.'''
+        buffer = TokenBuffer("", base)
+        values = []
+        offset = base
+
+        for token in tokens:
+            value = "" if token.value is None else str(token.value)
+            buffer.append(token.type.value, offset, len(value))
+            values.append(value)
+            offset += len(value) + 1
+
+        buffer.text = " ".join(values)
+        return buffer
+
+    def from_records(records, text = None, base = 0):
+        '''
+        Unpacks the binary scanner output, a sequence of TokenRecord, into a buffer.
+        The columns are copied out of the records with strided memoryview slices.
+        Raises ScannerOutputError if the output ends in a partial record, located at the end of the last
+        whole one, or at base without any.
+        '''
+        view = memoryview(records).cast('B')
+        partial = len(view) % TokenRecord.size
+
+        if partial:
+            whole = TokenBuffer.from_records(view[:len(view) - partial], text, base)
+            end = whole.offsets[-1] + whole.lengths[-1] if len(whole) else base
+            raise ScannerOutputError(f"Scanner output of {len(view)} bytes ends in a partial token record.", end)
+
+        buffer = TokenBuffer(text, base)
+        words = view.cast(OffsetTypeCode)
+        step = TokenRecord.size // words.itemsize
+
+        buffer.types.frombytes(view[0::TokenRecord.size].tobytes())
+        buffer.offsets.frombytes(words[1::step].tobytes())
+        buffer.lengths.frombytes(words[2::step].tobytes())
+
+        return buffer
+
+    def chunks(tokens, chunk_size = 4096):
+        '''
+        The tokens as a sequence of buffers.
+        tokens is a TokenBuffer, an iterable of TokenBuffer chunks or an iterable of Token objects.
+        '''
+        if isinstance(tokens, TokenBuffer):
+            return iter([tokens])
+
+        tokens = iter(tokens)
+        first = next(tokens, None)
+
+        if first is None:
+            return iter([])
+        elif isinstance(first, TokenBuffer):
+            return chain([first], tokens)
+
+        return TokenBuffer.batches(chain([first], tokens), chunk_size)
+
+    def batches(tokens, chunk_size):
+        '''Packs an iterator of Token objects into buffers of chunk_size tokens.'''
+        base = 0
+
+        while True:
+            buffer = TokenBuffer.from_tokens(islice(tokens, chunk_size), base)
+
+            if len(buffer) == 0:
+                return
+
+            yield buffer
+
+            base += len(buffer.text)
+
+    ValueCodes = {TokenType.INT.value, TokenType.LID.value, TokenType.UID.value, TokenType.LITERAL.value}
+
+class BinaryTokenConverter:
+    '''
+    A class to convert the binary output of the scanner into compiler tokens.
+    The output is a sequence of TokenRecord, each one pointing at the text of its token in the source.
+    '''
+    def __init__(self, records, text: str):
+        self.tokens = TokenBuffer.from_records(records, text)
+        self.tokens.check()
+
+        end = self.tokens.offsets[-1] + self.tokens.lengths[-1] if len(self.tokens) else 0
+        BinaryTokenConverter.check_end(text[end:], end)
+
+    def check_end(rest, offset):
+        '''
+        Raises ScannerOutputError if rest, the source from offset on, holds more than the whitespace the scanner
+        skips: the scanner writes a record for every other character, so its output stopped early.
+        '''
+        if rest.strip(" \n"):
+            raise ScannerOutputError(f"Scanner output stops at offset {offset}, before the end of the source.", offset)
+
+    def stream(records, source, chunk_records = 4096):
+        '''
+        Yields buffers of the tokens of the binary scanner output read from the records file object.
+        The text of each buffer is read from the source file object as the records reach it,
+        so only the source text spanned by the current chunk is kept in memory.
+        '''
+        window = ""
+        windowStart = 0
+
+        while True:
+            data = records.read(TokenRecord.size * chunk_records)
+
+            if not data:
+                BinaryTokenConverter.check_end(window + source.read(), windowStart)
+                return
+
+            buffer = TokenBuffer.from_records(data, None, windowStart)
+            end = buffer.offsets[-1] + buffer.lengths[-1]
+
+            while end > windowStart + len(window):
+                chunk = source.read(max(1 << 16, end - windowStart - len(window)))
+                if not chunk:
+                    raise ScannerOutputError(f"Token record at offset {buffer.offsets[-1]} is past the end of the source.", buffer.offsets[-1])
+                window += chunk
+
+            buffer.text = window
+            buffer.base = windowStart
+            buffer.check()
+
+            yield buffer
+
+            # drop the text of the converted tokens
+            window = window[end - windowStart:]
+            windowStart = end
+
+class ScannerServer:
+    '''
+    A flex scanner process in server mode, scanning many sources without being restarted.
+    Each source is sent as a frame on its stdin and its token records come back as a frame on its stdout.
+    '''
+    def __init__(self, command = ('./scanner', '--server')):
+        self.process = subprocess.Popen(list(command), stdin=subprocess.PIPE, stdout=subprocess.PIPE)
+
+    def scan(self, text: str):
+        '''Scans one source into a TokenBuffer.'''
+        data = text.encode('ascii')
+
+        try:
+            self.process.stdin.write(FrameHeader.pack(len(data)))
+            self.process.stdin.write(data)
+            self.process.stdin.flush()
+        except BrokenPipeError:
+            raise EOFError(f"Scanner server exited with code {self.process.wait()}.") from None
+
+        # a short read means the server closed its stdout, most likely by exiting
+        header = self.process.stdout.read(FrameHeader.size)
+        if len(header) != FrameHeader.size:
+            raise EOFError(f"Scanner server closed its output, exit code {self.process.poll()}.")
+
+        size, = FrameHeader.unpack(header)
+        records = self.process.stdout.read(size)
+        if len(records) != size:
+            raise EOFError(f"Scanner server closed its output after {len(records)} of {size} bytes, exit code {self.process.poll()}.")
+
+        return BinaryTokenConverter(records, text).tokens
+
+    def close(self):
+        try:
+            self.process.stdin.close()
+        except BrokenPipeError:
+            pass
+
+        self.process.wait()
+        self.process.stdout.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exception):
+        self.close()
+
+class Lexer:
+    '''
+    An in-process scanner running the DFA generated by scannerGenerator.py.
+    Matches like the flex scanner: longest match first, then the rule listed first.
+    '''
+    def __init__(self, table = language_table):
+        self.classes = table.CHAR_CLASSES
+        self.other = table.OTHER_CLASS
+        self.accept = table.ACCEPT
+        self.transitions = table.TRANSITIONS
+        self.skip = table.SKIP_RULE
+
+    def matches(self, text: str, final = True, base = 0, start = 0):
+        '''
+        Yields a (rule, start, end) triple for every token of the text from index start on.
+        Whitespace is skipped, characters that start no token raise InvalidCharacterError.
+        If the text is not final, matching stops at the first token that could continue past its end.
+        base is the offset of the text in the source, for errors.
+        '''
+        classes, other, accept, transitions, skip = self.classes, self.other, self.accept, self.transitions, self.skip
+
+        position = start
+        length = len(text)
+
+        while position < length:
+            state = 0
+            current = position
+            rule = -1
+            end = position
+
+            # run the dfa as far as possible, remember the last accepting state
+            while current < length:
+                code = ord(text[current])
+                state = transitions[state][classes[code] if code < 128 else other]
+
+                if state < 0:
+                    break
+
+                current += 1
+
+                if accept[state] >= 0:
+                    rule = accept[state]
+                    end = current
+
+            # the rest of the text decides the match
+            if current == length and not final:
+                return
+
+            if rule < 0:
+                raise InvalidCharacterError(f"Invalid character {text[position]!r}.", base + position)
+
+            if rule != skip:
+                yield rule, position, end
+
+            position = end
+
+    def scan(self, text: str):
+        '''Scans the text into a TokenBuffer.'''
+        buffer = TokenBuffer(text)
+        types, offsets, lengths = buffer.types.append, buffer.offsets.append, buffer.lengths.append
+
+        for rule, start, end in self.matches(text):
+            types(rule)
+            offsets(start)
+            lengths(end - start)
+
+        return buffer
+
+    def tokenize(self, text: str):
+        '''Converts the text into a list of compiler tokens.'''
+        return list(self.scan(text))
+
+    def relex(self, buffer: TokenBuffer, offset: int, removed: int, inserted: str):
+        '''
+        Rescans a buffer holding its whole source after an edit replacing removed characters at offset with inserted.
+        Scanning restarts one token before the edit, since a token ending right at it may be extended,
+        and stops at the first new token starting where a token after the edit now starts:
+        from there on the text is unchanged, so the old tokens are kept with their offsets shifted.
+        Returns a new buffer, the old one is left as it was.
+        '''
+        base = buffer.base
+        edit = offset - base
+        text = buffer.text[:edit] + inserted + buffer.text[edit + removed:]
+        delta = len(inserted) - removed
+        offsets = buffer.offsets
+        count = len(offsets)
+
+        # the first token ending at or after the edit, then one more back
+        restart = bisect_left(offsets, offset) - 1
+
+        while restart >= 0 and offsets[restart] + buffer.lengths[restart] >= offset:
+            restart -= 1
+
+        if restart < 0:
+            restart, start = 0, 0
+        else:
+            start = offsets[restart] - base
+
+        # old tokens starting after the removed text are candidates to sync with
+        synced = bisect_left(offsets, offset + removed)
+
+        result = TokenBuffer(text, base)
+        result.types = buffer.types[:restart]
+        result.offsets = offsets[:restart]
+        result.lengths = buffer.lengths[:restart]
+        types, new_offsets, lengths = result.types.append, result.offsets.append, result.lengths.append
+
+        for rule, position, end in self.matches(text, True, base, start):
+            shifted = position + base - delta
+
+            while synced < count and offsets[synced] < shifted:
+                synced += 1
+
+            if synced < count and offsets[synced] == shifted:
+                break
+
+            types(rule)
+            new_offsets(position + base)
+            lengths(end - position)
+        else:
+            synced = count
+
+        result.types += buffer.types[synced:]
+        result.lengths += buffer.lengths[synced:]
+
+        if delta:
+            result.offsets += array(OffsetTypeCode, [old + delta for old in offsets[synced:]])
+        else:
+            result.offsets += offsets[synced:]
+
+        return result
+
+    def stream(self, source, chunk_size = 1 << 16):
+        '''
+        Yields a TokenBuffer for each chunk of a text file object.
+        Only the text of the chunk being scanned is kept in memory.
+        '''
+        text = ""
+        base = 0
+        final = False
+
+        while not final:
+            chunk = source.read(chunk_size)
+            final = not chunk
+            text += chunk
+
+            buffer = TokenBuffer(text, base)
+            types, offsets, lengths = buffer.types.append, buffer.offsets.append, buffer.lengths.append
+            scanned = 0
+
+            for rule, start, end in self.matches(text, final, base):
+                types(rule)
+                offsets(base + start)
+                lengths(end - start)
+                scanned = end
+
+            if len(buffer) > 0:
+                yield buffer
 
+            text = text[scanned:]
+            base += scanned
@@ -0,0 +1,234 @@
+import io
+import os
+import sys
+import pytest
+from tokenizer import Lexer, Token, TokenType, TokenBuffer, BinaryTokenConverter, ScannerServer, InvalidCharacterError, ScannerOutputError
+from scannerGenerator import DFA, Patterns, TokenRecord
+import language_table
+from symbols import Symbols
+from diagnostics import LineIndex
+
+def lex(text):
+    return [repr(token) for token in Lexer().tokenize(text)]
+
+def test_lexer_keywords_before_identifiers():
+    assert lex("fn type case and or xor") == ["TokenType.FN", "TokenType.TYPE", "TokenType.CASE",
+        "TokenType.AND", "TokenType.OR", "TokenType.XOR"]
+
+def test_lexer_longest_match():
+    assert lex("fnord andy == => = !=") == ["TokenType.LID(fnord)", "TokenType.LID(andy)",
+        "TokenType.EQUAL", "TokenType.ARROW", "TokenType.ASSIGN", "TokenType.NEQUAL"]
+
+def test_lexer_values():
+    tokens = Lexer().tokenize('Cheese feta 42 "a string"')
+
+    assert [token.type for token in tokens] == [TokenType.UID, TokenType.LID, TokenType.INT, TokenType.LITERAL]
+    assert [token.value for token in tokens] == ["Cheese", "feta", 42, '"a string"']
+
+def test_lexer_matches_token_lines():
+    text = "fn Add a b\n{\n    a + b << 1\n}\n"
+    lines = ["FN", "UID(Add)", "LID(a)", "LID(b)", "OCURLY", "LID(a)", "PLUS", "LID(b)", "LSHIFT", "INT(1)", "CCURLY"]
+
+    assert lex(text) == [repr(Token(line)) for line in lines]
+
+def test_lexer_invalid_character():
+    with pytest.raises(InvalidCharacterError) as error:
+        Lexer().tokenize("fn Test {\n 1 ; 2 }")
+
+    assert error.value.offset == 13
+    assert LineIndex("fn Test {\n 1 ; 2 }").position(error.value.offset) == (2, 4)
+
+def test_line_index():
+    lines = LineIndex("ab\n\ncd\n")
+
+    assert [lines.position(offset) for offset in range(7)] == [(1, 1), (1, 2), (1, 3), (2, 1), (3, 1), (3, 2), (3, 3)]
+
+def test_token_offsets():
+    tokens = Lexer().tokenize("fn  Id\n x")
+
+    assert [token.offset for token in tokens] == [0, 4, 8]
+
+def test_lexer_stream_across_chunks():
+    text = "fn Add first second { first + second }\ntype Pair = Pair A B\n"
+
+    for chunk_size in [1, 2, 5, 1 << 16]:
+        buffers = Lexer().stream(io.StringIO(text), chunk_size)
+        assert [repr(token) for buffer in buffers for token in buffer] == lex(text)
+
+def test_token_buffer_values():
+    buffer = Lexer().scan('Cheese 42 "str" +')
+
+    assert list(buffer.types) == [TokenType.UID.value, TokenType.INT.value, TokenType.LITERAL.value, TokenType.PLUS.value]
+    assert list(buffer.offsets) == [0, 7, 10, 16]
+    assert [buffer.value(index) for index in range(len(buffer))] == ["Cheese", 42, '"str"', None]
+
+def test_token_buffer_symbols():
+    buffer = Lexer().scan("fn Id x { x }")
+
+    assert buffer.symbol(2) == buffer.symbol(4) == Symbols.intern("x")
+    assert Symbols.name(buffer.symbol(1)) == "Id"
+
+def test_token_buffer_from_tokens():
+    tokens = [Token("FN"), Token("UID(Id)"), Token("INT(7)")]
+
+    buffer = TokenBuffer.from_tokens(tokens)
+
+    assert repr(buffer) == repr(tokens)
+
+def test_token_buffer_join():
+    chunks = list(Lexer().stream(io.StringIO("fn Add a b { a + b }"), 6))
+    joined = chunks[0].join(1, chunks[1])
+
+    assert [repr(token) for token in joined] == lex("fn Add a b { a + b }")[1:len(chunks[0]) + len(chunks[1])]
+
+def test_binary_records():
+    text = "fn Id x { x }"
+    records = b"".join(TokenRecord.pack(token.value, start, length) for token, start, length in
+        [(TokenType.FN, 0, 2), (TokenType.UID, 3, 2), (TokenType.LID, 6, 1), (TokenType.OCURLY, 8, 1),
+        (TokenType.LID, 10, 1), (TokenType.CCURLY, 12, 1)])
+
+    tokens = BinaryTokenConverter(records, text).tokens
+
+    assert [repr(token) for token in tokens] == lex(text)
+
+def test_binary_records_stream():
+    text = "fn Id x { x }"
+    records = b"".join(TokenRecord.pack(token.value, start, length) for token, start, length in
+        [(TokenType.FN, 0, 2), (TokenType.UID, 3, 2), (TokenType.LID, 6, 1), (TokenType.OCURLY, 8, 1),
+        (TokenType.LID, 10, 1), (TokenType.CCURLY, 12, 1)])
+
+    buffers = BinaryTokenConverter.stream(io.BytesIO(records), io.StringIO(text), chunk_records=2)
+
+    assert [repr(token) for buffer in buffers for token in buffer] == lex(text)
+
+def test_binary_records_invalid_character():
+    with pytest.raises(InvalidCharacterError):
+        BinaryTokenConverter(TokenRecord.pack(0, 3, 1), "fn ;")
+
+def test_binary_records_must_cover_the_source():
+    records = TokenRecord.pack(TokenType.FN.value, 0, 2)
+
+    with pytest.raises(ScannerOutputError) as error:
+        BinaryTokenConverter(records, "fn Id x { x }")
+
+    assert error.value.offset == 2
+
+    with pytest.raises(ScannerOutputError) as error:
+        list(BinaryTokenConverter.stream(io.BytesIO(b""), io.StringIO("fn Id x { x }")))
+
+    assert error.value.offset == 0
+
+    with pytest.raises(ScannerOutputError) as error:
+        list(BinaryTokenConverter.stream(io.BytesIO(records + records[:5]), io.StringIO("fn Id x { x }")))
+
+    assert error.value.offset == 2
+    assert len(BinaryTokenConverter(records, "fn \n ").tokens) == 1
+
+# a stand-in for the scanner in server mode, answering frames with the records of the in-process lexer,
+# and exiting after the number of frames given as its argument
+ServerScript = """
+import sys
+sys.path.insert(0, {root!r})
+from tokenizer import Lexer
+from scannerGenerator import TokenRecord, FrameHeader
+
+for frame in range(int(sys.argv[1])):
+    header = sys.stdin.buffer.read(FrameHeader.size)
+
+    if len(header) != FrameHeader.size:
+        break
+
+    size, = FrameHeader.unpack(header)
+    tokens = Lexer().scan(sys.stdin.buffer.read(size).decode("ascii"))
+    records = b"".join(TokenRecord.pack(*token) for token in zip(tokens.types, tokens.offsets, tokens.lengths))
+    sys.stdout.buffer.write(FrameHeader.pack(len(records)) + records)
+    sys.stdout.buffer.flush()
+"""
+
+def stand_in_server(tmp_path, frames):
+    script = tmp_path / "server.py"
+    script.write_text(ServerScript.format(root=os.path.dirname(os.path.abspath(__file__))))
+
+    return ScannerServer((sys.executable, str(script), str(frames)))
+
+def test_scanner_server_frames(tmp_path):
+    texts = ["fn Id x { x }", "", "type Bool = True, False\nfn A { 1 + 2 }"]
+
+    with stand_in_server(tmp_path, len(texts)) as server:
+        for text in texts:
+            assert [repr(token) for token in server.scan(text)] == lex(text)
+
+def test_scanner_server_exit(tmp_path):
+    with stand_in_server(tmp_path, 1) as server:
+        server.scan("fn A { 1 }")
+
+        with pytest.raises(EOFError):
+            server.scan("fn B { 2 }")
+
+def test_generated_table_is_up_to_date():
+    dfa = DFA(Patterns)
+    symbol_class, class_count, rows = dfa.table()
+
+    assert language_table.ACCEPT == tuple(dfa.accept)
+    assert language_table.CLASS_COUNT == class_count
+    assert language_table.TRANSITIONS == tuple(rows)
+
+def relex_matches_scan(text, offset, removed, inserted):
+    lexer = Lexer()
+    edited = lexer.relex(lexer.scan(text), offset, removed, inserted)
+    expected = lexer.scan(text[:offset] + inserted + text[offset + removed:])
+
+    assert edited.text == expected.text
+    assert list(edited.types) == list(expected.types)
+    assert list(edited.offsets) == list(expected.offsets)
+    assert list(edited.lengths) == list(expected.lengths)
+
+def test_relex_edits():
+    text = "fn Test a b { a + b }\ntype T { A | B }\n"
+
+    relex_matches_scan(text, 10, 0, "c")
+    relex_matches_scan(text, 4, 2, "")
+    relex_matches_scan(text, 16, 3, " * 2 ")
+    relex_matches_scan(text, 0, 0, "fn X { 1 }\n")
+    relex_matches_scan(text, len(text), 0, "fn Y { 2 }")
+    relex_matches_scan(text, 14, 0, "\"string + \" + ")
+    relex_matches_scan(text, 0, len(text), "")
+
+def test_relex_keeps_tokens_after_edit():
+    lexer = Lexer()
+    edited = lexer.relex(lexer.scan("fn Test { 1 + 2 }"), 10, 1, "100")
+
+    assert [token.value for token in edited] == [None, "Test", None, 100, None, 2, None]
+    assert list(edited.offsets)[-2:] == [16, 18]
+
+def test_relex_invalid_character():
+    lexer = Lexer()
+
+    with pytest.raises(InvalidCharacterError) as error:
+        lexer.relex(lexer.scan("fn Test { 1 }"), 10, 1, ";")
+
+    assert error.value.offset == 10
+
+# the flex scanner binary, run from the repository as the compiler does
+ScannerBuilt = os.access("scanner", os.X_OK)
+
+@pytest.mark.skipif(not ScannerBuilt, reason="the scanner binary is not built, see the Makefile")
+def test_external_scanner_matches_the_lexer(tmp_path):
+    from compiler import Compiler
+    from typechecker import TypeBindingError
+    from corpus import CorpusGenerator
+
+    text = CorpusGenerator(types=2, fns=6, seed=2).generate()
+
+    assert [repr(token) for token in Compiler.scan_external(text)] == lex(text)
+
+    with ScannerServer() as server:
+        assert [repr(token) for token in server.scan(text)] == lex(text)
+        assert len(server.scan("")) == 0
+
+    # streamed from the file, a type error is still found
+    path = tmp_path / "bad.sh"
+    path.write_text("fn A { 1 + \"x\" }\n")
+
+    with pytest.raises(TypeBindingError):
+        Compiler.typecheck(Compiler.compile_file(str(path), external_scanner = True))
@@ -1,23 +1,50 @@
-class TypeBindingError(Exception):
+from types import MappingProxyType
+from symbols import Symbols
+from diagnostics import SourceError
+
+class TypeBindingError(SourceError):
     pass
 
-class UndefinedTypeError(Exception):
+class UndefinedTypeError(SourceError):
     pass
 
 class Type:
     pass
 
-class VariableUndefinedError(Exception):
+class VariableUndefinedError(SourceError):
     pass
 
 class VariableType(Type):
-    def __init__(self, name):
-        self.name: str = name
+    '''A type variable, id is its index in the substitution of the TypeManager that made it.'''
+    def __init__(self, id):
+        self.id: int = id
+
+    @property
+    def name(self):
+        return f"t_{self.id}"
+
+    def __repr__(self):
+        return self.name
 
 class BaseType(Type):
+    '''A named type. Base types are interned by name, so two of the same name are the same object.'''
+    interned = {}
+
+    def __new__(cls, name):
+        baseType = BaseType.interned.get(name)
+
+        if baseType is None:
+            baseType = BaseType.interned[name] = super().__new__(cls)
+
+        return baseType
+
     def __init__(self, name):
         self.name: str = name
-    
+
+    def __reduce__(self):
+        # unpickled through __new__, interned in the loading process
+        return BaseType, (self.name,)
+
     def __repr__(self):
         return f"BaseType.{self.name}"
 
@@ -28,65 +55,180 @@ class ArrowType(Type):
         self.left: 'Type' = left
         self.right: 'Type' = right
 
-class TypeManager:
-    def __init__(self):
-        self.bindings = {}
-        self.counter = 0
+class TypeScheme:
+    '''
+    A type generalized over some of its variables, the type of a definition checked before its users.
+    Each lookup of the name gets a copy with fresh variables in place of the quantified ones,
+    see TypeManager.instantiate, so each use may take it at other types.
+    '''
+    def __init__(self, variables, someType):
+        # ids of the quantified variables
+        self.variables: [int] = variables
+        self.type: 'Type' = someType
 
-    def new_typename(self):
-        new_name =  f"t_{self.counter}"
-        self.counter += 1
+    def __repr__(self):
+        return f"forall {' '.join(f't_{variable}' for variable in self.variables)}. {self.type}"
+
+def rebuild(someType, leaf, arrow = ArrowType):
+    '''
+    A copy of the arrows of someType with every node replaced by leaf(node) first, arrows leaf returns are copied too.
+    Arrows nest as deep as the params of a function, so the copy keeps its own stack.
+    An arrow reached more than once is copied once. Copies are made by arrow(left, right), see TypeManager.arrow.
+    '''
+    copies = {}
+    built = []
+    stack = [(someType, False)]
+
+    while stack:
+        node, done = stack.pop()
+
+        if done:
+            right = built.pop()
+            left = built.pop()
+            copies[id(node)] = copy = arrow(left, right)
+            built.append(copy)
+            continue
+
+        node = leaf(node)
+
+        if not isinstance(node, ArrowType):
+            built.append(node)
+        elif id(node) in copies:
+            built.append(copies[id(node)])
+        else:
+            stack.append((node, True))
+            stack.append((node.right, False))
+            stack.append((node.left, False))
+
+    return built[0]
+
+class TypeManager:
+    '''
+    The substitution of type variables, a union-find forest over their ids:
+    bindings holds the parent of each variable, a variable or the type it stands for,
+    and the variables bound to None are the roots, the placeholders.
+    Variables are numbered densely from 0, so the substitution is a list indexed by id.
+    resolve shortens every chain it walks and unify links the root of the shorter tree
+    under the other, so chains stay short and each step is amortized constant time.
+    '''
+    def __init__(self, reserved = 0):
+        # the ids below reserved are variables of another manager, unbound here
+        self.bindings = [None] * reserved
+        # upper bound of the length of the chains ending at each variable
+        self.ranks = [0] * reserved
+        # the arrows made by arrow, by the ids of their sides
+        self.arrows = {}
 
-        return new_name
-    
     def new_type(self):
-        return VariableType(self.new_typename())
+        variable = VariableType(len(self.bindings))
+        self.bindings.append(None)
+        self.ranks.append(0)
+
+        return variable
     
     def new_arrow(self):
         return ArrowType(self.new_type(), self.new_type())
+
+    def arrow(self, left, right):
+        '''
+        The arrow type from left to right, with both sides resolved. Arrows are hash-consed: the same
+        resolved sides give the same object, so equal types built here unify by identity.
+        The arrows keep their sides alive, so their ids stay unique as keys.
+        '''
+        left = self.resolve(left)[0]
+        right = self.resolve(right)[0]
+        key = (id(left), id(right))
+        arrow = self.arrows.get(key)
+
+        if arrow is None:
+            arrow = self.arrows[key] = ArrowType(left, right)
+
+        return arrow
     
-    def bind(self, name, someType):
+    def bind(self, id, someType):
+        '''Binds the variable numbered id to a type.'''
         variable = None
 
         if isinstance(someType, VariableType):
             variable = someType
         
-        if variable is not None and variable.name == name:
-            return
+        if variable is not None:
+            if variable.id == id:
+                return
+
+            ranks = self.ranks
+            rank = ranks[id] + 1
+
+            if rank > ranks[variable.id]:
+                ranks[variable.id] = rank
         
-        self.bindings[name] = someType
+        self.bindings[id] = someType
     
     def unify(self, left: 'Type', right: 'Type'):
         '''
         Unifies two types by creating new bindings, so that they can be considered equivalent.
         Ex: int -> double (unify) a -> b =====> a = int, b = double
+        The pairs of types left to unify wait on a worklist instead of the Python stack,
+        so arrows nested to any depth unify in time linear in their size.
         '''
+        resolve = self.resolve
+        pairs = [(left, right)]
+
+        while pairs:
+            left, right = pairs.pop()
+
+            # the same type object is equal to itself, whatever it holds
+            if left is right:
+                continue
+
+            left, is_left_placeholder = resolve(left)
+            right, is_right_placeholder = resolve(right)
+
+            if left is right:
+                continue
+            # both are placeholders, the one with the shorter chains joins the other,
+            # left joins right when they are as long
+            elif is_left_placeholder and is_right_placeholder:
+                ranks = self.ranks
+
+                if ranks[left.id] > ranks[right.id]:
+                    self.bind(right.id, left)
+                else:
+                    self.bind(left.id, right)
+            # left is bound and a placeholder type, so right should bound with the same name
+            elif is_left_placeholder:
+                self.bind(left.id, right)
+            # other way around
+            elif is_right_placeholder:
+                self.bind(right.id, left)
+            # arrow types are equal means that their types must be bound to the same,
+            # the left sides are unified first
+            elif isinstance(left, ArrowType) and isinstance(right, ArrowType):
+                pairs.append((left.right, right.right))
+                pairs.append((left.left, right.left))
+            # base types are interned, so different objects have different names
+            # binding an int to a double should be an error
+            else:
+                raise TypeBindingError(f"Error while trying to unify types {left} of type {type(left)} and {right} of type {type(right)}.")
+
+    def apply(self, functionType, argumentType):
+        '''
+        The type of a function of functionType applied to an argument of argumentType, unifying the
+        argument with the param. A function type known to be an arrow is taken apart, so nothing is
+        allocated; an unknown one is unified with an arrow to a new variable, the type returned.
+        '''
+        functionType = self.resolve(functionType)[0]
+
+        if isinstance(functionType, ArrowType):
+            self.unify(argumentType, functionType.left)
+
+            return functionType.right
+
+        returnType = self.new_type()
+        self.unify(self.arrow(argumentType, returnType), functionType)
+
+        return returnType
 
-        left, is_left_placeholder = self.resolve(left)
-        right, is_right_placeholder = self.resolve(right)
-
-        # left is bound and a placeholder type, so right should bound with the same name
-        if is_left_placeholder:
-            self.bind(left.name, right)
-            return
-        # other way around
-        elif is_right_placeholder:
-            self.bind(right.name, left)
-            return
-        # arrow types are equal means that their types must be bound to the same
-        elif isinstance(left, ArrowType) and isinstance(right, ArrowType):
-            self.unify(left.left, right.left)
-            self.unify(left.right, right.right)
-            return
-        # base types should be bound to the same name
-        # binding an int to a double should be an error
-        elif isinstance(left, BaseType) and isinstance(right, BaseType):
-            if left.name == right.name:
-                return
-        
-        raise TypeBindingError(f"Error while trying to unify types {left} of type {type(left)} and {right} of type {type(right)}.")
-        
-    
     def resolve(self,someType):
         '''
         Takes a type variable and goes through
@@ -94,70 +236,217 @@ class TypeManager:
 
         Returns the last binding in the chain and if the chain
         ends in a placeholder.
+        Every variable of the chain is then bound to the last binding directly.
 
         Ex: a => b, b => c, c => int |> returns c, False
         a1 => a2, a2 => a3 |> returns a3, True 
         '''
-        placeHolderType = None
-
-        # skip any other type than TypeVariables
-        while isinstance(someType, VariableType):
-            binding = self.bindings.get(someType.name)
-
-            # we found a placeholder type
-            # return it and its matching type
-            if binding is None:
-                placeHolderType = someType
-                return someType, True
-            
+        if not isinstance(someType, VariableType):
+            return someType, False
+
+        bindings = self.bindings
+        binding = bindings[someType.id]
+
+        # we found a placeholder type
+        if binding is None:
+            return someType, True
+
+        # most chains are a single binding long
+        if not isinstance(binding, VariableType):
+            return binding, False
+
+        last = binding
+        binding = bindings[last.id]
+
+        while binding is not None:
+            last = binding
+
+            # skip any other type than TypeVariables
+            if not isinstance(last, VariableType):
+                break
+
+            binding = bindings[last.id]
+
+        # path compression, bind every variable of the chain to its end
+        while someType is not last and isinstance(someType, VariableType):
+            binding = bindings[someType.id]
+            bindings[someType.id] = last
             someType = binding
-        
-        return someType, False
-    
+
+        return last, isinstance(last, VariableType)
+
     def getResolvedType(self, someType):
         return self.resolve(someType)[0]
 
+    def substitute(self, someType):
+        '''A copy of someType with every bound variable replaced by its binding, at any depth.'''
+        return rebuild(someType, lambda node: self.resolve(node)[0], self.arrow)
+
+    def free_variables(self, someType):
+        '''The ids of the placeholders someType refers to.'''
+        free = set()
+        seen = set()
+        stack = [someType]
+
+        while stack:
+            node = self.resolve(stack.pop())[0]
+
+            if isinstance(node, VariableType):
+                free.add(node.id)
+            elif isinstance(node, ArrowType) and id(node) not in seen:
+                seen.add(id(node))
+                stack.append(node.left)
+                stack.append(node.right)
+
+        return free
+
+    def generalize(self, someType, shared):
+        '''The scheme of someType quantified over its placeholders, except the ids in shared, those of the environment.'''
+        body = self.substitute(someType)
+
+        return TypeScheme(sorted(self.free_variables(body) - shared), body)
+
+    def instantiate(self, scheme):
+        '''A copy of the type of the scheme with a new variable for each quantified one.'''
+        if not scheme.variables:
+            return scheme.type
+
+        fresh = {variable: self.new_type() for variable in scheme.variables}
+
+        def leaf(node):
+            node = self.resolve(node)[0]
+
+            return fresh.get(node.id, node) if isinstance(node, VariableType) else node
+
+        return rebuild(scheme.type, leaf, self.arrow)
+
 class Environment:
     '''
     An environment of type bindings.
+    Bindings are keyed by symbol id, names given as strings are interned in the compiler symbol table.
+    operators holds the operator signatures of the root, see prelude, scopes share those of their parent.
     '''
+    operators = None
+
     def __init__(self, bindings = None, parent = None):
         self.bindings = {} if bindings is None else bindings
         self.parent: 'Environment' = parent
+
+        if parent is not None:
+            self.operators = parent.operators
     
     def lookup(self, name):
         '''
         Look for the type bound to the specific name. If current environment
         does not contain it, look for it in parent environments.
         '''
-        maybeType = self.bindings.get(name)
+        if isinstance(name, str):
+            name = Symbols.intern(name)
 
-        if maybeType is not None:
-            return maybeType
-        
-        if self.parent is not None:
-            return self.parent.lookup(name)
+        environment = self
+
+        while environment is not None:
+            maybeType = environment.bindings.get(name)
+
+            if maybeType is not None:
+                return maybeType
+
+            environment = environment.parent
         
         return None
     
     def bind(self, name, someType):
         '''Bind a name to a type for this environment'''
+        if isinstance(name, str):
+            name = Symbols.intern(name)
+
         self.bindings[name] = someType
 
     def new_scope(self):
         '''
         Create a new scope with the current environment as its parent.
         '''
-        return Environment({}, self) 
-    
+        return Environment({}, self)
 
-    
 
+    def scope(self):
+        '''
+        A new scope for a with block: with env.scope() as scope binds names in scope only.
+        The scope is a child environment, it is simply dropped when the block ends.
+        '''
+        return self.new_scope()
 
+    def __enter__(self):
+        return self
 
+    def __exit__(self, *exception):
+        return False
 
-        
-    
+class FrozenEnvironment(Environment):
+    '''An environment that cannot change, a root shared by every compile: names are bound in its scopes.'''
+    def __init__(self, bindings, operators = None):
+        super().__init__(MappingProxyType(dict(bindings)))
+        self.operators = operators
+
+    def bind(self, name, someType):
+        raise TypeError("A frozen environment cannot bind names, bind them in one of its scopes.")
+
+class ScopedEnvironment:
+    '''
+    An environment of type bindings in one table, for passes that enter and leave scopes in nested order.
+    Each symbol id has a stack of the types bound to it, innermost last, so a lookup is one probe
+    at any depth. Bindings are recorded in an undo log: scope() marks the log and returns the environment
+    itself, and the end of its with block pops every binding made since the mark.
+    Names bound nowhere are looked up in root, an Environment, if given.
+    '''
+    def __init__(self, root = None):
+        self.stacks = {}
+        self.log = []
+        self.marks = []
+        self.root = root
+        self.operators = root.operators if root is not None else None
+
+    def lookup(self, name):
+        '''The type bound to the name in the innermost scope binding it, None if there is none.'''
+        if isinstance(name, str):
+            name = Symbols.intern(name)
+
+        stack = self.stacks.get(name)
+
+        if stack:
+            return stack[-1]
+
+        return self.root.lookup(name) if self.root is not None else None
+
+    def bind(self, name, someType):
+        '''Bind a name to a type until the current scope is left.'''
+        if isinstance(name, str):
+            name = Symbols.intern(name)
+
+        stack = self.stacks.get(name)
+
+        if stack is None:
+            self.stacks[name] = [someType]
+        else:
+            stack.append(someType)
+
+        self.log.append(name)
+
+    def scope(self):
+        self.marks.append(len(self.log))
+
+        return self
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exception):
+        log, stacks = self.log, self.stacks
+        mark = self.marks.pop()
+
+        for name in log[mark:]:
+            stacks[name].pop()
 
+        del log[mark:]
 
-    
\ No newline at end of file
+        return False
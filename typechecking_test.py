@@ -1,6 +1,15 @@
+import pickle
+import os
+import subprocess
+import sys
+import pytest
 from compiler import Compiler
-from shotel_ast import FnDefinition, BinaryOperation, IntNode, StringNode,UnaryOperation
-from typechecker import TypeManager, Environment, BaseType, ArrowType,VariableType
+from diagnostics import LineIndex
+from shotel_ast import FnDefinition, BinaryOperation, IntNode, StringNode,UnaryOperation, CaseOf, Branch, PatternVar, LID, TypeChecker
+from typechecker import TypeManager, Environment, ScopedEnvironment, BaseType, ArrowType,VariableType, VariableUndefinedError, TypeBindingError
+from parser import Parser
+from symbols import Symbols
+from prelude import Prelude
 
 def test_typemgr_bind():
     mgr = TypeManager()
@@ -8,11 +17,15 @@ def test_typemgr_bind():
     a = mgr.new_type()
     b = mgr.new_type()
 
-    mgr.bind("FREEDOM", a)
-    mgr.bind("Democracy", b)
+    c = mgr.new_type()
+    d = mgr.new_type()
 
-    assert mgr.bindings['FREEDOM'] is a
-    assert mgr.bindings['Democracy'] is b
+    mgr.bind(c.id, a)
+    mgr.bind(d.id, b)
+
+    assert mgr.bindings[c.id] is a
+    assert mgr.bindings[d.id] is b
+    assert (a.id, b.id, repr(c)) == (0, 1, "t_2")
 
 def test_typemgr_resolve():
     mgr = TypeManager()
@@ -21,12 +34,42 @@ def test_typemgr_resolve():
 
     # first is unbound
     for i in range(1,len(typechain)):
-        mgr.bind(typechain[i].name, typechain[i-1])
+        mgr.bind(typechain[i].id, typechain[i-1])
 
     someType, is_placeholder = mgr.resolve(typechain[-1])
     
     assert someType is typechain[0] and is_placeholder
 
+def test_typemgr_resolve_compresses_paths():
+    mgr = TypeManager()
+
+    typechain = [mgr.new_type() for _ in range(100)]
+
+    for i in range(1,len(typechain)):
+        mgr.bind(typechain[i].id, typechain[i-1])
+
+    mgr.bind(typechain[0].id, BaseType("Int"))
+
+    someType, is_placeholder = mgr.resolve(typechain[-1])
+
+    assert someType.name == "Int" and not is_placeholder
+    assert all(mgr.bindings[variable.id] is someType for variable in typechain)
+
+def test_typemgr_unify_by_rank():
+    mgr = TypeManager()
+
+    types = [mgr.new_type() for _ in range(4)]
+
+    # 2 -> 1 -> 0 makes 0 the root of the longer chain
+    mgr.bind(types[2].id, types[1])
+    mgr.bind(types[1].id, types[0])
+
+    # so the lone 3 joins it, whichever side it is on
+    mgr.unify(types[0], types[3])
+
+    assert mgr.bindings[types[3].id] is types[0]
+    assert mgr.bindings[types[0].id] is None
+
 def test_typemgr_unify_left_placeholder():
     mgr = TypeManager()
 
@@ -34,23 +77,23 @@ def test_typemgr_unify_left_placeholder():
 
     # equivalence 5 -> 1 -> 0
     # create some bindings for left
-    mgr.bind(types[5].name, types[1])
-    mgr.bind(types[1].name, types[0])
+    mgr.bind(types[5].id, types[1])
+    mgr.bind(types[1].id, types[0])
 
     # left is a placeholder 
     left = types[5]
 
     # equivalence 8 -> 6 -> 4
     # some bindings for right
-    mgr.bind(types[8].name, types[6])
-    mgr.bind(types[6].name, types[4])
+    mgr.bind(types[8].id, types[6])
+    mgr.bind(types[6].id, types[4])
 
     right = types[8]
 
     mgr.unify(left, right)
 
     # we expect to add the binding 0 -> 4
-    assert mgr.bindings[types[0].name] is types[4]
+    assert mgr.bindings[types[0].id] is types[4]
 
 def test_typemgr_unify_right_placeholder():
     mgr = TypeManager()
@@ -59,26 +102,26 @@ def test_typemgr_unify_right_placeholder():
 
     # equivalence 5 -> 1 -> 0
     # create some bindings for left
-    mgr.bind(types[5].name, types[1])
-    mgr.bind(types[1].name, types[0])
+    mgr.bind(types[5].id, types[1])
+    mgr.bind(types[1].id, types[0])
 
     # left is no longer a placeholder type after resolve
-    mgr.bind(types[0].name, BaseType("Int"))
+    mgr.bind(types[0].id, BaseType("Int"))
 
     # left is a placeholder 
     left = types[5]
 
     # equivalence 8 -> 6 -> 4
     # some bindings for right
-    mgr.bind(types[8].name, types[6])
-    mgr.bind(types[6].name, types[4])
+    mgr.bind(types[8].id, types[6])
+    mgr.bind(types[6].id, types[4])
 
     right = types[8]
 
     mgr.unify(left, right)
 
     # we expect to add the binding types 4 -> Int
-    assert mgr.bindings[types[4].name].name == "Int"
+    assert mgr.bindings[types[4].id].name == "Int"
 
 def test_typemgr_unify_arrow_left():
     mgr = TypeManager()
@@ -91,15 +134,15 @@ def test_typemgr_unify_arrow_left():
     fooType = BaseType("Foo")
     barType = BaseType("Bar")
 
-    mgr.bind(types[0].name, fooType)
-    mgr.bind(types[3].name, barType)
+    mgr.bind(types[0].id, fooType)
+    mgr.bind(types[3].id, barType)
 
     mgr.unify(an_arrow, another_arrow)
 
     # Foo -> Bar == t1 => t4, so we expect t1 == Foo and t4 == Bar
 
-    assert mgr.bindings[types[1].name].name == fooType.name
-    assert mgr.bindings[types[4].name].name == barType.name
+    assert mgr.bindings[types[1].id].name == fooType.name
+    assert mgr.bindings[types[4].id].name == barType.name
 
 def test_typemgr_unify_arrow_right():
     mgr = TypeManager()
@@ -112,34 +155,137 @@ def test_typemgr_unify_arrow_right():
     fooType = BaseType("Foo")
     barType = BaseType("Bar")
 
-    mgr.bind(types[1].name, fooType)
-    mgr.bind(types[4].name, barType)
+    mgr.bind(types[1].id, fooType)
+    mgr.bind(types[4].id, barType)
 
     mgr.unify(an_arrow, another_arrow)
 
     # Foo -> Bar == t1 => t4, so we expect t1 == Foo and t4 == Bar
 
-    assert mgr.bindings[types[0].name].name == fooType.name
-    assert mgr.bindings[types[3].name].name == barType.name
+    assert mgr.bindings[types[0].id].name == fooType.name
+    assert mgr.bindings[types[3].id].name == barType.name
+
+def test_types_are_hash_consed():
+    mgr = TypeManager()
+    int_type = BaseType("Int")
+
+    assert int_type is IntNode.Type and pickle.loads(pickle.dumps(int_type)) is int_type
+
+    a = mgr.new_type()
+    arrow = mgr.arrow(a, int_type)
+
+    assert mgr.arrow(a, int_type) is arrow and mgr.arrow(int_type, int_type) is not arrow
+
+    # built from resolved sides, equal types are the same object and unify by identity
+    mgr.unify(a, int_type)
+    assert mgr.arrow(a, int_type) is mgr.arrow(int_type, int_type)
+
+def test_applying_known_functions_makes_no_types():
+    mgr = TypeManager()
+    env = Compiler.operator_environment()
+    kinds = BinaryOperation.BinaryOperationKind
+    expression = BinaryOperation(kinds.PLUS, BinaryOperation(kinds.MINUS, IntNode(1), IntNode(2)), UnaryOperation(UnaryOperation.UnaryOperationKind.NOT, IntNode(3)))
+
+    assert expression.typecheck(mgr, env) is IntNode.Type
+    assert mgr.bindings == [] and mgr.arrows == {}
+
+def test_typemgr_unify_deep_arrows():
+    mgr = TypeManager()
+    depth = 50000
+
+    # Int -> Int -> ... -> Int against t0 -> t1 -> ... -> t
+    concrete = BaseType("Int")
+    variables = mgr.new_type()
+    params = [mgr.new_type() for _ in range(depth)]
+
+    for param in reversed(params):
+        concrete = ArrowType(BaseType("Int"), concrete)
+        variables = ArrowType(param, variables)
+
+    mgr.unify(variables, concrete)
+
+    assert all(mgr.getResolvedType(param).name == "Int" for param in params)
+
+    # identical arrows are equal without being walked
+    mgr.unify(concrete, concrete)
+
+    with pytest.raises(TypeBindingError):
+        mgr.unify(variables, ArrowType(BaseType("String"), mgr.new_type()))
 
 def test_env():
     environment = Environment()
 
+def test_scoped_env():
+    environment = ScopedEnvironment()
+    int_type, string_type = BaseType("Int"), BaseType("String")
+
+    environment.bind("value", int_type)
+
+    with environment.scope() as scope:
+        scope.bind("value", string_type)
+        scope.bind("other", string_type)
+
+        assert scope.lookup("value") is string_type
+
+        with scope.scope() as inner:
+            inner.bind("value", int_type)
+            assert inner.lookup(Symbols.intern("value")) is int_type
+
+        assert scope.lookup("value") is string_type
+
+    assert environment.lookup("value") is int_type
+    assert environment.lookup("other") is None
+    assert environment.log == [Symbols.intern("value")]
+
+def test_env_symbols():
+    environment = Environment()
+    scope = environment.new_scope()
+    int_type = BaseType("Int")
+
+    environment.bind("value", int_type)
+
+    assert scope.lookup(Symbols.intern("value")) is int_type
+    assert scope.lookup("value") is int_type
+    assert scope.lookup("undefined") is None
+
 
 def ev(text):
     return Compiler.compile_from_text(text)
 
+def test_compile_many():
+    programs = Compiler.compile_many(['fn One { 1 }', 'type Bool = True, False', ''])
+
+    assert [len(program) for program in programs] == [1, 1, 0]
+    assert programs[1][0].name == 'Bool'
+
 def env_setup():
-    env = Environment()
+    return Prelude.new_scope()
 
-    int_type = BaseType("Int")
-    int_to_int_to_int = ArrowType(int_type, ArrowType(int_type, int_type))
+def test_prelude():
+    kinds = list(BinaryOperation.BinaryOperationKind) + list(UnaryOperation.UnaryOperationKind)
+
+    assert all(Prelude.lookup(str(kind)) is not None for kind in kinds)
+    assert Prelude.operators.binary[BinaryOperation.BinaryOperationKind.XOR.value] is Prelude.lookup("OperationKind.XOR")
 
-    env.bind(str(BinaryOperation.BinaryOperationKind.PLUS), int_to_int_to_int)
-    env.bind(str(BinaryOperation.BinaryOperationKind.MINUS), int_to_int_to_int)
-    env.bind(str(UnaryOperation.UnaryOperationKind.NOT), ArrowType(int_type, int_type))
+    with pytest.raises(TypeError):
+        Prelude.bind("Int", BaseType("Int"))
 
-    return env
+    # scopes see the operators and bind their own names
+    env = ScopedEnvironment(Prelude)
+
+    with env.scope() as scope:
+        scope.bind("x", BaseType("String"))
+        assert scope.lookup("x").name == "String" and scope.lookup("OperationKind.XOR") is not None
+
+    assert env.lookup("x") is None and env.operators is Prelude.operators is env_setup().operators
+
+    # without the signatures of a root, operators are looked up by name
+    env = Environment()
+    with pytest.raises(TypeBindingError):
+        BinaryOperation(BinaryOperation.BinaryOperationKind.PLUS, IntNode(1), IntNode(2)).typecheck(TypeManager(), env)
+
+    Compiler.operator_environment(env)
+    assert BinaryOperation(BinaryOperation.BinaryOperationKind.PLUS, IntNode(1), IntNode(2)).typecheck(TypeManager(), env) is IntNode.Type
 
 def test_typecheck_primitives():
     a = IntNode(15)
@@ -170,7 +316,7 @@ def test_fn_typecheck_first_pass():
 
     fn.typecheck_first_pass(typeManager, env)
 
-    return_type = env.bindings["Test"]
+    return_type = env.lookup("Test")
 
     # a -> (b -> c -> TestType)
     assert isinstance(return_type, ArrowType)
@@ -209,7 +355,7 @@ def test_fn_typecheck_first_pass_no_args():
 
     fn.typecheck_first_pass(typeManager, env)
 
-    return_type = env.bindings["Test"]
+    return_type = env.lookup("Test")
 
     assert isinstance(return_type, VariableType)
 
@@ -239,7 +385,7 @@ def test_fn_typecheck_second_pass():
     for param in fn.param_types:
         assert typeManager.resolve(param)[0].name == 'Int'
 
-    fn_type = env.bindings['Test']
+    fn_type = env.lookup('Test')
 
     VerifyArrow(fn_type, len(fn.params), '*')
 
@@ -264,7 +410,7 @@ def test_fn_typecheck_second_pass_no_args():
     fn.typecheck_second_pass(typeManager, env)
 
     # return type is int
-    assert typeManager.resolve(env.bindings['Test'])[0].name == "Int"
+    assert typeManager.resolve(env.lookup('Test'))[0].name == "Int"
 
 
 def test_type_typecheck_no_params():
@@ -280,7 +426,7 @@ def test_type_typecheck_no_params():
         definition.typecheck(typeManager, env)
 
         for cons in definition.constructors:
-            assert typeManager.resolve(env.bindings[cons.name])[0].name == definition.name
+            assert typeManager.resolve(env.lookup(cons.name))[0].name == definition.name
 
 def test_type_typecheck_params():
     program = ev('''
@@ -293,7 +439,7 @@ def test_type_typecheck_params():
     for definition in program:
         definition.typecheck(typeManager, env)
         for cons in definition.constructors:
-            VerifyArrow(typeManager.resolve(env.bindings[cons.name])[0], len(cons.types), definition.name)
+            VerifyArrow(typeManager.resolve(env.lookup(cons.name))[0], len(cons.types), definition.name)
 
 def test_unary_operation_typechecking():
     program = ev('''
@@ -438,6 +584,68 @@ def test_pattern_match_variable_typechecking():
     
     assert typeManager.getResolvedType(test_fn.return_type).name == 'Int'
 
+def test_typecheck_error_location():
+    text = '''
+    fn Test a
+    {
+        a + undefined
+    }
+    '''
+    program = ev(text)
+
+    with pytest.raises(VariableUndefinedError) as error:
+        program.typecheck(TypeManager(), env_setup())
+
+    assert LineIndex(text).position(error.value.offset) == (4, 13)
+
+def test_leaf_error_location():
+    '''An error raised visiting a leaf is located by its parent, when the leaf has no offset.'''
+    env = ScopedEnvironment()
+    node = CaseOf(IntNode(1), [Branch(PatternVar('x'), LID('undefined'))], offset = 42)
+
+    with pytest.raises(VariableUndefinedError) as error:
+        TypeChecker(TypeManager()).visit(node, env)
+
+    assert error.value.offset == 42
+    assert env.lookup(Symbols.intern('x')) is None
+
+def test_deep_nesting():
+    '''Nesting far deeper than the recursion limit parses, typechecks and prints.'''
+    depth = 5000
+    texts = ["fn Deep a { " + "(a + " * depth + "1" + ")" * depth + " }",
+        "fn Deep a { " + "case a | x => { " * depth + "x" + " }" * depth + " }",
+        "fn Deep f { f" + " 1" * depth * 10 + " }",
+        "fn Deep a { " + "!(" * depth + "a" + ")" * depth + " }"]
+
+    for text in texts:
+        program = Compiler.compile_from_text(text)
+        Compiler.typecheck(program)
+
+    assert Parser.TreeToString(program[0].body).count("UnaryOp(") == depth
+
+def test_deep_nesting_from_the_command_line(tmp_path):
+    '''Files nesting deeper than the recursion limit compile when streamed, and when parsed in worker processes.'''
+    depth = 3000
+    path = tmp_path / "deep.sh"
+    path.write_text("fn Other { 2 }\nfn Deep a { " + "(a + " * depth + "1" + ")" * depth + " }\n")
+    root = os.path.dirname(os.path.abspath(__file__))
+
+    for options in [[], ["--jobs", "2"]]:
+        result = subprocess.run([sys.executable, "compiler.py", *options, str(path)], cwd=root, capture_output=True, text=True)
+        assert (result.returncode, result.stderr) == (0, "")
+
+    assert Parser.TreeToString(Compiler.compile_file(str(path))[1].body).count("BinaryOp(") == depth
+
+def test_deep_type_error_location():
+    depth = 3000
+    text = "fn Deep a { " + "(a + " * depth + "\"a\"" + ")" * depth + " }"
+
+    with pytest.raises(TypeBindingError) as error:
+        Compiler.typecheck(Compiler.compile_from_text(text))
+
+    assert text[error.value.offset] == "+"
+    assert error.value.offset == text.rindex("+")
+
 def VerifyArrow(arrow_type: ArrowType, n_params: int, final_type_name: str):
     temp = arrow_type
 